@@ -5,8 +5,31 @@ import time
 import tempfile
 import shutil
 import stat
+import socket
+import mmap
+import queue
+import heapq
+import sqlite3
+import hashlib
+import collections
+import ctypes
+import errno
+import fcntl
+import signal
+import contextlib
+import re
 from datetime import datetime
-from gi.repository import GLib
+from cache import ScanCache, database_version_key
+from history import HistoryStore
+from results import ScanResults, make_result, parse_clamscan_line
+from metrics import ScanMetrics, write_metrics, process_peak_rss, children_peak_rss
+from checkpoint import (CHECKPOINT_INTERVAL, CheckpointTracker, checkpoint_path, discard_checkpoint,
+                        load_checkpoint, subtree_done, walk_key, write_checkpoint)
+from filters import (BUILTIN_SCAN_PROFILES, DEFAULT_SCAN_PROFILE, RULE_LABELS, ScanFilter, load_scan_profiles,
+                     skip_report)
+from risk import RiskQueue, risk_score
+from governor import (DEFAULT_PROFILE, PROFILE_ORDER, PROFILES, RateLimiter, WorkerGate, apply_to_process_group, governor,
+                      worker_limit)
 
 
 def secure_which(binary_name):
@@ -94,21 +117,905 @@ def safe_read_file(path, max_bytes=None):
         pass
 
 
+def read_database_info(db_dir):
+    """
+    Reads the 512 byte header of each signature database in db_dir.
+    Returns a dict like {"daily": {"version": 27000, "signatures": 2065000}}.
+    Databases that are missing or unreadable are left out.
+    """
+    info = {}
+    for name in ("daily", "main", "bytecode"):
+        for ext in ("cld", "cvd"):
+            path = os.path.join(db_dir, f"{name}.{ext}")
+            fd = None
+            try:
+                fd = os.open(path, os.O_RDONLY | os.O_NOFOLLOW)
+                if not stat.S_ISREG(os.fstat(fd).st_mode):
+                    continue
+                header = os.read(fd, 512).decode("ascii", errors="replace")
+            except OSError:
+                continue
+            finally:
+                if fd is not None:
+                    os.close(fd)
+
+            # Format: ClamAV-VDB:build time:version:signatures:f-level:...
+            fields = header.split(":")
+            if len(fields) < 4 or fields[0] != "ClamAV-VDB":
+                continue
+            try:
+                info[name] = {"version": int(fields[2]), "signatures": int(fields[3])}
+            except ValueError:
+                continue
+            break
+    return info
+
+
 CLAMSCAN_BIN = secure_which("clamscan")
 FRESHCLAM_BIN = secure_which("freshclam")
+CLAMD_BIN = secure_which("clamd")
+
+# Seconds to wait for a freshly started clamd to load the database
+CLAMD_START_TIMEOUT = 180
+# Seconds to wait for clamd to switch to a freshly swapped database
+CLAMD_RELOAD_TIMEOUT = 180
+
+# Files above this size are scanned in windows instead of in one pass
+LARGE_FILE_THRESHOLD = 500 * 1024 * 1024
+STREAM_WINDOW = 50 * 1024 * 1024
+# Bytes each window extends into the next one, so signatures that
+# straddle a window boundary are still seen whole by the engine
+STREAM_OVERLAP = 1024 * 1024
+# Size of the pieces sent per INSTREAM chunk
+STREAM_CHUNK = 1024 * 1024
+
+
+# Directory scans are cut into work units of roughly this many bytes or files
+SCAN_UNIT_BYTES = 64 * 1024 * 1024
+SCAN_UNIT_FILES = 256
+# Every clamscan process loads its own copy of the database (~1 GB RSS),
+# so the fallback pool is capped regardless of the requested worker count
+CLAMSCAN_POOL_LIMIT = 4
+
+# Seconds engine processes get to exit after SIGTERM before they are killed
+STOP_GRACE_SECONDS = 5
+
+
+def shard_by_size(entries, count):
+    """
+    Splits (path, size, ...) entries into at most count shards of near-equal
+    total size, assigning the largest files first to the lightest shard.
+    """
+    shards = [[] for _ in range(max(count, 1))]
+    heap = [(0, i) for i in range(len(shards))]
+    for entry in sorted(entries, key=lambda e: e[1], reverse=True):
+        total, i = heapq.heappop(heap)
+        shards[i].append(entry)
+        heapq.heappush(heap, (total + entry[1], i))
+    return [shard for shard in shards if shard]
+
+
+def iter_work_units(entries, max_bytes=SCAN_UNIT_BYTES, max_files=SCAN_UNIT_FILES):
+    """Groups a stream of (path, size, ...) entries into units bounded by bytes and file count."""
+    unit, unit_bytes = [], 0
+    for entry in entries:
+        unit.append(entry)
+        unit_bytes += entry[1]
+        if unit_bytes >= max_bytes or len(unit) >= max_files:
+            yield unit
+            unit, unit_bytes = [], 0
+    if unit:
+        yield unit
+
+
+# Bytes hashed from each end of a file for the quick duplicate check
+PARTIAL_HASH_BYTES = 64 * 1024
+
+
+def _hash_file(path, size, partial):
+    """
+    blake2b digest of a file opened without following symlinks. With
+    partial=True only the first and last PARTIAL_HASH_BYTES are hashed.
+    """
+    digest = hashlib.blake2b(digest_size=32)
+    fd = os.open(path, os.O_RDONLY | os.O_NOFOLLOW)
+    try:
+        if partial:
+            digest.update(os.pread(fd, PARTIAL_HASH_BYTES, 0))
+            if size > PARTIAL_HASH_BYTES:
+                digest.update(os.pread(fd, PARTIAL_HASH_BYTES, max(size - PARTIAL_HASH_BYTES, PARTIAL_HASH_BYTES)))
+        else:
+            while True:
+                chunk = os.read(fd, STREAM_CHUNK)
+                if not chunk:
+                    break
+                digest.update(chunk)
+    finally:
+        os.close(fd)
+    return digest.digest()
+
+
+class DuplicateIndex:
+    """
+    Finds byte-identical files incrementally. Candidates are grouped by
+    size, then by a partial hash, then by a full hash; each level is only
+    computed once a second file lands in the same group, so files with a
+    unique size are never read.
+    """
+
+    def __init__(self):
+        # size -> [first path, {partial hash -> [first path, {full hash -> path}]}]
+        self._sizes = {}
+
+    def find(self, path, size):
+        """
+        Returns the path of an identical file seen earlier, or None after
+        registering path as the representative of a new group.
+        """
+        bucket = self._sizes.get(size)
+        if bucket is None:
+            self._sizes[size] = [path, None]
+            return None
+
+        try:
+            if bucket[1] is None:
+                bucket[1] = {_hash_file(bucket[0], size, partial=True): [bucket[0], None]}
+            key = _hash_file(path, size, partial=True)
+            group = bucket[1].get(key)
+            if group is None:
+                bucket[1][key] = [path, None]
+                return None
+
+            if group[1] is None:
+                group[1] = {_hash_file(group[0], size, partial=False): group[0]}
+            digest = _hash_file(path, size, partial=False)
+            representative = group[1].get(digest)
+            if representative is None:
+                group[1][digest] = path
+            return representative
+        except OSError:
+            # Unreadable now; let the engine report it
+            return None
+
+
+def signal_process_group(proc, sig):
+    """Sends sig to the process group proc leads (engines are started in their own session)."""
+    try:
+        os.killpg(proc.pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def iter_windows(size, window=STREAM_WINDOW, overlap=STREAM_OVERLAP):
+    """Yields (start, end) byte ranges covering size, each overlapping the next by overlap bytes."""
+    start = 0
+    while start < size:
+        yield start, min(start + window + overlap, size)
+        start += window
+
+
+class ClamdClient:
+    """
+    Minimal client for the clamd protocol over a local UNIX socket.
+    Uses the null-terminated ("z" prefixed) command form so paths may
+    contain newlines.
+    """
+
+    def __init__(self, socket_path, timeout=None):
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    @staticmethod
+    def _recv_reply(sock):
+        chunks = []
+        while True:
+            data = sock.recv(4096)
+            if not data:
+                break
+            if b"\0" in data:
+                chunks.append(data.split(b"\0", 1)[0])
+                break
+            chunks.append(data)
+        return b"".join(chunks).decode("utf-8", errors="surrogateescape").strip()
+
+    def command(self, cmd, track=None):
+        """Sends a single command (str or bytes) and returns the reply. track: as for instream()."""
+        if isinstance(cmd, str):
+            cmd = cmd.encode()
+        with self._connect() as sock, (track(sock) if track else contextlib.nullcontext()):
+            sock.sendall(b"z" + cmd + b"\0")
+            return self._recv_reply(sock)
+
+    def ping(self):
+        try:
+            return self.command("PING") == "PONG"
+        except OSError:
+            return False
+
+    def version(self):
+        """Returns the engine version (e.g. '1.0.1') or 'N/A'."""
+        try:
+            # Format: ClamAV 1.0.1/27000/Mon Oct 12 08:00:00 2026
+            reply = self.command("VERSION")
+        except OSError:
+            return "N/A"
+        return reply.split("/")[0].replace("ClamAV", "").strip() or "N/A"
+
+    def reload(self):
+        return self.command("RELOAD") == "RELOADING"
+
+    def database_version(self):
+        """Returns the daily signature version the engine has loaded, or None."""
+        try:
+            parts = self.command("VERSION").split("/")
+        except OSError:
+            return None
+        return parts[1] if len(parts) > 1 else None
+
+    def instream(self, data, stop_event=None, track=None):
+        """
+        Streams a bytes-like object (e.g. a memoryview over an mmap) to the
+        engine without copying it. Returns (verdict, detail) like scan(),
+        or None if stop_event was set mid-stream. track: optional context
+        manager factory taking the socket, so a stop can shut it down
+        while the engine is still working on the reply.
+        """
+        with self._connect() as sock, (track(sock) if track else contextlib.nullcontext()):
+            sock.sendall(b"zINSTREAM\0")
+            for offset in range(0, len(data), STREAM_CHUNK):
+                if stop_event is not None and stop_event.is_set():
+                    return None
+                piece = data[offset:offset + STREAM_CHUNK]
+                sock.sendall(len(piece).to_bytes(4, "big"))
+                sock.sendall(piece)
+            sock.sendall(b"\0\0\0\0")
+            reply = self._recv_reply(sock)
+        return self.parse_reply("stream", reply)
+
+    def session(self):
+        return ClamdSession(self)
+
+    def scan(self, path, track=None):
+        """
+        Scans a single path. Returns (verdict, detail) where verdict is
+        'OK', 'FOUND' or 'ERROR' and detail is the signature or error text.
+        track: as for instream().
+        """
+        reply = self.command(b"SCAN " + os.fsencode(path), track)
+        return self.parse_reply(path, reply)
+
+    @staticmethod
+    def parse_reply(path, reply):
+        # Strip the echoed path instead of splitting on ':' so paths
+        # containing colons are handled correctly.
+        prefix = path + ": "
+        body = reply[len(prefix):] if reply.startswith(prefix) else reply.rsplit(": ", 1)[-1]
+
+        if body == "OK":
+            return "OK", ""
+        if body.endswith(" FOUND"):
+            return "FOUND", body[:-len(" FOUND")]
+        if body.endswith(" ERROR"):
+            return "ERROR", body[:-len(" ERROR")]
+        return "ERROR", body
+
+
+class ClamdSession:
+    """
+    A clamd IDSESSION: one connection reused for many SCAN commands so a
+    worker does not reconnect for every file.
+    """
+
+    def __init__(self, client):
+        self.sock = client._connect()
+        self._buffer = b""
+        self.sock.sendall(b"zIDSESSION\0")
+
+    def _read_reply(self):
+        while b"\0" not in self._buffer:
+            data = self.sock.recv(4096)
+            if not data:
+                raise ConnectionError("clamd closed the session")
+            self._buffer += data
+        reply, self._buffer = self._buffer.split(b"\0", 1)
+        return reply.decode("utf-8", errors="surrogateescape").strip()
+
+    def scan(self, path):
+        self.sock.sendall(b"zSCAN " + os.fsencode(path) + b"\0")
+        # Replies are prefixed with the request id: "<id>: <path>: OK"
+        _, _, reply = self._read_reply().partition(": ")
+        return ClamdClient.parse_reply(path, reply)
+
+    def close(self):
+        try:
+            self.sock.sendall(b"zEND\0")
+        except OSError:
+            pass
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ClamdEngine:
+    """
+    Starts, or attaches to, a user-mode clamd listening on a private UNIX
+    socket and serving the same database directory as clamscan. The daemon
+    is left running so the loaded database stays warm for later scans.
+    """
+
+    def __init__(self, base_dir, db_dir):
+        self.db_dir = db_dir
+        self.run_dir = os.path.join(base_dir, "clamd")
+        self.socket_path = os.path.join(self.run_dir, "clamd.sock")
+        self.pid_file = os.path.join(self.run_dir, "clamd.pid")
+        self.conf_file = os.path.join(base_dir, "clamav-db/clamd.conf")
+        self.client = ClamdClient(self.socket_path)
+
+    def is_running(self):
+        return self.client.ping()
+
+    def pid(self):
+        """pid of the daemon from its PidFile, or None."""
+        try:
+            with open(self.pid_file) as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def _write_config(self):
+        # Rewritten on every start so changes to db_dir are picked up.
+        # Security: write a 0600 temp file next to the target, then rename.
+        tmp_path = f"{self.conf_file}.tmp"
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_NOFOLLOW, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(f"LocalSocket {self.socket_path}\n")
+            f.write("LocalSocketMode 600\n")
+            f.write(f"DatabaseDirectory {self.db_dir}\n")
+            f.write(f"PidFile {self.pid_file}\n")
+            f.write("Foreground no\n")
+            # As clamscan: symlinks met below a target are not followed out of it;
+            # targets that are symlinks themselves are resolved before they are sent
+            f.write("FollowFileSymlinks no\n")
+            f.write(f"StreamMaxLength {2 * STREAM_WINDOW // (1024 * 1024)}M\n")
+            f.write(f"MaxThreads {max(os.cpu_count() or 1, 2)}\n")
+        os.replace(tmp_path, self.conf_file)
+
+    def ensure_running(self, log, stop_event, timeout=CLAMD_START_TIMEOUT):
+        """
+        Returns True once the daemon answers PING. Starts it if needed.
+        log: callable used to report progress.
+        """
+        if self.client.ping():
+            return True
+        if not CLAMD_BIN:
+            return False
+
+        try:
+            if not os.path.isdir(self.run_dir) and not os.path.islink(self.run_dir):
+                os.makedirs(self.run_dir, mode=0o700, exist_ok=True)
+            if os.path.islink(self.run_dir):
+                log("Refusing to use symlinked clamd directory.")
+                return False
+            self._write_config()
+            # A stale socket from a crashed daemon blocks the new one
+            if os.path.exists(self.socket_path) and stat.S_ISSOCK(os.lstat(self.socket_path).st_mode):
+                os.unlink(self.socket_path)
+        except OSError as e:
+            log(f"Clamd setup error: {e}")
+            return False
+
+        log("--- Starting clamd (loading database) ---")
+        try:
+            # Security: Use resolved CLAMD_BIN
+            proc = subprocess.Popen([CLAMD_BIN, f"--config-file={self.conf_file}"],
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                    start_new_session=True)
+        except OSError as e:
+            log(f"Clamd Error: {e}")
+            return False
+
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if stop_event.is_set():
+                return False
+            # clamd forks into the background; a non-zero exit means it failed
+            if proc.poll() not in (None, 0):
+                log(f"Clamd exited with code {proc.returncode}")
+                return False
+            if self.client.ping():
+                return True
+            stop_event.wait(0.5)
+
+        log("Clamd did not become ready in time.")
+        return False
+
+    def reload_database(self, log, stop_event, expected_daily=None, timeout=CLAMD_RELOAD_TIMEOUT):
+        """
+        Asks a running daemon to reload its database and waits until it
+        serves expected_daily (clamd keeps scanning with the old engine
+        while it loads). Returns True if nothing was running.
+        """
+        if not self.client.ping():
+            return True
+        try:
+            if not self.client.reload():
+                log("Clamd refused to reload its database.")
+                return False
+        except OSError as e:
+            log(f"Clamd Error: {e}")
+            return False
+
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and not stop_event.is_set():
+            loaded = self.client.database_version()
+            if loaded is not None and (expected_daily is None or loaded == str(expected_daily)):
+                return True
+            stop_event.wait(0.5)
+        log("Clamd did not finish reloading in time.")
+        return False
+
+
+# Database staging
+#
+# freshclam writes into a copy of the live database directory while scans
+# keep using the original. Once it succeeds the two directories are
+# exchanged in one step and clamd is told to reload.
+
+RENAME_EXCHANGE = 2
+# Symbols of the running process, which include libc
+_libc = ctypes.CDLL(None, use_errno=True)
+_renameat2 = getattr(_libc, "renameat2", None)
+AT_FDCWD = -100
+
+# Bumped every time a new database becomes live in this process
+_db_generation = 0
+_db_generation_lock = threading.Lock()
+# Updates of this process that have started and not finished yet; scans only
+# remember their clean files for a re-check while one is in flight
+_updates_in_flight = 0
+
+
+def updates_in_flight():
+    with _db_generation_lock:
+        return _updates_in_flight > 0
+
+
+def _count_update(delta):
+    global _updates_in_flight
+    with _db_generation_lock:
+        _updates_in_flight += delta
+
+
+def database_generation():
+    with _db_generation_lock:
+        return _db_generation
+
+
+def _bump_database_generation():
+    global _db_generation
+    with _db_generation_lock:
+        _db_generation += 1
+        return _db_generation
+
+
+def exchange_paths(a, b):
+    """
+    Atomically swaps two paths with renameat2(RENAME_EXCHANGE). On kernels
+    or filesystems without it, falls back to three renames, leaving a brief
+    window in which a does not exist.
+    """
+    if _renameat2 is not None:
+        if _renameat2(AT_FDCWD, os.fsencode(a), AT_FDCWD, os.fsencode(b), RENAME_EXCHANGE) == 0:
+            return
+        err = ctypes.get_errno()
+        if err not in (errno.ENOSYS, errno.EINVAL, errno.ENOTSUP):
+            raise OSError(err, os.strerror(err), a)
+
+    parked = f"{a}.swap"
+    os.rename(a, parked)
+    try:
+        os.rename(b, a)
+    except OSError:
+        os.rename(parked, a)
+        raise
+    os.rename(parked, b)
+
+
+def _remove_tree(path):
+    # Security: never follow a symlink planted in place of our directory
+    if os.path.islink(path):
+        os.unlink(path)
+    elif os.path.exists(path):
+        shutil.rmtree(path)
+
+
+def prepare_staging(db_dir, staging_dir):
+    """
+    Recreates staging_dir as a copy of db_dir so freshclam can apply
+    incremental updates. Signature files are hard-linked (freshclam replaces
+    them instead of writing in place); its small state files are copied.
+    """
+    _remove_tree(staging_dir)
+    os.makedirs(staging_dir, mode=0o700)
+    if not os.path.isdir(db_dir):
+        return
+
+    for entry in os.scandir(db_dir):
+        if not entry.is_file(follow_symlinks=False):
+            continue
+        target = os.path.join(staging_dir, entry.name)
+        if entry.name.endswith((".cvd", ".cld", ".cud")):
+            try:
+                os.link(entry.path, target)
+                continue
+            except OSError:
+                pass
+        shutil.copy2(entry.path, target, follow_symlinks=False)
+
+
+def batch_label(paths):
+    """The folder shared by all paths of a batch, used wherever one target is shown."""
+    try:
+        return os.path.commonpath(paths)
+    except ValueError:
+        return paths[0]
+
+
+def main_loop_dispatch():
+    """
+    Returns GLib.idle_add, imported on first use so headless runs never
+    load gi.
+    """
+    from gi.repository import GLib
+    return GLib.idle_add
+
+
+def format_scan_summary(stats, engine_version, known_viruses, start_time, end_time):
+    """
+    Builds a summary block in clamscan's format so ScanParser reads it
+    the same way regardless of which engine produced the results.
+    """
+    data_mb = stats["bytes"] / (1024 * 1024)
+    elapsed = end_time - start_time
+    lines = [
+        "----------- SCAN SUMMARY -----------",
+        f"Known viruses: {known_viruses}",
+        f"Engine version: {engine_version}",
+        f"Scanned directories: {stats['dirs']}",
+        f"Scanned files: {stats['files']}",
+        f"Infected files: {stats['infected']}",
+    ]
+    if "covered" in stats:
+        lines.append(f"Covered files: {stats['covered']}")
+    if "cached" in stats:
+        lines.append(f"Cached files: {stats['cached']}")
+    lines += [
+        f"Data scanned: {data_mb:.2f} MB",
+        f"Data read: {data_mb:.2f} MB (ratio 1.00:1)",
+        f"Time: {elapsed:.3f} sec ({int(elapsed // 60)} m {int(elapsed % 60)} s)",
+        f"Start Date: {time.strftime('%Y:%m:%d %H:%M:%S', time.localtime(start_time))}",
+        f"End Date:   {time.strftime('%Y:%m:%d %H:%M:%S', time.localtime(end_time))}",
+    ]
+    return lines
+
+
+# Progress snapshots are sent to the UI at most this often (seconds)
+PROGRESS_INTERVAL = 0.25
+
+
+class TreeCounter(threading.Thread):
+    """
+    Pre-walk that totals the files and bytes below roots (directories or
+    files) with os.scandir while the scan itself is already running.
+    Cancelled by either event; holds while resume_event (if given) is clear.
+    scan_filter: the ScanFilter of the scan, so only files it scans are counted.
+    risk_queue: a RiskQueue receiving the files below the roots that stand
+    out, with their walk keys, so they can be scanned ahead of the walk.
+    """
+
+    def __init__(self, roots, stop_event, resume_event=None, scan_filter=None, risk_queue=None):
+        super().__init__(daemon=True)
+        self.roots = list(roots)
+        self.scan_filter = scan_filter
+        self.risk_queue = risk_queue
+        self.stop_event = stop_event
+        self.resume_event = resume_event
+        self.cancel_event = threading.Event()
+        self.total_files = 0
+        self.total_bytes = 0
+        self.finished = False
+
+    def run(self):
+        pending = []
+        for index, root in enumerate(self.roots):
+            try:
+                st = os.stat(root)
+            except OSError:
+                continue
+            if stat.S_ISDIR(st.st_mode):
+                pending.append((root, st.st_dev, index, ()))
+            elif stat.S_ISREG(st.st_mode):
+                self.total_files += 1
+                self.total_bytes += st.st_size
+        scan_filter = self.scan_filter
+        risk_queue = self.risk_queue
+        now = time.time()
+        while pending:
+            if self.resume_event is not None:
+                self.resume_event.wait()
+            if self.stop_event.is_set() or self.cancel_event.is_set():
+                return
+            path, root_dev, index, components = pending.pop()
+            try:
+                with os.scandir(path) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if scan_filter is None or not scan_filter.check_dir(
+                                        entry.path, entry.name, entry.stat(follow_symlinks=False), root_dev):
+                                    pending.append((entry.path, root_dev, index, components + (entry.name,)))
+                            elif entry.is_file(follow_symlinks=False):
+                                st = entry.stat(follow_symlinks=False)
+                                if scan_filter is None or not scan_filter.check_file(entry.path, entry.name, st):
+                                    self.total_bytes += st.st_size
+                                    self.total_files += 1
+                                    if risk_queue is not None:
+                                        score = risk_score(entry.path, entry.name, st, now)
+                                        if score:
+                                            key = walk_key(index, components + (entry.name,))
+                                            risk_queue.push(score, (entry.path, st.st_size, st, key))
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+        self.finished = True
+
+    def cancel(self):
+        self.cancel_event.set()
+
+
+# Buffered log writes reach the disk after this many bytes or seconds
+LOG_FLUSH_BYTES = 64 * 1024
+LOG_FLUSH_INTERVAL = 1.0
+# Log lines are handed to the UI in batches at most this often (seconds)
+LOG_BATCH_INTERVAL = 0.075
+# Lines of a run's log kept in memory (the log file keeps everything)
+LOG_TAIL_LINES = 5000
+
+
+class LogSink:
+    """
+    Log destination for one run: a single O_NOFOLLOW/0600 descriptor held
+    open behind a buffered writer, plus a background flusher that hands
+    lines to the UI in batches instead of one main-loop callback per line.
+    Only a bounded tail of the log is kept in memory. Per-file result
+    records ride the same flusher when an on_results callback is given.
+    """
+
+    def __init__(self, path, on_lines, dispatch, tail_lines=LOG_TAIL_LINES, on_results=None):
+        self.path = path
+        self.on_lines = on_lines  # Receives a list of lines
+        self.on_results = on_results  # Receives a list of ScanResult
+        self.dispatch = dispatch
+        self.tail = collections.deque(maxlen=tail_lines)
+        self._file = None
+        self._open_failed = False
+        self._pending = []
+        self._pending_results = []
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._last_flush = time.monotonic()
+        self.delivery_seconds = 0.0  # Time spent in on_lines/on_results where they run
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+
+    def start(self):
+        self._flusher.start()
+
+    def _open(self):
+        try:
+            # Security: Symlink Defense & Secure Permissions
+            # O_NOFOLLOW: fail if path is a symlink
+            # O_CREAT: create if missing
+            # O_APPEND: append to end
+            # 0o600: Read/Write for owner only
+            fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND | os.O_NOFOLLOW, 0o600)
+            self._file = os.fdopen(fd, "a", buffering=LOG_FLUSH_BYTES, errors="surrogateescape")
+        except OSError:
+            # Silently ignore log errors to prevent crashing scan
+            self._open_failed = True
+
+    def write(self, msg):
+        with self._lock:
+            self.tail.append(msg)
+            self._pending.append(msg)
+            if self._file is None and not self._open_failed and not self._closed.is_set():
+                self._open()
+            if self._file is not None:
+                try:
+                    self._file.write(msg + "\n")
+                except OSError:
+                    pass
+
+    def add_result(self, result):
+        if self.on_results is None:
+            return
+        with self._lock:
+            self._pending_results.append(result)
+
+    def _deliver(self):
+        with self._lock:
+            batch, self._pending = self._pending, []
+            results, self._pending_results = self._pending_results, []
+            if self._file is not None and time.monotonic() - self._last_flush >= LOG_FLUSH_INTERVAL:
+                try:
+                    self._file.flush()
+                except OSError:
+                    pass
+                self._last_flush = time.monotonic()
+        if batch:
+            self.dispatch(self._timed, self.on_lines, batch)
+        if results:
+            self.dispatch(self._timed, self.on_results, results)
+
+    def _timed(self, fn, *args):
+        started = time.perf_counter()
+        try:
+            fn(*args)
+        finally:
+            self.delivery_seconds += time.perf_counter() - started
+
+    def _flush_loop(self):
+        while not self._closed.wait(LOG_BATCH_INTERVAL):
+            self._deliver()
+
+    def close(self):
+        """Delivers remaining lines and closes the log file."""
+        self._closed.set()
+        if self._flusher.is_alive():
+            self._flusher.join()
+        self._deliver()
+        with self._lock:
+            if self._file is not None:
+                try:
+                    self._file.close()
+                except OSError:
+                    pass
+                self._file = None
+
+
+# States of a file scanned ahead of the walk besides its recorded outcome
+_NOT_EARLY = object()  # Not claimed: the walk hands it to the workers
+_WALKED = object()     # Still being scanned when the walk reached it
+
 
 class ScannerThread(threading.Thread):
-    def __init__(self, mode, target_path, on_log, on_status, on_finish):
+    # Log names handed out in this process, see __init__
+    _log_names = set()
+    _log_names_lock = threading.Lock()
+
+    def __init__(self, mode, target_path, on_log, on_status, on_finish, on_progress=None, engine="clamd",
+                 stream_overlap=STREAM_OVERLAP, workers=None, use_cache=True, dedupe=True,
+                 recheck_after_update=True, dispatch=None, targets=None, on_results=None, resume_from=None,
+                 profile=DEFAULT_PROFILE, scan_profile=DEFAULT_SCAN_PROFILE, risk_first=True, time_budget=None,
+                 record_clean=True):
         """
-        mode: 'update', 'scan_file', 'scan_dir'
+        mode: 'update', 'scan_file', 'scan_dir', 'scan_batch'
+        targets: files and folders scanned together by 'scan_batch' (target_path is then only a label)
+        on_progress: optional callback receiving progress snapshots (dicts)
+        on_results: optional callback receiving batches (lists) of per-file ScanResult records
+        engine: 'clamd' (falls back to clamscan if the daemon is unavailable) or 'clamscan'
+        stream_overlap: bytes shared by consecutive windows when scanning large files
+        workers: concurrent scan workers for 'scan_dir' and 'scan_batch' (defaults to the CPU count)
+        use_cache: skip files folder and batch scans already verified clean with the current database
+        dedupe: scan one copy of byte-identical files in folder and batch scans and share its verdict
+        recheck_after_update: re-scan files folder and batch scans passed while a concurrent update was
+            in flight, once its new definitions went live
+        dispatch: callable(fn, *args) used to deliver callbacks (defaults to the GTK main loop)
+        resume_from: checkpoint of an interrupted folder or batch scan to continue from
+        profile: resource profile name (see governor.PROFILES); the governor adapts it while scans run
+        scan_profile: name of the filter rules folder and batch scans walk with (see filters.py)
+        risk_first: folder and batch scans start with executables, scripts, macro documents,
+            archives and recent downloads (see risk.py) instead of waiting for the walk to reach them
+        time_budget: seconds (pauses excluded) after which a folder or batch scan stops taking new
+            files and ends with a partial report; its checkpoint stays so the rest can be resumed.
+            Without clamd the walk runs before scanning starts and is not counted
+        record_clean: False for scans of watched folders: a scan without detections leaves no
+            log file, metrics, checkpoint or History entry behind
         """
         super().__init__()
         self.mode = mode
-        self.target_path = target_path
-        self.on_log = on_log       # Callback for raw text log
+        self.targets = list(targets or ([target_path] if target_path else []))
+        self._targets_lock = threading.Lock()
+        self._targets_closed = False
+        self.target_path = target_path or (batch_label(self.targets) if self.targets else None)
+        self.on_log = on_log       # Callback for batches (lists) of raw log lines
         self.on_status = on_status # Callback for parsed UI status (icon_name, title, desc)
         self.on_finish = on_finish # Callback when done
+        self.on_progress = on_progress # Callback for completion counts
+        self.on_results = on_results # Callback for batches of ScanResult
+        self.dispatch = dispatch or main_loop_dispatch()
+        self.returncode = None # clamscan-style exit code once a scan finishes
+        self.engine = engine
+        # clamd's StreamMaxLength is sized for at most a full window of overlap
+        self.stream_overlap = max(0, min(stream_overlap, STREAM_WINDOW))
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.use_cache = use_cache
+        self._cache = None
+        self._db_version = None
+        self.dedupe = dedupe
+        self._duplicates = {}  # representative path -> [(path, size, stat), ...]
+        self._flagged = {}     # path -> (verdict, detail) for every non-clean result
+        self.recheck_after_update = recheck_after_update
+        self._scanned_clean = []  # (path, size, stat, db generation) while an update is in flight
+        self._duplicates_lock = threading.Lock()
+        self._scan_generation = None
+        self.resume_from = resume_from
+        self._checkpoint = None          # CheckpointTracker of folder and batch scans
+        self._resume_position = None     # Walk position the scan continues after
+        self._checkpoint_saved = time.monotonic()
+        self._checkpoint_lock = threading.Lock()
+        self._checkpoint_db_version = None
+        self._resumed_elapsed = 0.0
+        self._rechecking = False
+        self._stats_lock = threading.Lock()
+        self._counter = None
+        self._progress = {"files": 0, "bytes": 0}
+        self._progress_started = time.monotonic()
+        self._progress_sent = 0.0
         self._stop_event = threading.Event()
+        # Cleared while paused; waiting points block on it
+        self._resume_event = threading.Event()
+        self._resume_event.set()
+        self._paused_at = None
+        self._paused_seconds = 0.0
+        # Time kept out of time_budget (see _off_budget)
+        self._off_budget_since = None
+        self._off_budget_seconds = 0.0
+        # Engine processes and clamd connections a stop has to interrupt
+        self._procs = set()
+        self._sockets = set()
+        self._engine_lock = threading.Lock()
+        # Requested profile, and the one in effect (see apply_resources)
+        self.profile = profile if profile in PROFILES else DEFAULT_PROFILE
+        self.resources = PROFILES[self.profile]
+        # Highest nice value given to an engine of this scan; it cannot be lowered again
+        self._nice_floor = None
+        self._limiter = RateLimiter(self.resources.read_rate)
+        self._gate = WorkerGate(worker_limit(self.resources, self.workers))
+        self.scan_profile = scan_profile or DEFAULT_SCAN_PROFILE
+        self._filter = None
+        self.risk_first = risk_first
+        self._risky = None            # RiskQueue filled by the pre-walk for clamd scans
+        self._early = {}              # path -> state of a file scanned ahead of the walk (see _claim_risky)
+        self._early_lock = threading.Lock()
+        self._early_count = 0
+        self._walk_position = None    # Key of the last file the walk handed over
+        self.time_budget = time_budget
+        self.budget_exhausted = False
+        self._file_path = None  # Resolved target of a 'scan_file' scan
+        self.record_clean = record_clean
+        self.metrics = ScanMetrics()
+        self.metrics.workers = self.workers
+        self.metrics.profile = self.profile
+        self.metrics_report = None # Filled in once a scan finishes
         
         # Fail immediately if binaries are missing
         if not CLAMSCAN_BIN or not FRESHCLAM_BIN:
@@ -122,22 +1029,39 @@ class ScannerThread(threading.Thread):
         self._secure_makedirs(self.base_dir)
 
         self.db_dir = os.path.join(self.base_dir, "clamav-db/db")
+        self.staging_dir = os.path.join(self.base_dir, "clamav-db/db.staging")
+        self.update_lock = os.path.join(self.base_dir, "clamav-db/update.lock")
         self.conf_file = os.path.join(self.base_dir, "clamav-db/freshclam.conf")
+        self.cache_file = os.path.join(self.base_dir, "scan_cache.db")
+        self.scan_profiles_file = os.path.join(self.base_dir, "scan_profiles.json")
+        self.clamd = ClamdEngine(self.base_dir, self.db_dir)
         
         # Logging setup
         self.log_dir = os.path.join(self.base_dir, "logs")
         self._secure_makedirs(self.log_dir)
+        self.history_file = os.path.join(self.base_dir, "history.db")
         
         timestamp = time.strftime("%Y%m%d-%H%M%S")
         
         # Prefix log filename based on mode
-        if self.mode == 'update':
-             self.log_filename = os.path.join(self.log_dir, f"update_{timestamp}.log")
-        else:
-             self.log_filename = os.path.join(self.log_dir, f"scan_{timestamp}.log")
+        prefix = "update" if self.mode == 'update' else "scan"
+        # Queued jobs can start within the same second; give each its own log
+        with ScannerThread._log_names_lock:
+            name = f"{prefix}_{timestamp}.log"
+            suffix = 1
+            while name in ScannerThread._log_names or os.path.lexists(os.path.join(self.log_dir, name)):
+                suffix += 1
+                name = f"{prefix}_{timestamp}-{suffix}.log"
+            ScannerThread._log_names.add(name)
+        self.log_filename = os.path.join(self.log_dir, name)
+        self.checkpoint_file = checkpoint_path(self.log_filename)
         
         self.scan_summary = []
-        self.full_log = [] # Store full log for updates/history
+        self.infections = [] # (path, signature) for the history index
+        self.results = ScanResults() # Flagged and slowest per-file records
+        # Bounded tail of the log kept for updates/history
+        self._log_sink = LogSink(self.log_filename, self.on_log, self.dispatch, on_results=self.on_results)
+        self.full_log = self._log_sink.tail
 
     def _secure_makedirs(self, path):
         """Creates directory with 0700 permissions."""
@@ -195,9 +1119,34 @@ class ScannerThread(threading.Thread):
                     return False
         return True
 
+    def start(self):
+        if self.mode == 'update':
+            # Counted before the thread runs, so a scan started right after it records from its first file
+            _count_update(1)
+        super().start()
+
     def run(self):
-        if not self._setup_local_env():
-            GLib.idle_add(self.on_finish, False, "Environment/Binary Error")
+        self.started_at = time.time()
+        self._log_sink.start()
+        governed = self.mode.startswith('scan')
+        if governed:
+            governor.register(self)
+        try:
+            self._run()
+        finally:
+            if self.mode == 'update':
+                _count_update(-1)
+            if governed:
+                governor.unregister(self)
+            # Make sure the last log lines reach the UI before on_finish
+            self._log_sink.close()
+
+    def _run(self):
+        with self.metrics.phase("setup"):
+            ready = self._setup_local_env()
+        if not ready:
+            self._log_sink.close()
+            self.dispatch(self.on_finish, False, "Environment/Binary Error")
             return
 
         success = True
@@ -217,42 +1166,163 @@ class ScannerThread(threading.Thread):
 
         # Pass summary OR full log depending on mode
         final_data = "\n".join(self.scan_summary) if self.scan_summary else "\n".join(self.full_log)
-        GLib.idle_add(self.on_finish, success, self.mode, final_data)
+        self._log_sink.close()
+        keep = self.record_clean or bool(self.infections)
+        if self.mode.startswith('scan'):
+            self._write_metrics(save=keep)
+        if keep:
+            self._record_history(final_data)
+        else:
+            self._discard_log()
+        self.dispatch(self.on_finish, success, self.mode, final_data)
+
+    def _discard_log(self):
+        """Removes the log of a run that is not kept (see record_clean)."""
+        try:
+            os.unlink(self.log_filename)
+        except OSError:
+            pass
+        self.log_filename = None
+
+    def _write_metrics(self, save=True):
+        """Keeps the scan's timings for the result page and, with save, writes them next to its log."""
+        self.metrics.add("ui_delivery", self._log_sink.delivery_seconds)
+        if self.metrics.engine == "clamd":
+            pid = self.clamd.pid()
+            if pid is not None:
+                self.metrics.engine_peak_rss = process_peak_rss(pid)
+        elif self.metrics.engine == "clamscan":
+            self.metrics.engine_peak_rss = children_peak_rss()
+
+        with self._stats_lock:
+            files, size = self._progress["files"], self._progress["bytes"]
+        self.metrics.sample(files, size, force=True)
+        self.metrics_report = self.metrics.report(files, size, self.results.slowest())
+        if not save:
+            return
+        try:
+            write_metrics(self.log_filename, self.metrics_report)
+        except OSError:
+            # Metrics are best effort, like the history index
+            pass
+
+    def _record_history(self, final_data):
+        """Indexes the finished run so History does not need to re-read the log."""
+        try:
+            store = HistoryStore(self.history_file)
+            try:
+                store.record_run(self.log_filename, self.mode, self.target_path,
+                                 self.started_at, time.time(), final_data, self.infections,
+                                 self.results.records())
+            finally:
+                store.close()
+        except (OSError, sqlite3.Error):
+            # History is best effort; the log file is still written
+            pass
 
     def run_freshclam(self):
+        """
+        Updates into a staging copy of the database so running scans keep
+        using the current one, then swaps the copy in and reloads clamd.
+        """
         self.update_ui("system-software-install-symbolic", "Updating Database", "Connecting to ClamAV mirrors...")
         self.log("--- Starting DB Update ---")
+
+        try:
+            # Security: O_NOFOLLOW so a planted symlink cannot redirect the lock
+            lock_fd = os.open(self.update_lock, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+        except OSError as e:
+            self.log(f"Update lock error: {e}")
+            return False
+        try:
+            try:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                self.log("Another update is running; waiting for it to finish...")
+                fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            return self._update_staged()
+        finally:
+            os.close(lock_fd)
+
+    def _update_staged(self):
+        try:
+            prepare_staging(self.db_dir, self.staging_dir)
+        except OSError as e:
+            self.log(f"Staging Error: {e}")
+            return self._update_fallback()
+        versions_before = database_version_key(read_database_info(self.db_dir))
         
         try:
             # Security: Use resolved FRESHCLAM_BIN
-            cmd = [FRESHCLAM_BIN, f'--config-file={self.conf_file}']
-            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
-            
-            for line in proc.stdout:
-                if self._stop_event.is_set():
-                    proc.terminate()
-                    return False
-                
-                clean_line = line.strip()
-                self.log(clean_line)
-                
-                # Parse output for UI
-                if "Downloading" in clean_line:
-                    self.update_ui("folder-download-symbolic", "Updating Database", clean_line)
-                elif "up-to-date" in clean_line:
-                    self.update_ui("weather-clear-symbolic", "Up to Date", "Definitions are current.")
+            cmd = [FRESHCLAM_BIN, f'--config-file={self.conf_file}', f'--datadir={self.staging_dir}']
+            proc = self._popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+            try:
+                for line in proc.stdout:
+                    if self._stop_event.is_set():
+                        break  # stop() has already signalled freshclam
+
+                    clean_line = line.strip()
+                    self.log(clean_line)
+
+                    # Parse output for UI
+                    if "Downloading" in clean_line:
+                        self.update_ui("folder-download-symbolic", "Updating Database", clean_line)
+                    elif "up-to-date" in clean_line:
+                        self.update_ui("weather-clear-symbolic", "Up to Date", "Definitions are current.")
+                proc.wait()
+            finally:
+                self._release(proc)
+
+            if self._stop_event.is_set():
+                _remove_tree(self.staging_dir)
+                return False
 
-            proc.wait()
             if proc.returncode == 0:
+                staged_info = read_database_info(self.staging_dir)
+                versions_after = database_version_key(staged_info)
+                if versions_after != versions_before:
+                    self._activate_staging(staged_info)
+                    self._invalidate_cache(versions_after)
+                else:
+                    _remove_tree(self.staging_dir)
                 return True
             else:
                 self.log(f"Freshclam failed with code {proc.returncode}")
+                _remove_tree(self.staging_dir)
                 return self._update_fallback()
 
         except Exception as e:
             self.log(f"Freshclam Error: {e}")
             return self._update_fallback()
 
+    def _activate_staging(self, staged_info):
+        """
+        Makes the staged database live. The previous one stays in the
+        staging directory until the next update, so a clamscan that was
+        still loading it is not disturbed.
+        """
+        exchange_paths(self.staging_dir, self.db_dir)
+        self.log("New definitions are live.")
+
+        daily = staged_info.get("daily", {}).get("version")
+        if self.clamd.reload_database(self.log, self._stop_event, daily):
+            self.log("Scan engine reloaded with the new definitions.")
+        _bump_database_generation()
+
+    def _invalidate_cache(self, db_version):
+        """Drops cached clean verdicts that were produced by older definitions."""
+        if not os.path.exists(self.cache_file):
+            return
+        try:
+            cache = ScanCache(self.cache_file)
+            try:
+                removed = cache.invalidate(db_version)
+            finally:
+                cache.close()
+            self.log(f"New definitions: cleared {removed} cached scan results.")
+        except (OSError, sqlite3.Error) as e:
+            self.log(f"Cache Error: {e}")
+
     def _update_fallback(self):
         """Attempts to recover last known DB status from logs or file timestamps."""
         self.update_ui("dialog-warning-symbolic", "Update Failed", "Attempting recovery...")
@@ -295,26 +1365,866 @@ class ScannerThread(threading.Thread):
         return False
 
     def run_clamscan(self):
+        # A file target is followed like clamscan's own arguments: resolved once, here,
+        # for the size check and whichever engine path reads it
+        self._file_path = os.path.realpath(self.target_path) if self.mode == 'scan_file' else None
+
         # LARGE FILE CHECK
-        if self.mode == 'scan_file' and os.path.exists(self.target_path):
+        if self.mode == 'scan_file' and os.path.exists(self._file_path):
             try:
-                size_mb = os.path.getsize(self.target_path) / (1024 * 1024)
-                if size_mb > 500:
+                if os.path.getsize(self._file_path) > LARGE_FILE_THRESHOLD:
+                    if self._use_clamd():
+                        return self.run_stream_scan()
                     return self.run_split_scan()
             except Exception as e:
                 self.log(f"Size check error: {e}")
 
         self.update_ui("system-search-symbolic", "Scanning...", f"Target: {os.path.basename(self.target_path)}")
         self.log(f"--- Starting Scan: {self.target_path} ---")
-        
-        recursive = ['-r'] if self.mode == 'scan_dir' else []
+
+        if self.mode == 'scan_batch':
+            self.log(f"Targets: {len(self.targets)}")
+        if self.mode in ('scan_dir', 'scan_batch'):
+            return self.run_parallel_scan()
+
+        if self._use_clamd():
+            return self._execute_clamd(self.target_path)
+
         # Security: Use resolved CLAMSCAN_BIN
         # Security: Use -- to prevent argument injection
-        cmd = [CLAMSCAN_BIN, f'--database={self.db_dir}'] + recursive + ['--', self.target_path]
+        cmd = [CLAMSCAN_BIN, f'--database={self.db_dir}', '--', self.target_path]
         
         return self._execute_clamscan(cmd)
 
+    def run_parallel_scan(self):
+        """
+        Walks the target tree and spreads the files over self.workers
+        concurrent workers, merging their results into one report.
+        """
+        stats = {"dirs": 0, "files": 0, "covered": 0, "infected": 0, "errors": 0, "bytes": 0, "cached": 0}
+        start_time = time.time() - self._start_checkpoint(stats)
+        self._scan_generation = database_generation()
+        self._open_cache()
+        self._load_filter()
+        self._walk_position = self._resume_position
+        if self.risk_first and self.engine == "clamd":
+            self._risky = RiskQueue()
+        completed = False
+
+        try:
+            if self.mode == 'scan_batch':
+                self._start_counter(self.targets)
+                entries = self._walk_targets(stats)
+            else:
+                self._start_counter([self.target_path])
+                entries = self._walk_files(self.target_path, stats)
+            entries = self.metrics.timed_iter("walk", entries)
+            if self.time_budget:
+                entries = self._within_budget(entries)
+            if self._risky is not None:
+                entries = self._skip_early(entries)
+            if self._cache:
+                entries = self._skip_cached(entries, stats)
+            if self.dedupe:
+                entries = self._skip_duplicates(entries, stats)
+
+            if self._use_clamd():
+                if not self._dispatch_clamd(entries, stats):
+                    return False
+                engine_version = self.clamd.client.version()
+            else:
+                self._drop_risky()
+                if not self._dispatch_clamscan(entries, stats):
+                    return False
+                engine_version = self._clamscan_version()
+
+            if not self._recheck_stale(stats):
+                return False
+            if not self.budget_exhausted:
+                # Copies of files the budget left unscanned stay uncovered
+                self._fan_out_duplicates(stats)
+            self._report_skipped(stats)
+            self._report_coverage()
+            self._report_progress(force=True)
+            completed = not self.budget_exhausted
+            return self._report_engine_summary(stats, start_time, engine_version)
+        finally:
+            if self._counter:
+                self._counter.cancel()
+            self._drop_risky()
+            self._close_cache()
+            if completed:
+                self._discard_checkpoint(self.checkpoint_file)
+            else:
+                self._save_checkpoint(force=True)
+
+    def _budget_spent(self):
+        """True once the scan has used its time budget (see time_budget)."""
+        if not self.time_budget or self.budget_exhausted:
+            return self.budget_exhausted
+        now = time.monotonic()
+        off_budget = self._off_budget_seconds
+        if self._off_budget_since is not None:
+            since, paused = self._off_budget_since
+            off_budget += now - since - (self._paused_seconds - paused)
+        elapsed = now - self._progress_started - self._paused_seconds - off_budget
+        if elapsed < self.time_budget:
+            return False
+        with self._stats_lock:
+            if self.budget_exhausted:
+                return True
+            self.budget_exhausted = True
+        self.log(f"--- Time budget of {self.time_budget:g} s reached; finishing with a partial report ---")
+        return True
+
+    @contextlib.contextmanager
+    def _off_budget(self):
+        """Keeps the time spent in the block, pauses aside, out of time_budget."""
+        since = (time.monotonic(), self._paused_seconds)
+        self._off_budget_since = since
+        try:
+            yield
+        finally:
+            self._off_budget_since = None
+            self._off_budget_seconds += time.monotonic() - since[0] - (self._paused_seconds - since[1])
+
+    def _within_budget(self, entries):
+        """Passes the walk through until the time budget is spent."""
+        for entry in entries:
+            yield entry
+            if self._budget_spent():
+                return
+
+    def _report_coverage(self):
+        """Logs how much of a time-budgeted scan was covered and keeps it for the metrics."""
+        if not self.time_budget:
+            return
+        with self._stats_lock:
+            done = self._progress["files"]
+        counter = self._counter
+        total = counter.total_files if counter is not None and counter.finished else None
+        self.metrics.coverage = {"budget_seconds": self.time_budget, "complete": not self.budget_exhausted,
+                                 "files": done, "total_files": total}
+        if not self.budget_exhausted:
+            return
+        if total:
+            self.log(f"Partial scan: {done} of {total} files covered ({done * 100 // total}%). "
+                     "Resume it from History to scan the rest.")
+        else:
+            self.log(f"Partial scan: {done} files covered before the time budget ran out. "
+                     "Resume it from History to scan the rest.")
+
+    def _load_filter(self):
+        """Compiles the rules of scan_profile for the walk."""
+        profiles = load_scan_profiles(self.scan_profiles_file)
+        rules = profiles.get(self.scan_profile)
+        if rules is None:
+            self.log(f"Unknown scan profile '{self.scan_profile}', using '{DEFAULT_SCAN_PROFILE}'.")
+            self.scan_profile = DEFAULT_SCAN_PROFILE
+            rules = profiles[DEFAULT_SCAN_PROFILE]
+        try:
+            self._filter = ScanFilter(rules)
+        except (re.error, TypeError, ValueError) as e:
+            self.log(f"Scan profile '{self.scan_profile}' is invalid ({e}); using '{DEFAULT_SCAN_PROFILE}'.")
+            self.scan_profile = DEFAULT_SCAN_PROFILE
+            rules = BUILTIN_SCAN_PROFILES[DEFAULT_SCAN_PROFILE]
+            self._filter = ScanFilter(rules)
+        self.metrics.scan_profile = self.scan_profile
+        self.log(f"Scan profile: {rules.get('label', self.scan_profile)}")
+
+    def _report_skipped(self, stats):
+        """Logs what the scan profile kept from the engine, per rule, and keeps it for the metrics."""
+        with self._stats_lock:
+            report = skip_report(stats)
+        self.metrics.skipped = report
+        for rule, counts in sorted(report.items()):
+            parts = []
+            if counts["files"]:
+                parts.append(f"{counts['files']} files ({counts['bytes'] / (1024 * 1024):.2f} MB)")
+            if counts["dirs"]:
+                parts.append(f"{counts['dirs']} folders")
+            self.log(f"Skipped ({RULE_LABELS.get(rule, rule)}): {', '.join(parts)}")
+
+    def _start_checkpoint(self, stats):
+        """
+        Sets up position tracking for the walk, continuing from resume_from
+        when given: its stats and flagged files are carried over and the walk
+        skips everything up to its position. Returns the seconds it had run.
+        """
+        state = load_checkpoint(self.resume_from) if self.resume_from else None
+        self._checkpoint = CheckpointTracker(state)
+        self._checkpoint_db_version = database_version_key(read_database_info(self.db_dir))
+        if state is None:
+            if self.resume_from:
+                self.log("Checkpoint unreadable; scanning from the start.")
+            return 0.0
+
+        tracker = self._checkpoint
+        self._resume_position = tracker.position
+        stats.update(tracker.stats)
+        with self._stats_lock:
+            self._progress["files"] = tracker.files
+            self._progress["bytes"] = tracker.bytes
+        self.infections.extend(tracker.infections)
+
+        self.log(f"Resuming after {tracker.files} files from {state.get('log_file', 'an earlier scan')}.")
+        if state.get("db_version") != self._checkpoint_db_version:
+            self.log("Definitions changed since then; files before the checkpoint were checked with the previous ones.")
+        for result in tracker.flagged:
+            self.results.add(result)
+            if result.verdict == "FOUND":
+                self._flagged[result.path] = ("FOUND", result.signature)
+                self.log(f"{result.path}: {result.signature} FOUND")
+            else:
+                self._flagged[result.path] = ("ERROR", result.error)
+                self.log(f"{result.path}: {result.error} ERROR")
+
+        # Take over: the old checkpoint goes once this run has its own
+        self._resumed_elapsed = state.get("elapsed", 0.0)
+        self._save_checkpoint(force=True)
+        if os.path.abspath(self.resume_from) != os.path.abspath(self.checkpoint_file):
+            self._discard_checkpoint(self.resume_from)
+        return self._resumed_elapsed
+
+    def _discard_checkpoint(self, path):
+        try:
+            discard_checkpoint(path)
+        except OSError as e:
+            self.log(f"Could not remove checkpoint {path}: {e}")
+
+    def _save_checkpoint(self, force=False):
+        """Writes the committed position and results, at most every CHECKPOINT_INTERVAL seconds."""
+        if self._checkpoint is None or not self.record_clean:
+            return
+        now = time.monotonic()
+        if not force and now - self._checkpoint_saved < CHECKPOINT_INTERVAL:
+            return
+        if not self._checkpoint_lock.acquire(blocking=force):
+            return  # Another worker is writing it
+        try:
+            self._checkpoint_saved = now
+            state = self._checkpoint.snapshot()
+            if state["position"] is None:
+                return  # Nothing to resume from yet
+            with self._targets_lock:
+                targets = list(self.targets)
+            state.update({
+                "mode": self.mode,
+                "target": self.target_path,
+                "targets": targets,
+                "log_file": os.path.basename(self.log_filename),
+                "db_version": self._checkpoint_db_version,
+                "saved_at": time.time(),
+                "elapsed": round(self._resumed_elapsed + now - self._progress_started - self._paused_seconds, 3),
+                "stopped": self._stop_event.is_set() or self.budget_exhausted,
+                "pid": os.getpid(),
+                "profile": self.profile,
+                "scan_profile": self.scan_profile,
+            })
+            write_checkpoint(self.checkpoint_file, state)
+        except (OSError, ValueError) as e:
+            self.log(f"Checkpoint Error: {e}")
+        finally:
+            self._checkpoint_lock.release()
+
+    def _recheck_stale(self, stats):
+        """
+        Re-scans files that passed with a database that was replaced while
+        the scan ran. The engine cannot load only the new signatures, so
+        they are checked against the full new database.
+        """
+        current = database_generation()
+        stale = [(path, size, st) for path, size, st, generation in self._scanned_clean if generation != current]
+        self._scanned_clean = []
+        if not stale:
+            return True
+
+        self.log(f"--- New definitions went live during the scan: re-checking {len(stale)} files ---")
+        self.update_ui("view-refresh-symbolic", "Re-checking", f"{len(stale)} files scanned with the old definitions")
+        if self._cache:
+            self._db_version = database_version_key(read_database_info(self.db_dir))
+
+        recheck = {"files": 0, "infected": 0, "errors": 0, "bytes": 0}
+        self._rechecking = True
+        try:
+            if self._use_clamd():
+                completed = self._dispatch_clamd(iter(stale), recheck)
+            else:
+                completed = self._dispatch_clamscan(iter(stale), recheck)
+        finally:
+            self._rechecking = False
+
+        # Only new detections change the report; files were already counted
+        with self._stats_lock:
+            stats["infected"] += recheck["infected"]
+            stats["errors"] += recheck["errors"]
+        return completed
+
+    def _start_counter(self, roots):
+        # Without a progress display the pre-walk still finds the files to scan first
+        if self.on_progress is None and self._risky is None:
+            return
+        self._counter = TreeCounter(roots, self._stop_event, self._resume_event, self._filter, self._risky)
+        self._counter.start()
+
+    def _drop_risky(self):
+        """Stops collecting files to scan ahead of the walk (clamscan scans, finished scans)."""
+        if self._risky is None:
+            return
+        if self._counter:
+            self._counter.risk_queue = None
+        self._risky.clear()
+        self._risky = None
+
+    def _claim_risky(self):
+        """
+        The riskiest file the walk has not handed over yet, or None. It is
+        marked as scanned ahead of the walk: the walk then drops it, and its
+        checkpoint entry is completed once both are done (see _record_early).
+        """
+        risky = self._risky
+        while risky is not None and not self._stop_event.is_set() and not self._budget_spent():
+            entry = risky.pop()
+            if entry is None:
+                return None
+            path, size, st, key = entry
+            if self._cache:
+                try:
+                    if self._cache.is_clean(st, self._db_version):
+                        continue  # The walk reports it as cached
+                except sqlite3.Error:
+                    pass
+            with self._early_lock:
+                if path in self._early or (self._walk_position is not None and key <= self._walk_position):
+                    continue
+                self._early[path] = None
+            return path, size, st
+        return None
+
+    def _record_early(self, stats, path, size, verdict, detail, st=None, generation=None, duration=None):
+        """Records the verdict of a file scanned ahead of the walk."""
+        with self._early_lock:
+            outcome = self._record_result(stats, path, size, verdict, detail, st, generation=generation,
+                                          duration=duration)
+            self._early_count += 1
+            if self._early.get(path) is _WALKED:
+                # The walk registered it meanwhile, so _record_result completed it
+                del self._early[path]
+            else:
+                self._early[path] = outcome
+
+    def _skip_early(self, entries):
+        """Drops the files that are or were scanned ahead of the walk."""
+        for entry in entries:
+            path = entry[0]
+            with self._early_lock:
+                outcome = self._early.get(path, _NOT_EARLY)
+                if outcome is None:
+                    self._early[path] = _WALKED
+                elif outcome is not _NOT_EARLY:
+                    del self._early[path]
+                    self._checkpoint.complete(path, *outcome)
+            if outcome is _NOT_EARLY:
+                yield entry
+
+    def _advance_progress(self, files, size):
+        with self._stats_lock:
+            self._progress["files"] += files
+            self._progress["bytes"] += size
+            done_files, done_bytes = self._progress["files"], self._progress["bytes"]
+        self.metrics.sample(done_files, done_bytes)
+        self._report_progress()
+        self._save_checkpoint()
+
+    def _report_progress(self, force=False, total_files=None, total_bytes=None):
+        """
+        Sends a snapshot of completed vs. total work to on_progress, at most
+        every PROGRESS_INTERVAL seconds. Totals come from the pre-walk
+        unless given explicitly; they are lower bounds until it finishes.
+        """
+        if self.on_progress is None or self._stop_event.is_set():
+            return
+        now = time.monotonic()
+        with self._stats_lock:
+            if not force and now - self._progress_sent < PROGRESS_INTERVAL:
+                return
+            self._progress_sent = now
+            snapshot = dict(self._progress)
+
+        counter = self._counter
+        if total_files is None and counter is not None:
+            total_files, total_bytes = counter.total_files, counter.total_bytes
+        snapshot["total_files"] = max(total_files or 0, snapshot["files"])
+        snapshot["total_bytes"] = max(total_bytes or 0, snapshot["bytes"])
+        snapshot["totals_final"] = counter is None or counter.finished
+        snapshot["elapsed"] = now - self._progress_started - self._paused_seconds
+        snapshot["paused"] = self.paused
+        self.dispatch(self.on_progress, snapshot)
+
+    def _open_cache(self):
+        if not self.use_cache:
+            return
+        self._db_version = database_version_key(read_database_info(self.db_dir))
+        if not self._db_version:
+            return
+        try:
+            self._cache = ScanCache(self.cache_file)
+        except (OSError, sqlite3.Error) as e:
+            self.log(f"Cache unavailable: {e}")
+            self._cache = None
+
+    def _close_cache(self):
+        if self._cache:
+            try:
+                self._cache.close()
+            except sqlite3.Error as e:
+                self.log(f"Cache Error: {e}")
+            self._cache = None
+
+    def _skip_cached(self, entries, stats):
+        """Passes through only the entries the cache cannot vouch for."""
+        for entry in entries:
+            started = time.perf_counter()
+            try:
+                hit = self._cache.is_clean(entry[2], self._db_version)
+            except sqlite3.Error:
+                hit = False
+            self.metrics.add("cache_lookup", time.perf_counter() - started)
+            if hit:
+                with self._stats_lock:
+                    stats["cached"] += 1
+                    stats["covered"] += 1
+                self._checkpoint.complete(entry[0], {"cached": 1, "covered": 1})
+                self._advance_progress(1, entry[1])
+            else:
+                yield entry
+
+    def _skip_duplicates(self, entries, stats):
+        """
+        Passes through one representative per group of identical files. The
+        others share its verdict: right away if it is already known, else
+        once the representative is done (see _release_copies).
+        """
+        index = DuplicateIndex()
+        for entry in entries:
+            started = time.perf_counter()
+            representative = index.find(entry[0], entry[1])
+            self.metrics.add("dedupe", time.perf_counter() - started)
+            if representative is None:
+                yield entry
+                continue
+            with self._duplicates_lock:
+                waiting = self._checkpoint.is_pending(representative)
+                if waiting:
+                    self._duplicates.setdefault(representative, []).append(entry)
+            self._advance_progress(1, entry[1])
+            if not waiting:
+                # Its verdict may predate a database swap, so copies are re-checked then
+                self._inherit_verdict(stats, representative, [entry], self._scan_generation)
+
+    def _release_copies(self, stats, representative, generation):
+        """Applies a representative's fresh verdict to the copies waiting on it."""
+        with self._duplicates_lock:
+            group = self._duplicates.pop(representative, None)
+        if group:
+            self._inherit_verdict(stats, representative, group, generation)
+
+    def _inherit_verdict(self, stats, representative, group, generation=None):
+        verdict, detail = self._flagged.get(representative, ("OK", ""))
+        if verdict == "ERROR":
+            verdict, detail = "ERROR", f"Copy of unscanned file {representative}"
+        for path, size, st in group:
+            self._record_result(stats, path, size, verdict, detail, st, duplicate=True, generation=generation)
+
+    def _fan_out_duplicates(self, stats):
+        """Applies the verdicts of representatives that never completed (failed or stopped)."""
+        with self._duplicates_lock:
+            groups, self._duplicates = self._duplicates, {}
+        copies = sum(len(group) for group in groups.values())
+        if copies:
+            self.log(f"Applying verdicts to {copies} duplicate files...")
+        for representative, group in groups.items():
+            self._inherit_verdict(stats, representative, group)
+
+    def _dispatch_clamd(self, entries, stats):
+        """
+        Feeds work units from the tree walk to worker threads that each keep
+        one clamd session open. Scanning starts before the walk finishes.
+        """
+        units = queue.Queue(maxsize=self.workers * 2)
+        failures = []
+
+        def worker():
+            session = None
+            tracked = contextlib.ExitStack()
+
+            def scan(path):
+                nonlocal session
+                if session is not None:
+                    try:
+                        return session.scan(path)
+                    except ConnectionError:
+                        # clamd drops sessions idle past its IdleTimeout (paused, throttled)
+                        session.close()
+                        if self._stop_event.is_set():
+                            raise
+                session = self.clamd.client.session()
+                tracked.enter_context(self._track_socket(session.sock))
+                return session.scan(path)
+
+            while True:
+                # Risky files the walk has not reached yet go first
+                early = None if failures else self._claim_risky()
+                if early is not None:
+                    unit, record = [early], self._record_early
+                else:
+                    unit, record = units.get(), self._record_result
+                    if unit is None:
+                        break
+                if failures or self._stop_event.is_set():
+                    continue  # Keep draining so the producer never blocks
+                try:
+                    # Only as many workers as the resource profile allows scan at once
+                    with self._gate.slot(self._stop_event):
+                        for path, size, st in unit:
+                            if not self._wait_if_paused() or not self._throttle(size) or self._budget_spent():
+                                break
+                            generation = database_generation()
+                            started = time.monotonic()
+                            verdict, detail = scan(path)
+                            record(stats, path, size, verdict, detail, st, generation=generation,
+                                   duration=time.monotonic() - started)
+                except OSError as e:
+                    failures.append(e)
+            tracked.close()
+            if session is not None:
+                session.close()
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(self.workers)]
+        for t in threads:
+            t.start()
+        if self._gate.limit < self.workers:
+            self.log(f"Scanning with {self.workers} clamd workers ({self._gate.limit} at a time)...")
+        else:
+            self.log(f"Scanning with {self.workers} clamd workers...")
+
+        for unit in iter_work_units(entries):
+            if failures or self._stop_event.is_set():
+                break
+            units.put(unit)
+        for _ in threads:
+            units.put(None)
+        for t in threads:
+            t.join()
+
+        if self._early_count:
+            self.log(f"Scanned {self._early_count} high-risk files ahead of the walk.")
+        if failures:
+            self.log(f"Clamd Error: {failures[0]}")
+            return False
+        return not self._stop_event.is_set()
+
+    def _dispatch_clamscan(self, entries, stats):
+        """
+        Fallback without clamd: balances the files by size over a small
+        pool of clamscan processes, each reading its share from a file list.
+        """
+        # The file lists need the whole walk before the first process starts,
+        # so the walk does not count against the time budget here
+        with self._off_budget():
+            entries = list(entries)
+        if self._stop_event.is_set():
+            return False
+
+        # The pool size is fixed for the run, so it follows the profile in effect now
+        shards = shard_by_size(entries, min(self.workers, CLAMSCAN_POOL_LIMIT, self._gate.limit))
+        # Each shard scans its risky files first, then the rest in walk order
+        # so the checkpoint position keeps advancing
+        rank = {id(entry): i for i, entry in enumerate(entries)}
+        if self.risk_first:
+            now = time.time()
+            risk = {id(entry): risk_score(entry[0], os.path.basename(entry[0]), entry[2], now)
+                    for entry in entries if entry[2] is not None}
+        else:
+            risk = {}
+        for shard in shards:
+            shard.sort(key=lambda entry: (-risk.get(id(entry), 0), rank[id(entry)]))
+        self.log(f"Scanning with {len(shards)} clamscan processes...")
+        returncodes = []
+
+        threads = [threading.Thread(target=self._run_clamscan_shard, args=(shard, stats, returncodes), daemon=True)
+                   for shard in shards]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        if self._stop_event.is_set():
+            return False
+        # 0 = clean and 1 = infected are already reflected in stats
+        if any(code not in (0, 1) for code in returncodes):
+            with self._stats_lock:
+                stats["errors"] += 1
+        return True
+
+    def _run_clamscan_shard(self, shard, stats, returncodes):
+        by_path = {path: (size, st) for path, size, st in shard}
+        proc = None
+        list_fd, list_path = tempfile.mkstemp(prefix="clambite_list_")
+        try:
+            with os.fdopen(list_fd, "w", errors="surrogateescape") as f:
+                for path in by_path:
+                    if "\n" in path:
+                        self._record_result(stats, path, 0, "ERROR", "Unsupported file name")
+                        continue
+                    f.write(path + "\n")
+
+            # Security: Use resolved CLAMSCAN_BIN
+            cmd = [CLAMSCAN_BIN, f'--database={self.db_dir}', '--no-summary', f'--file-list={list_path}']
+            # clamscan loads the database once at startup
+            generation = database_generation()
+            proc = self._popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                               text=True, errors="surrogateescape")
+            # clamscan reports files one after another, so the gap between
+            # two result lines is the time spent on the second file. The
+            # first gap is mostly loading the database and is reported as such.
+            proc_started = time.monotonic()
+            last_line_at = None
+            reported_errors = 0
+            parse_seconds = 0.0
+
+            for line in proc.stdout:
+                if self._stop_event.is_set():
+                    break  # stop() has already signalled the process group
+                if self._budget_spent():
+                    signal_process_group(proc, signal.SIGTERM)
+                    break
+
+                clean_line = line.rstrip("\n")
+                parse_started = time.perf_counter()
+                parsed = parse_clamscan_line(clean_line, by_path)
+                parse_seconds += time.perf_counter() - parse_started
+                if parsed is None:
+                    if clean_line.strip():
+                        self.log(clean_line.strip())
+                    continue
+
+                now = time.monotonic()
+                if last_line_at is None:
+                    self.metrics.add_max("database_load", now - proc_started)
+                    duration = None
+                else:
+                    duration = now - last_line_at
+                last_line_at = now
+                path, verdict, detail = parsed
+                size, st = by_path.get(path, (0, None))
+                if verdict == "ERROR":
+                    reported_errors += 1
+                self._record_result(stats, path, size, verdict, detail, st, generation=generation, duration=duration)
+                self._throttle(size, proc)
+
+            proc.wait()
+            self.metrics.add("parse", parse_seconds)
+            # Per-file errors are already counted; only report the exit code for others
+            returncodes.append(0 if proc.returncode == 2 and reported_errors else proc.returncode)
+        except Exception as e:
+            self.log(f"Clamscan Error: {e}")
+            returncodes.append(2)
+        finally:
+            if proc is not None:
+                self._release(proc)
+            os.unlink(list_path)
+
+    def _clamscan_version(self):
+        try:
+            # Format: ClamAV 1.0.1/27000/Mon Oct 12 08:00:00 2026
+            out = subprocess.run([CLAMSCAN_BIN, '--version'], capture_output=True, text=True, timeout=30).stdout
+        except (OSError, subprocess.SubprocessError):
+            return "N/A"
+        return out.split("/")[0].replace("ClamAV", "").strip() or "N/A"
+
+    def _record_result(self, stats, path, size, verdict, detail, st=None, duplicate=False, generation=None,
+                       duration=None):
+        """
+        Merges one file's verdict into stats and logs it in clamscan's format.
+        st: the stat taken before scanning, used to update the scan cache.
+        duplicate: the verdict was inherited from an identical file, not scanned.
+        generation: database_generation() when the engine started on the file.
+        duration: seconds the engine spent on the file, if known.
+        Returns the (stats delta, flagged result, infection) kept for the checkpoint.
+        """
+        if self._cache and st is not None:
+            try:
+                if verdict == "OK":
+                    self._cache.add(st, self._db_version)
+                elif verdict == "FOUND":
+                    self._cache.discard(st)
+            except sqlite3.Error:
+                pass
+
+        delta = {}
+        if verdict in ("OK", "FOUND"):
+            if not duplicate:
+                delta["files"] = 1
+                delta["bytes"] = size
+            if "covered" in stats:
+                delta["covered"] = 1
+            if verdict == "FOUND":
+                delta["infected"] = 1
+        else:
+            delta["errors"] = 1
+        result = make_result(path, verdict, detail, size, None if duplicate else duration)
+        outcome = (delta, result if verdict != "OK" else None, (path, detail) if verdict == "FOUND" else None)
+
+        with self._stats_lock:
+            for name, value in delta.items():
+                stats[name] += value
+            if verdict == "FOUND":
+                self.infections.append((path, detail))
+            if verdict != "OK" and not duplicate:
+                self._flagged[path] = (verdict, detail)
+            # Only while an update could make the verdict stale, so long scans do not hold every clean file
+            if (verdict == "OK" and generation is not None and self.recheck_after_update
+                    and not self._rechecking and (updates_in_flight() or generation != database_generation())):
+                self._scanned_clean.append((path, size, st, generation))
+
+        if self._rechecking:
+            # Already counted and logged as clean by the first pass
+            if verdict == "OK":
+                return outcome
+        else:
+            if self._checkpoint is not None:
+                self._checkpoint.complete(path, *outcome)
+            if not duplicate:
+                self._advance_progress(1, size)
+                if self._checkpoint is not None:
+                    self._release_copies(stats, path, generation)
+
+        self._add_result(result)
+        if verdict == "OK":
+            self.log(f"{path}: OK")
+        elif verdict == "FOUND":
+            if not duplicate:
+                self.metrics.detection()
+            self.log(f"{path}: {detail} FOUND")
+            self.update_ui("dialog-warning-symbolic", "Threat Found!", f"Infected: {os.path.basename(path)}")
+        else:
+            self.log(f"{path}: {detail} ERROR")
+        return outcome
+
+    def _add_result(self, result):
+        """Keeps a per-file record for the report and streams it to on_results."""
+        self.results.add(result)
+        self._log_sink.add_result(result)
+        if result.duration:
+            self.metrics.add("file_scan", result.duration)
+
+    def _record_skip(self, stats, key, rule, size=None):
+        """Counts a file (with its size) or folder (size=None) the scan profile keeps from the engine."""
+        if size is None:
+            delta = {f"skip_dirs:{rule}": 1}
+        else:
+            delta = {f"skip_files:{rule}": 1, f"skip_bytes:{rule}": size}
+        with self._stats_lock:
+            for name, value in delta.items():
+                stats[name] = stats.get(name, 0) + value
+        self._checkpoint.done(key, delta)
+
+    def _record_walk_error(self, path, message, stats, key):
+        self.log(f"{path}: {message} ERROR")
+        result = make_result(path, "ERROR", message)
+        self._add_result(result)
+        self._checkpoint.done(key, {"errors": 1}, result)
+        with self._stats_lock:
+            stats["errors"] += 1
+
+    def run_stream_scan(self):
+        """
+        Scans a large file in overlapping windows read straight from an mmap
+        of the original file and streamed to clamd, so nothing is written to disk.
+        """
+        self.update_ui("system-search-symbolic", "Scanning...", f"Target: {os.path.basename(self.target_path)}")
+        self.log(f"--- Starting Scan: {self.target_path} ---")
+
+        stats = {"dirs": 0, "files": 0, "infected": 0, "errors": 0, "bytes": 0}
+        start_time = time.time()
+        started = time.monotonic()
+        fd = None
+        found = error = None
+
+        try:
+            # Security: O_NOFOLLOW so a swapped-in symlink is not followed
+            fd = os.open(self._file_path, os.O_RDONLY | os.O_NOFOLLOW)
+            st = os.fstat(fd)
+            if not stat.S_ISREG(st.st_mode):
+                self.log(f"{self.target_path}: Not a regular file ERROR")
+                return False
+
+            windows = list(iter_windows(st.st_size, STREAM_WINDOW, self.stream_overlap))
+            self.log(f"Streaming {len(windows)} windows ({self.stream_overlap} bytes overlap)...")
+
+            with self.metrics.phase("stream"), mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mm:
+                if hasattr(mm, "madvise"):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+
+                with memoryview(mm) as view:
+                    for index, (start, end) in enumerate(windows, 1):
+                        # Pause between windows: clamd drops streams that stall mid-window
+                        if not self._wait_if_paused():
+                            return False
+
+                        if not self._throttle(end - start):
+                            return False
+
+                        self.update_ui("system-search-symbolic", "Scanning...", f"Window {index}/{len(windows)}")
+                        with self._stats_lock:
+                            self._progress["bytes"] = start
+                        self._report_progress(force=True, total_files=1, total_bytes=st.st_size)
+                        result = self.clamd.client.instream(view[start:end], self._stop_event, self._track_socket)
+                        if result is None or self._stop_event.is_set():
+                            return False
+
+                        verdict, detail = result
+                        if verdict == "FOUND":
+                            found = detail
+                            stats["infected"] = 1
+                            self.infections.append((self.target_path, detail))
+                            self.metrics.detection()
+                            self.log(f"{self.target_path}: {detail} FOUND")
+                            self.log(f"Detected in window {index} (bytes {start}-{end}).")
+                            self.update_ui("dialog-warning-symbolic", "Threat Found!", f"Infected: {os.path.basename(self.target_path)}")
+                            break
+                        elif verdict == "ERROR":
+                            error = error or f"{detail} (window {index})"
+                            stats["errors"] += 1
+                            self.log(f"{self.target_path}: {detail} ERROR (window {index})")
+
+            if stats["infected"] == 0 and stats["errors"] == 0:
+                self.log(f"{self.target_path}: OK")
+            stats["files"] = 1
+            stats["bytes"] = st.st_size
+            with self._stats_lock:
+                self._progress["bytes"] = 0
+            self._advance_progress(1, st.st_size)
+            if found is not None:
+                outcome = ("FOUND", found)
+            elif error is not None:
+                outcome = ("ERROR", error)
+            else:
+                outcome = ("OK", "")
+            self._add_result(make_result(self.target_path, *outcome, st.st_size, time.monotonic() - started))
+
+        except (OSError, ValueError) as e:
+            self.log(f"Stream Error: {e}")
+            return False
+        finally:
+            if fd is not None:
+                os.close(fd)
+
+        return self._report_engine_summary(stats, start_time, self.clamd.client.version())
+
     def run_split_scan(self):
+        """Fallback for clamscan: copies overlapping windows to temporary chunk files."""
         self.update_ui("edit-cut-symbolic", "Large File Detected", "Splitting file for scanning...")
         self.log(f"--- Splitting Large File: {self.target_path} ---")
 
@@ -324,7 +2234,7 @@ class ScannerThread(threading.Thread):
 
         try:
             # Security: Disk Exhaustion Check
-            required_space = os.path.getsize(self.target_path)
+            required_space = os.path.getsize(self._file_path)
             # Add 5% overhead safety margin
             required_space += required_space * 0.05
             
@@ -334,15 +2244,15 @@ class ScannerThread(threading.Thread):
                  return False
 
             # Split logic
-            chunk_size = 50 * 1024 * 1024 # 50MB
             part_num = 1
 
-            with open(self.target_path, 'rb') as source:
-                while True:
-                    if self._stop_event.is_set():
+            with self.metrics.phase("split"), open(self._file_path, 'rb') as source:
+                size = os.fstat(source.fileno()).st_size
+                for start, end in iter_windows(size, STREAM_WINDOW, self.stream_overlap):
+                    if not self._wait_if_paused() or not self._throttle(end - start):
                         return False
 
-                    chunk = source.read(chunk_size)
+                    chunk = os.pread(source.fileno(), end - start, start)
                     if not chunk:
                         break
 
@@ -361,7 +2271,7 @@ class ScannerThread(threading.Thread):
             # Security: Use resolved CLAMSCAN_BIN
             # Security: Use -- to prevent argument injection
             cmd = [CLAMSCAN_BIN, f'--database={self.db_dir}', '-r', '--', temp_dir]
-            return self._execute_clamscan(cmd)
+            return self._execute_clamscan(cmd, report_as=self.target_path)
 
         except Exception as e:
             self.log(f"Split Error: {e}")
@@ -370,17 +2280,211 @@ class ScannerThread(threading.Thread):
             self.log("Cleaning up temporary chunks...")
             shutil.rmtree(temp_dir, ignore_errors=True)
 
-    def _execute_clamscan(self, cmd):
-        infected_found = False
+    def _use_clamd(self):
+        if self.engine != "clamd":
+            self.metrics.engine = "clamscan"
+            return False
+        started = time.perf_counter()
+        ready = self.clamd.ensure_running(self.log, self._stop_event)
+        self.metrics.add_max("database_load", time.perf_counter() - started)
+        self.metrics.engine = "clamd" if ready else "clamscan"
+        if ready:
+            return True
+        if not self._stop_event.is_set():
+            self.log("Clamd unavailable, falling back to clamscan.")
+        return False
+
+    def _walk_files(self, root, stats, target_index=0):
+        """
+        Yields (path, size, stat) for regular files below root without
+        following symlinks, counting visited directories in stats['dirs'].
+        Entries are visited in name order, each directory's contents right
+        after it, so a checkpoint position marks everything before it; when
+        resuming, files and whole subtrees up to that position are skipped.
+        Files and folders the scan profile excludes are counted, not yielded.
+        """
+        position = self._resume_position
+        frames = []  # (iterator over a directory's sorted entries, its components)
+        scan_filter = self._filter
+        try:
+            root_dev = os.stat(root).st_dev
+        except OSError:
+            root_dev = None
+
+        def enter(path, components):
+            key = walk_key(target_index, components)
+            if position is not None and key <= position:
+                counted = True  # Counted by the interrupted run
+            else:
+                counted = False
+                stats["dirs"] += 1
+                self._checkpoint.done(key, {"dirs": 1})
+            try:
+                with os.scandir(path) as it:
+                    entries = sorted(it, key=lambda e: e.name)
+            except OSError as e:
+                if not counted:
+                    self._record_walk_error(path, e.strerror, stats, key)
+                return
+            frames.append((iter(entries), components))
+
+        enter(root, ())
+        while frames:
+            if not self._wait_if_paused():
+                return
+            entries, parent = frames[-1]
+            entry = next(entries, None)
+            if entry is None:
+                frames.pop()
+                continue
+
+            components = parent + (entry.name,)
+            key = walk_key(target_index, components)
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if subtree_done(position, key):
+                        continue
+                    rule = scan_filter and scan_filter.check_dir(
+                        entry.path, entry.name, entry.stat(follow_symlinks=False), root_dev)
+                    if rule:
+                        self._record_skip(stats, key, rule)
+                    else:
+                        enter(entry.path, components)
+                elif entry.is_file(follow_symlinks=False):
+                    if position is not None and key <= position:
+                        continue
+                    st = entry.stat(follow_symlinks=False)
+                    rule = scan_filter and scan_filter.check_file(entry.path, entry.name, st)
+                    if rule:
+                        self._record_skip(stats, key, rule, st.st_size)
+                        continue
+                    self._walk_position = key
+                    self._checkpoint.begin(key, entry.path, st.st_size)
+                    yield entry.path, st.st_size, st
+            except OSError:
+                continue
+
+    def add_targets(self, paths):
+        """
+        Appends paths to a running 'scan_batch'. Returns False once the walk
+        has moved past its last target and can no longer take new ones.
+        """
+        with self._targets_lock:
+            if self._targets_closed:
+                return False
+            self.targets.extend(paths)
+            return True
+
+    def _walk_targets(self, stats):
+        """
+        Yields (path, size, stat) for every file of a batch: files given
+        directly, then the contents of given folders. Targets added while
+        the walk runs are picked up until it reaches the end of the list.
+        """
+        position = self._resume_position
+        index = 0
+        while True:
+            with self._targets_lock:
+                if index >= len(self.targets):
+                    self._targets_closed = True
+                    return
+                target = self.targets[index]
+            index += 1
+            key = walk_key(index - 1, ())
+            if self._stop_event.is_set() or subtree_done(position, key):
+                continue
+
+            try:
+                # Explicit targets are followed like clamscan's own arguments
+                st = os.stat(target)
+            except OSError as e:
+                if position is None or key > position:
+                    self._record_walk_error(target, e.strerror, stats, key)
+                continue
+
+            if stat.S_ISDIR(st.st_mode):
+                yield from self._walk_files(target, stats, index - 1)
+            elif stat.S_ISREG(st.st_mode) and (position is None or key > position):
+                # clamd does not follow file symlinks, so it gets the file they point to
+                path = os.path.realpath(target)
+                self._walk_position = key
+                self._checkpoint.begin(key, path, st.st_size)
+                yield path, st.st_size, st
+
+    def _execute_clamd(self, target):
+        """Scans a single file through the warm clamd, producing clamscan-style output."""
+        stats = {"dirs": 0, "files": 0, "infected": 0, "errors": 0, "bytes": 0}
+        start_time = time.time()
+
+        try:
+            started = time.monotonic()
+            verdict, detail = self.clamd.client.scan(self._file_path, self._track_socket)
+            if self._stop_event.is_set():
+                return False  # The reply was cut off by stop(), not produced by the engine
+            self._record_result(stats, target, os.path.getsize(target), verdict, detail,
+                                duration=time.monotonic() - started)
+        except OSError as e:
+            if not self._stop_event.is_set():
+                self.log(f"Clamd Error: {e}")
+            return False
+
+        return self._report_engine_summary(stats, start_time, self.clamd.client.version())
+
+    def _report_engine_summary(self, stats, start_time, engine_version):
+        """Logs a clamscan-style summary for merged scan stats and records the verdict."""
+        self.update_ui("mail-send-receive-symbolic", "Finalizing", "Calculating statistics...")
+        known = sum(db["signatures"] for db in read_database_info(self.db_dir).values())
+        summary = format_scan_summary(stats, engine_version, known or "N/A", start_time, time.time())
+        for line in summary:
+            self.log(line)
+        self.scan_summary.extend(summary)
+
+        if stats["infected"]:
+            returncode = 1
+        elif stats["errors"]:
+            returncode = 2
+        else:
+            returncode = 0
+        return self._finish_scan(returncode)
+
+    def _finish_scan(self, returncode):
+        """Records the final verdict line shared by every engine."""
+        self.returncode = returncode
+        if returncode == 1:
+            msg = "Scan finished: INFECTION FOUND."
+            self.log(msg)
+            self.scan_summary.append(msg)
+            return False
+        elif returncode == 0:
+            msg = "Scan finished: Clean."
+            self.log(msg)
+            self.scan_summary.append(msg)
+            return True
+        else:
+            self.log(f"Scan error code: {returncode}")
+            return False
+
+    def _execute_clamscan(self, cmd, report_as=None):
+        """
+        Runs clamscan on cmd, logging its output and turning its per-file
+        lines into result records. report_as: path the verdict belongs to
+        when clamscan scans stand-in files (the chunks of a split scan);
+        the chunks are then reported as one record.
+        """
         capturing_summary = False
+        outcome = None  # (verdict, detail) of the report_as file
+        last_line_at = None
+        parse_seconds = 0.0
+        proc = None
 
         try:
-            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+            proc = self._popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                               text=True, errors="surrogateescape")
+            proc_started = time.monotonic()
             
             for line in proc.stdout:
                 if self._stop_event.is_set():
-                    proc.terminate()
-                    return False
+                    break  # stop() has already signalled the process group
                 
                 clean_line = line.strip()
                 self.log(clean_line)
@@ -391,59 +2495,239 @@ class ScannerThread(threading.Thread):
                 
                 if capturing_summary:
                     self.scan_summary.append(clean_line)
+                    if "Data scanned" in clean_line:
+                        self.update_ui("mail-send-receive-symbolic", "Finalizing", "Calculating statistics...")
+                    continue
 
-                if "FOUND" in clean_line and not capturing_summary:
-                    infected_found = True
-                    fname = clean_line.split(':')[0]
-                    short_name = os.path.basename(fname)
-                    self.update_ui("dialog-warning-symbolic", "Threat Found!", f"Infected: {short_name}")
-                elif clean_line.startswith("Scanning"):
-                    pass
-                elif "Data scanned" in clean_line:
-                    self.update_ui("mail-send-receive-symbolic", "Finalizing", "Calculating statistics...")
+                parse_started = time.perf_counter()
+                parsed = parse_clamscan_line(line.rstrip("\n"))
+                parse_seconds += time.perf_counter() - parse_started
+                if parsed is None:
+                    continue
+                path, verdict, detail = parsed
+
+                # The first line also covers loading the database (see _run_clamscan_shard)
+                now = time.monotonic()
+                if last_line_at is None:
+                    self.metrics.add_max("database_load", now - proc_started)
+                    duration = None
+                else:
+                    duration = now - last_line_at
+                last_line_at = now
+
+                if report_as is not None:
+                    # Keep the first detection, else the first error
+                    if verdict == "FOUND" and (outcome is None or outcome[0] != "FOUND"):
+                        outcome = (verdict, detail)
+                    elif verdict == "ERROR" and outcome is None:
+                        outcome = (verdict, f"{detail} ({os.path.basename(path)})")
+                    path = report_as
+                else:
+                    try:
+                        size = os.lstat(path).st_size
+                    except OSError:
+                        size = 0
+                    self._add_result(make_result(path, verdict, detail, size, duration))
+                    self._advance_progress(1, size)
+
+                if verdict == "FOUND":
+                    self.infections.append((path, detail))
+                    self.metrics.detection()
+                    self.update_ui("dialog-warning-symbolic", "Threat Found!", f"Infected: {os.path.basename(path)}")
 
             proc.wait()
-            
-            if proc.returncode == 1:
-                msg = "Scan finished: INFECTION FOUND."
-                self.log(msg)
-                self.scan_summary.append(msg)
-                return False
-            elif proc.returncode == 0:
-                msg = "Scan finished: Clean."
-                self.log(msg)
-                self.scan_summary.append(msg)
-                return True
-            else:
-                self.log(f"Scan error code: {proc.returncode}")
+            if self._stop_event.is_set():
                 return False
+            if report_as is not None:
+                try:
+                    size = os.path.getsize(report_as)
+                except OSError:
+                    size = 0
+                if outcome is None:
+                    outcome = ("OK", "") if proc.returncode == 0 else ("ERROR", f"clamscan exited with code {proc.returncode}")
+                self._add_result(make_result(report_as, *outcome, size))
+                self._advance_progress(1, size)
+            self.metrics.add("parse", parse_seconds)
+            return self._finish_scan(proc.returncode)
 
         except Exception as e:
             self.log(f"Clamscan Error: {e}")
             return False
+        finally:
+            if proc is not None:
+                self._release(proc)
 
     def log(self, msg):
         if not self._stop_event.is_set():
-            GLib.idle_add(self.on_log, msg)
-            self.full_log.append(msg)
-            try:
-                # Security: Symlink Defense & Secure Permissions
-                # O_NOFOLLOW: fail if path is a symlink
-                # O_CREAT: create if missing
-                # O_APPEND: append to end
-                # 0o600: Read/Write for owner only
-                fd = os.open(self.log_filename, os.O_WRONLY | os.O_CREAT | os.O_APPEND | os.O_NOFOLLOW, 0o600)
-                with os.fdopen(fd, "a") as f:
-                    f.write(msg + "\n")
-            except OSError:
-                # Silently ignore log errors to prevent crashing scan
-                pass
-            except Exception:
-                pass
+            self._log_sink.write(msg)
 
     def update_ui(self, icon, title, subtitle):
         if not self._stop_event.is_set():
-            GLib.idle_add(self.on_status, icon, title, subtitle)
+            self.dispatch(self.on_status, icon, title, subtitle)
+
+    def _popen(self, cmd, **kwargs):
+        """
+        Starts an engine process in its own process group, so stop() and
+        pause() reach it and anything it spawns. Paired with _release().
+        """
+        proc = subprocess.Popen(cmd, start_new_session=True, **kwargs)
+        with self._engine_lock:
+            self._procs.add(proc)
+            apply_to_process_group(proc.pid, self.resources)
+            self._nice_floor = max(self._nice_floor or 0, self.resources.nice)
+            if self._stop_event.is_set():
+                signal_process_group(proc, signal.SIGTERM)
+            elif self._paused_at is not None:
+                signal_process_group(proc, signal.SIGSTOP)
+        return proc
+
+    def _release(self, proc):
+        with self._engine_lock:
+            self._procs.discard(proc)
+
+    @contextlib.contextmanager
+    def _track_socket(self, sock):
+        """Registers a clamd connection for the duration of the block so stop() can shut it down."""
+        with self._engine_lock:
+            self._sockets.add(sock)
+        try:
+            yield sock
+        finally:
+            with self._engine_lock:
+                self._sockets.discard(sock)
+
+    def _wait_if_paused(self):
+        """Blocks while the run is paused. Returns False once it is stopped."""
+        self._resume_event.wait()
+        return not self._stop_event.is_set()
+
+    @property
+    def paused(self):
+        return self._paused_at is not None
+
+    def pause(self):
+        """
+        Holds the run: clamscan and freshclam processes are stopped with
+        SIGSTOP, clamd workers and the tree walk wait before their next
+        file (files already sent to clamd still finish).
+        """
+        with self._engine_lock:
+            if self._stop_event.is_set() or self._paused_at is not None:
+                return
+            self._paused_at = time.monotonic()
+            self._resume_event.clear()
+            for proc in self._procs:
+                signal_process_group(proc, signal.SIGSTOP)
+        self.log("--- Paused ---")
+        self.update_ui("media-playback-pause-symbolic", "Paused", os.path.basename(self.target_path or ""))
+
+    def resume(self):
+        with self._engine_lock:
+            if self._paused_at is None:
+                return
+            paused_for = time.monotonic() - self._paused_at
+            self._paused_seconds += paused_for
+            self._paused_at = None
+            for proc in self._procs:
+                signal_process_group(proc, signal.SIGCONT)
+            self._resume_event.set()
+        self.metrics.add("paused", paused_for)
+        self.log("--- Resumed ---")
+        self.update_ui("system-search-symbolic", "Scanning...", os.path.basename(self.target_path or ""))
 
     def stop(self):
-        self._stop_event.set()
+        """
+        Cancels the run right away: engine process groups get SIGTERM (and
+        SIGKILL after STOP_GRACE_SECONDS), clamd connections are shut down
+        and a paused run is released so its threads can exit.
+        """
+        with self._engine_lock:
+            self._stop_event.set()
+            if self._paused_at is not None:
+                self._paused_seconds += time.monotonic() - self._paused_at
+                self._paused_at = None
+            procs = list(self._procs)
+            sockets = list(self._sockets)
+        for proc in procs:
+            signal_process_group(proc, signal.SIGTERM)
+            # A stopped process only acts on SIGTERM once continued
+            signal_process_group(proc, signal.SIGCONT)
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self._resume_event.set()
+        self._gate.wake()
+        if procs:
+            timer = threading.Timer(STOP_GRACE_SECONDS, self._kill_engines)
+            timer.daemon = True
+            timer.start()
+
+    @property
+    def uses_clamd(self):
+        return self.metrics.engine == "clamd"
+
+    def reachable_profiles(self):
+        """
+        Profiles this scan can still fully switch to: once an engine was
+        niced, only those at least as nice (see lower_cpu_priority).
+        """
+        with self._engine_lock:
+            floor = self._nice_floor
+        return [name for name in PROFILE_ORDER if floor is None or PROFILES[name].nice >= floor]
+
+    def set_profile(self, name):
+        """Switches the requested resource profile of a running scan."""
+        if name in self.reachable_profiles() and name != self.profile:
+            self.profile = name
+            self.metrics.profile = name
+            governor.refresh()
+
+    def apply_resources(self, profile, reason=""):
+        """
+        Puts a profile into effect (called by the governor): priorities of
+        running engine processes, the worker limit and the read rate. The
+        nice value of running engines can only go up, see lower_cpu_priority().
+        """
+        with self._engine_lock:
+            changed = profile != self.resources
+            self.resources = profile
+            for proc in self._procs:
+                apply_to_process_group(proc.pid, profile)
+            if self._procs:
+                self._nice_floor = max(self._nice_floor or 0, profile.nice)
+        self._limiter.set_rate(profile.read_rate)
+        self._gate.set_limit(worker_limit(profile, self.workers))
+        if changed:
+            self.log(f"--- Resources: {profile.label}{f' ({reason})' if reason else ''} ---")
+
+    def _throttle(self, size, proc=None):
+        """
+        Waits as long as the profile's read rate requires before size more
+        bytes are read. proc: a clamscan process reading on its own, which
+        is held with SIGSTOP for the wait. Returns False once stopped.
+        """
+        delay = self._limiter.reserve(size)
+        if delay <= 0:
+            return not self._stop_event.is_set()
+        if proc is not None:
+            with self._engine_lock:
+                if self._paused_at is None and not self._stop_event.is_set():
+                    signal_process_group(proc, signal.SIGSTOP)
+        self._stop_event.wait(delay)
+        self.metrics.add("throttled", delay)
+        if proc is not None:
+            with self._engine_lock:
+                # Not behind a user pause, or a stop that already sent SIGCONT
+                if self._paused_at is None and not self._stop_event.is_set():
+                    signal_process_group(proc, signal.SIGCONT)
+        return not self._stop_event.is_set()
+
+    def _kill_engines(self):
+        """Escalation after stop(): kills engine process groups that ignored SIGTERM."""
+        with self._engine_lock:
+            procs = list(self._procs)
+        for proc in procs:
+            if proc.poll() is None:
+                signal_process_group(proc, signal.SIGKILL)
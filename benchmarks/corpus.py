@@ -0,0 +1,113 @@
+"""
+Synthetic file trees for the benchmarks. Every tree is described by a
+profile and built deterministically, so two runs of a scenario scan the
+same bytes.
+"""
+
+import os
+import random
+
+from benchmarks.fake_engine import EICAR
+
+# name -> parameters of build_tree
+PROFILES = {
+    # Typical home folder: many small files, a few duplicates and detections
+    "small_files": {"small_files": 5000, "small_size": 4096, "depth": 3, "fanout": 8,
+                    "duplicates": 250, "eicar": 5},
+    # Deep nesting with few files per directory (walk-bound)
+    "deep_tree": {"small_files": 2000, "small_size": 1024, "depth": 12, "fanout": 2,
+                  "duplicates": 0, "eicar": 1},
+    # Download folder: a handful of large files next to small ones (engine-bound)
+    "large_files": {"small_files": 200, "small_size": 16384, "depth": 1, "fanout": 4,
+                    "duplicates": 0, "eicar": 1, "large_files": 4, "large_size": 64 * 1024 * 1024},
+    # Clean documents with one dropper that the walk reaches last (risk-first ordering)
+    "late_threat": {"small_files": 5000, "small_size": 4096, "depth": 3, "fanout": 8,
+                    "duplicates": 0, "eicar": 0, "dropper": True},
+}
+
+
+def _directories(root, depth, fanout):
+    """All directories of a tree with depth levels below root and fanout children per level (capped)."""
+    dirs = [root]
+    level = [root]
+    for d in range(depth):
+        next_level = []
+        for parent in level:
+            for i in range(fanout):
+                next_level.append(os.path.join(parent, f"d{d}_{i}"))
+                if len(next_level) >= 512:
+                    break
+            if len(next_level) >= 512:
+                break
+        dirs += next_level
+        level = next_level
+    return dirs
+
+
+def build_tree(root, small_files=0, small_size=4096, depth=1, fanout=4, duplicates=0, eicar=0,
+               large_files=0, large_size=0, dropper=False, seed=1):
+    """
+    Creates the tree under root and returns a manifest: file and byte
+    counts, the number of files containing EICAR and the paths created.
+    Large files are sparse, so they cost little disk space but are read in full.
+    dropper: add an infected executable named to come last in walk order.
+    """
+    rng = random.Random(seed)
+    dirs = _directories(root, depth, fanout)
+    for path in dirs:
+        os.makedirs(path, exist_ok=True)
+
+    manifest = {"files": 0, "bytes": 0, "infected": 0, "duplicates": 0, "paths": []}
+
+    def add(path, data=None, size=None):
+        with open(path, "wb") as f:
+            if data is not None:
+                f.write(data)
+            else:
+                # A distinct head keeps sparse files from being duplicates of each other
+                f.write(rng.getrandbits(64).to_bytes(8, "big"))
+                f.truncate(size)
+        manifest["files"] += 1
+        manifest["bytes"] += len(data) if data is not None else size
+        manifest["paths"].append(path)
+
+    infected_every = small_files // eicar if eicar else 0
+    originals = []
+    for i in range(small_files):
+        data = rng.getrandbits(small_size * 8).to_bytes(small_size, "big")
+        if infected_every and i % infected_every == 0 and manifest["infected"] < eicar:
+            data = data[:small_size // 2] + EICAR + data[small_size // 2:]
+            manifest["infected"] += 1
+        path = os.path.join(dirs[i % len(dirs)], f"file_{i:06d}.bin")
+        add(path, data)
+        originals.append(data)
+
+    for i in range(duplicates):
+        data = originals[rng.randrange(len(originals))]
+        if EICAR in data:
+            manifest["infected"] += 1
+        add(os.path.join(dirs[i % len(dirs)], f"copy_{i:06d}.bin"), data)
+        manifest["duplicates"] += 1
+
+    for i in range(large_files):
+        add(os.path.join(root, f"large_{i:02d}.img"), size=large_size)
+
+    if dropper:
+        add(os.path.join(root, "zz_setup.exe"), b"MZ" + bytes(62) + EICAR)
+        manifest["infected"] += 1
+
+    return manifest
+
+
+def build_profile(root, name):
+    return build_tree(root, **PROFILES[name])
+
+
+def build_large_file(path, size, eicar_at=None):
+    """A sparse file of size bytes, optionally with EICAR written at offset eicar_at."""
+    with open(path, "wb") as f:
+        f.truncate(size)
+        if eicar_at is not None:
+            f.seek(eicar_at)
+            f.write(EICAR)
+    return path
@@ -0,0 +1,329 @@
+"""
+Offline stand-ins for clamscan, freshclam and clamd. They speak the same
+command lines, output formats and socket protocol as ClamAV, detect the
+EICAR test string and spend a configurable amount of time per file, so
+benchmarks exercise ClamBite's own code without a real signature database.
+
+    python -m benchmarks.fake_engine clamscan [--load-seconds S] [--file-ms MS] [--mb-per-second R] ARGS...
+    python -m benchmarks.fake_engine freshclam --datadir=DIR
+    python -m benchmarks.fake_engine clamd --socket PATH --database DIR [--file-ms MS] [--mb-per-second R]
+"""
+
+import argparse
+import os
+import socketserver
+import stat
+import sys
+import time
+
+# Built from two halves so this file is not itself flagged by a scanner
+EICAR = b"X5O!P%@AP[4\\PZX54(P^)7CC)7}$" + b"EICAR-STANDARD-ANTIVIRUS-TEST-FILE!$H+H*"
+EICAR_SIGNATURE = "Eicar-Test-Signature"
+ENGINE_VERSION = "1.0.1"
+
+READ_CHUNK = 1024 * 1024
+
+
+def write_database(db_dir, name, version, signatures, ext="cvd"):
+    """Writes a signature file with a real 512 byte header and no signatures."""
+    header = f"ClamAV-VDB:17 Oct 2026 10-00 +0000:{version}:{signatures}:90:X:X:bench:1792224000"
+    path = os.path.join(db_dir, f"{name}.{ext}")
+    with open(path, "wb") as f:
+        f.write(header.encode("ascii").ljust(512, b" "))
+    return path
+
+
+def read_version(db_dir, name="daily"):
+    for ext in ("cld", "cvd"):
+        try:
+            with open(os.path.join(db_dir, f"{name}.{ext}"), "rb") as f:
+                fields = f.read(512).decode("ascii", errors="replace").split(":")
+            return int(fields[2]), int(fields[3])
+        except (OSError, ValueError, IndexError):
+            continue
+    return 0, 0
+
+
+class Pacer:
+    """Makes the stand-in engines take roughly as long as a real one would."""
+
+    def __init__(self, file_ms=0.0, mb_per_second=0.0):
+        self.file_seconds = file_ms / 1000
+        self.bytes_per_second = mb_per_second * 1024 * 1024
+
+    def wait(self, size):
+        delay = self.file_seconds
+        if self.bytes_per_second:
+            delay += size / self.bytes_per_second
+        if delay > 0:
+            time.sleep(delay)
+
+
+def contains_eicar(chunks):
+    """True if the EICAR string occurs in the byte chunks, including across chunk boundaries."""
+    tail = b""
+    for chunk in chunks:
+        if EICAR in tail + chunk:
+            return True
+        tail = chunk[-(len(EICAR) - 1):]
+    return False
+
+
+def _read_chunks(f):
+    while True:
+        chunk = f.read(READ_CHUNK)
+        if not chunk:
+            return
+        yield chunk
+
+
+def scan_path(path, pacer):
+    """Returns (verdict, detail) like clamd for one file."""
+    try:
+        st = os.stat(path)
+        if not stat.S_ISREG(st.st_mode):
+            return "ERROR", "Not supported file type"
+        with open(path, "rb") as f:
+            infected = contains_eicar(_read_chunks(f))
+    except OSError as e:
+        return "ERROR", f"File path check failure: {e.strerror}."
+    pacer.wait(st.st_size)
+    return ("FOUND", EICAR_SIGNATURE) if infected else ("OK", "")
+
+
+def format_line(path, verdict, detail):
+    if verdict == "OK":
+        return f"{path}: OK"
+    return f"{path}: {detail} {verdict}"
+
+
+# --- clamscan ---
+
+def run_clamscan(argv):
+    parser = argparse.ArgumentParser(prog="clamscan")
+    parser.add_argument("--version", action="store_true")
+    parser.add_argument("--database")
+    parser.add_argument("--no-summary", action="store_true")
+    parser.add_argument("--file-list")
+    parser.add_argument("-r", "--recursive", action="store_true")
+    parser.add_argument("--load-seconds", type=float, default=0.0)
+    parser.add_argument("--file-ms", type=float, default=0.0)
+    parser.add_argument("--mb-per-second", type=float, default=0.0)
+    parser.add_argument("targets", nargs="*")
+    opts = parser.parse_args(argv)
+
+    daily, _ = read_version(opts.database or ".")
+    if opts.version:
+        print(f"ClamAV {ENGINE_VERSION}/{daily}/Sat Oct 17 10:00:00 2026")
+        return 0
+
+    started = time.time()
+    time.sleep(opts.load_seconds)  # Loading the database
+    pacer = Pacer(opts.file_ms, opts.mb_per_second)
+
+    targets = list(opts.targets)
+    if opts.file_list:
+        with open(opts.file_list, errors="surrogateescape") as f:
+            targets += [line.rstrip("\n") for line in f if line.strip()]
+
+    counts = {"dirs": 0, "files": 0, "infected": 0, "errors": 0, "bytes": 0}
+
+    def scan_one(path):
+        verdict, detail = scan_path(path, pacer)
+        print(format_line(path, verdict, detail), flush=True)
+        if verdict == "ERROR":
+            counts["errors"] += 1
+            return
+        counts["files"] += 1
+        counts["bytes"] += os.path.getsize(path)
+        if verdict == "FOUND":
+            counts["infected"] += 1
+
+    for target in targets:
+        if os.path.isdir(target) and opts.recursive:
+            for dirpath, _, names in os.walk(target):
+                counts["dirs"] += 1
+                for name in sorted(names):
+                    scan_one(os.path.join(dirpath, name))
+        else:
+            scan_one(target)
+
+    if not opts.no_summary:
+        elapsed = time.time() - started
+        data_mb = counts["bytes"] / (1024 * 1024)
+        _, signatures = read_version(opts.database or ".", "main")
+        print("")
+        print("----------- SCAN SUMMARY -----------")
+        print(f"Known viruses: {signatures + read_version(opts.database or '.')[1]}")
+        print(f"Engine version: {ENGINE_VERSION}")
+        print(f"Scanned directories: {counts['dirs']}")
+        print(f"Scanned files: {counts['files']}")
+        print(f"Infected files: {counts['infected']}")
+        print(f"Data scanned: {data_mb:.2f} MB")
+        print(f"Data read: {data_mb:.2f} MB (ratio 1.00:1)")
+        print(f"Time: {elapsed:.3f} sec ({int(elapsed // 60)} m {int(elapsed % 60)} s)")
+        print(f"Start Date: {time.strftime('%Y:%m:%d %H:%M:%S', time.localtime(started))}")
+        print(f"End Date:   {time.strftime('%Y:%m:%d %H:%M:%S')}")
+
+    if counts["infected"]:
+        return 1
+    return 2 if counts["errors"] else 0
+
+
+# --- freshclam ---
+
+def run_freshclam(argv):
+    parser = argparse.ArgumentParser(prog="freshclam")
+    parser.add_argument("--config-file")
+    parser.add_argument("--datadir", required=True)
+    parser.add_argument("--download-seconds", type=float, default=0.0)
+    opts = parser.parse_args(argv)
+
+    daily, daily_sigs = read_version(opts.datadir)
+    main_version, main_sigs = read_version(opts.datadir, "main")
+    bytecode, bytecode_sigs = read_version(opts.datadir, "bytecode")
+
+    print(f"ClamAV update process started at {time.strftime('%a %b %d %H:%M:%S %Y')}", flush=True)
+    print(f"daily database available for update (local version: {daily}, remote version: {daily + 1})", flush=True)
+    print(f"Downloading daily-{daily + 1}.cdiff [100%]", flush=True)
+    time.sleep(opts.download_seconds)
+    for ext in ("cvd", "cld"):
+        try:
+            os.unlink(os.path.join(opts.datadir, f"daily.{ext}"))
+        except FileNotFoundError:
+            pass
+    write_database(opts.datadir, "daily", daily + 1, daily_sigs + 1000, ext="cld")
+    print("Testing database: ... Database test passed.", flush=True)
+    print(f"daily.cld updated (version: {daily + 1}, sigs: {daily_sigs + 1000}, f-level: 90, builder: bench)")
+    print(f"main.cvd database is up-to-date (version: {main_version}, sigs: {main_sigs}, f-level: 90, builder: bench)")
+    print(f"bytecode.cvd database is up-to-date (version: {bytecode}, sigs: {bytecode_sigs}, f-level: 90, builder: bench)")
+    return 0
+
+
+# --- clamd ---
+
+class ClamdHandler(socketserver.BaseRequestHandler):
+    """Serves the null-terminated command form used by backend.ClamdClient."""
+
+    def setup(self):
+        self._buffer = b""
+
+    def _read_command(self):
+        while b"\0" not in self._buffer:
+            data = self.request.recv(65536)
+            if not data:
+                return None
+            self._buffer += data
+        command, self._buffer = self._buffer.split(b"\0", 1)
+        return command[1:] if command.startswith(b"z") else command
+
+    def _read_exact(self, count):
+        while len(self._buffer) < count:
+            data = self.request.recv(max(65536, count - len(self._buffer)))
+            if not data:
+                raise ConnectionError("client closed the stream")
+            self._buffer += data
+        data, self._buffer = self._buffer[:count], self._buffer[count:]
+        return data
+
+    def _reply(self, text):
+        self.request.sendall(os.fsencode(text) + b"\0")
+
+    def _instream(self):
+        def chunks():
+            while True:
+                size = int.from_bytes(self._read_exact(4), "big")
+                if size == 0:
+                    return
+                yield self._read_exact(size)
+
+        total = 0
+        infected = False
+        tail = b""
+        for chunk in chunks():
+            total += len(chunk)
+            if not infected and EICAR in tail + chunk:
+                infected = True
+            tail = chunk[-(len(EICAR) - 1):]
+        self.server.pacer.wait(total)
+        return f"stream: {EICAR_SIGNATURE} FOUND" if infected else "stream: OK"
+
+    def _answer(self, command):
+        if command == b"PING":
+            return "PONG"
+        if command == b"VERSION":
+            daily, _ = read_version(self.server.database)
+            return f"ClamAV {ENGINE_VERSION}/{daily}/Sat Oct 17 10:00:00 2026"
+        if command == b"RELOAD":
+            return "RELOADING"
+        if command.startswith(b"SCAN "):
+            path = os.fsdecode(command[len(b"SCAN "):])
+            return format_line(path, *scan_path(path, self.server.pacer))
+        if command == b"INSTREAM":
+            return self._instream()
+        return "UNKNOWN COMMAND"
+
+    def handle(self):
+        try:
+            self._serve()
+        except (ConnectionError, ValueError):
+            pass  # The client went away, e.g. a cancelled scan
+
+    def _serve(self):
+        command = self._read_command()
+        if command is None:
+            return
+        if command != b"IDSESSION":
+            self._reply(self._answer(command))
+            return
+
+        request_id = 0
+        while True:
+            command = self._read_command()
+            if command is None or command == b"END":
+                return
+            request_id += 1
+            self._reply(f"{request_id}: {self._answer(command)}")
+
+
+class FakeClamd(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, database, pacer):
+        self.database = database
+        self.pacer = pacer
+        super().__init__(socket_path, ClamdHandler)
+
+
+def run_clamd(argv):
+    parser = argparse.ArgumentParser(prog="clamd")
+    parser.add_argument("--socket", required=True)
+    parser.add_argument("--database", required=True)
+    parser.add_argument("--file-ms", type=float, default=0.0)
+    parser.add_argument("--mb-per-second", type=float, default=0.0)
+    opts = parser.parse_args(argv)
+
+    if os.path.exists(opts.socket):
+        os.unlink(opts.socket)
+    server = FakeClamd(opts.socket, opts.database, Pacer(opts.file_ms, opts.mb_per_second))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+ENGINES = {"clamscan": run_clamscan, "freshclam": run_freshclam, "clamd": run_clamd}
+
+
+def main(argv):
+    if len(argv) < 2 or argv[1] not in ENGINES:
+        print(__doc__.strip(), file=sys.stderr)
+        return 2
+    return ENGINES[argv[1]](argv[2:])
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
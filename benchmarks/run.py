@@ -0,0 +1,461 @@
+"""
+Offline benchmark suite. Scans run through the real ScannerThread against
+stand-in engines (benchmarks/fake_engine.py) in a throwaway HOME, so no
+ClamAV installation, database or network is needed.
+
+    python -m benchmarks.run                          # every scenario
+    python -m benchmarks.run scan_clamd parsers       # selected scenarios
+    python -m benchmarks.run --scale 0.1              # smaller corpora, quicker run
+    python -m benchmarks.run --compare benchmarks/results/<commit>.json
+
+Results are saved as benchmarks/results/<commit>.json so runs of two
+commits can be compared. Compare runs made with the same --scale only.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import backend
+import quickscan
+from history import HistoryStore
+from parsers import ScanParser, UpdateParser
+from results import parse_clamscan_line
+
+from benchmarks import corpus, fake_engine
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_DIR, "benchmarks", "results")
+
+# Time the stand-in engines spend per file and per MB, close to a warm clamd
+ENGINE_FILE_MS = 0.2
+ENGINE_MB_PER_SECOND = 400.0
+# Database load time of each stand-in clamscan process
+CLAMSCAN_LOAD_SECONDS = 1.0
+
+
+def _direct_dispatch(fn, *args):
+    fn(*args)
+
+
+class BenchEnv:
+    """
+    A throwaway HOME holding a fake signature database, executables for the
+    stand-in clamscan and freshclam, and optionally a stand-in clamd on the
+    socket ScannerThread looks for. backend is pointed at them until close().
+    """
+
+    def __init__(self):
+        self.root = tempfile.mkdtemp(prefix="clambite_bench_")
+        self._saved_home = os.environ.get("HOME")
+        self._saved_bins = (backend.CLAMSCAN_BIN, backend.FRESHCLAM_BIN, backend.CLAMD_BIN)
+        self._saved_threshold = backend.LARGE_FILE_THRESHOLD
+        self._corpora = {}
+        self._clamd = None
+
+        # ScannerThread keeps everything under ~/.config/clambite
+        os.environ["HOME"] = self.root
+        self.base_dir = os.path.join(self.root, ".config", "clambite")
+        self.db_dir = os.path.join(self.base_dir, "clamav-db", "db")
+        os.makedirs(self.db_dir, mode=0o700)
+        fake_engine.write_database(self.db_dir, "daily", 27000, 2065000)
+        fake_engine.write_database(self.db_dir, "main", 62, 6647427)
+        fake_engine.write_database(self.db_dir, "bytecode", 334, 90)
+
+        bin_dir = os.path.join(self.root, "bin")
+        os.makedirs(bin_dir)
+        backend.CLAMSCAN_BIN = self._wrapper(bin_dir, "clamscan", [
+            f"--load-seconds={CLAMSCAN_LOAD_SECONDS}", f"--file-ms={ENGINE_FILE_MS}",
+            f"--mb-per-second={ENGINE_MB_PER_SECOND}"])
+        backend.FRESHCLAM_BIN = self._wrapper(bin_dir, "freshclam", [])
+        backend.CLAMD_BIN = None  # Only the stand-in daemon started below is used
+
+    @staticmethod
+    def _wrapper(bin_dir, engine, options):
+        path = os.path.join(bin_dir, engine)
+        with open(path, "w") as f:
+            f.write("#!/bin/sh\n")
+            f.write(f'cd "{REPO_DIR}" && exec "{sys.executable}" -m benchmarks.fake_engine {engine} '
+                    f'{" ".join(options)} "$@"\n')
+        os.chmod(path, 0o700)
+        return path
+
+    def start_clamd(self):
+        if self._clamd is not None:
+            return
+        run_dir = os.path.join(self.base_dir, "clamd")
+        os.makedirs(run_dir, mode=0o700, exist_ok=True)
+        socket_path = os.path.join(run_dir, "clamd.sock")
+        self._clamd = subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.fake_engine", "clamd", "--socket", socket_path,
+             "--database", self.db_dir, f"--file-ms={ENGINE_FILE_MS}", f"--mb-per-second={ENGINE_MB_PER_SECOND}"],
+            cwd=REPO_DIR)
+        client = backend.ClamdClient(socket_path)
+        deadline = time.monotonic() + 10
+        while not client.ping():
+            if time.monotonic() > deadline or self._clamd.poll() is not None:
+                raise RuntimeError("stand-in clamd did not start")
+            time.sleep(0.05)
+
+    def corpus(self, profile, scale):
+        """Builds a corpus profile once per run, scaled in file counts."""
+        if profile not in self._corpora:
+            params = dict(corpus.PROFILES[profile])
+            for key in ("small_files", "duplicates"):
+                params[key] = max(1, int(params[key] * scale)) if params[key] else 0
+            root = os.path.join(self.root, "corpus", profile)
+            self._corpora[profile] = (root, corpus.build_tree(root, **params))
+        return self._corpora[profile]
+
+    def close(self):
+        if self._clamd is not None:
+            self._clamd.terminate()
+            self._clamd.wait()
+        backend.CLAMSCAN_BIN, backend.FRESHCLAM_BIN, backend.CLAMD_BIN = self._saved_bins
+        backend.LARGE_FILE_THRESHOLD = self._saved_threshold
+        if self._saved_home is not None:
+            os.environ["HOME"] = self._saved_home
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def run_thread(mode, target, **options):
+    """Runs one ScannerThread to completion. Returns (thread, seconds, log lines delivered)."""
+    delivered = [0]
+    thread = backend.ScannerThread(
+        mode=mode,
+        target_path=target,
+        on_log=lambda lines: delivered.__setitem__(0, delivered[0] + len(lines)),
+        on_status=lambda icon, title, subtitle: None,
+        on_finish=lambda success, context, summary=None: None,
+        dispatch=_direct_dispatch,
+        **options
+    )
+    started = time.perf_counter()
+    thread.start()
+    thread.join()
+    return thread, time.perf_counter() - started, delivered[0]
+
+
+def _scan_metrics(thread, seconds, manifest):
+    report = thread.metrics_report or {}
+    return {
+        "seconds": round(seconds, 3),
+        "files_per_second": round(manifest["files"] / seconds, 1),
+        "mb_per_second": round(manifest["bytes"] / seconds / (1024 * 1024), 1),
+        "file_scan_seconds": report.get("phases", {}).get("file_scan", 0.0),
+        "walk_seconds": report.get("phases", {}).get("walk", 0.0),
+        "detections_ok": len(thread.infections) == manifest["infected"],
+        "first_detection_seconds": report.get("first_detection_seconds"),
+    }
+
+
+# --- Scenarios: each takes (env, scale) and returns {metric: value} ---
+
+def scenario_scan_clamd(env, scale):
+    """End-to-end folder scan of many small files through the stand-in clamd."""
+    env.start_clamd()
+    root, manifest = env.corpus("small_files", scale)
+    thread, seconds, _ = run_thread("scan_dir", root, engine="clamd", use_cache=False)
+    return _scan_metrics(thread, seconds, manifest)
+
+
+def scenario_scan_clamscan(env, scale):
+    """The same folder scan through the clamscan fallback pool."""
+    root, manifest = env.corpus("small_files", scale)
+    thread, seconds, _ = run_thread("scan_dir", root, engine="clamscan", use_cache=False)
+    return _scan_metrics(thread, seconds, manifest)
+
+
+def scenario_scan_cached(env, scale):
+    """Second scan of an unchanged folder with the scan cache on."""
+    env.start_clamd()
+    root, manifest = env.corpus("small_files", scale)
+    run_thread("scan_dir", root, engine="clamd", use_cache=True)
+    thread, seconds, _ = run_thread("scan_dir", root, engine="clamd", use_cache=True)
+    # Only clean files are cached, so detections must still be reported
+    return _scan_metrics(thread, seconds, manifest)
+
+
+def scenario_scan_deep_tree(env, scale):
+    """Walk-bound scan of a deeply nested tree with few files per folder."""
+    env.start_clamd()
+    root, manifest = env.corpus("deep_tree", scale)
+    thread, seconds, _ = run_thread("scan_dir", root, engine="clamd", use_cache=False)
+    return _scan_metrics(thread, seconds, manifest)
+
+
+def scenario_scan_large_files(env, scale):
+    """Engine-bound scan of a folder with a few large files."""
+    env.start_clamd()
+    root, manifest = env.corpus("large_files", scale)
+    thread, seconds, _ = run_thread("scan_dir", root, engine="clamd", use_cache=False)
+    return _scan_metrics(thread, seconds, manifest)
+
+
+def scenario_scan_risk_first(env, scale):
+    """Time to the first detection when the only threat is the last file the walk reaches."""
+    env.start_clamd()
+    root, manifest = env.corpus("late_threat", scale)
+    walk_order, _, _ = run_thread("scan_dir", root, engine="clamd", use_cache=False, risk_first=False)
+    thread, seconds, _ = run_thread("scan_dir", root, engine="clamd", use_cache=False)
+    metrics = _scan_metrics(thread, seconds, manifest)
+    metrics["walk_order_first_detection_seconds"] = (walk_order.metrics_report or {}).get("first_detection_seconds")
+    return metrics
+
+
+def scenario_quick_scan(env, scale):
+    """
+    Quick Scan of a home folder with threats planted where the quick
+    profile has to let them through: a user systemd unit, an autostart
+    entry and a download among clean files.
+    """
+    env.start_clamd()
+    planted = [".config/systemd/user/updater.service", ".config/autostart/updater.desktop", "Downloads/setup.exe"]
+    for name in planted + [".config/systemd/user/notes.txt", "Downloads/notes.txt"]:
+        path = os.path.join(env.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            # Executables are recognized by their first bytes, the rest by name
+            f.write((b"MZ" if name.endswith(".exe") else b"[Unit]\n")
+                    + (fake_engine.EICAR if name in planted else b"clean\n"))
+    # The throwaway HOME lives below /tmp, which would swallow every home location
+    saved, quickscan.SYSTEM_LOCATIONS = quickscan.SYSTEM_LOCATIONS, ()
+    try:
+        targets = quickscan.quick_scan_targets({"locations": []}, home=env.root)
+    finally:
+        quickscan.SYSTEM_LOCATIONS = saved
+    thread, seconds, _ = run_thread("scan_batch", quickscan.QUICK_SCAN_LABEL, targets=targets, engine="clamd",
+                                    use_cache=False, scan_profile=quickscan.QUICK_SCAN_PROFILE,
+                                    time_budget=quickscan.QUICK_SCAN_BUDGET)
+    found = {os.path.relpath(path, env.root) for path, _ in thread.infections}
+    return {
+        "seconds": round(seconds, 3),
+        "detections_ok": found == set(planted),
+        "unit_file_scanned": planted[0] in found,
+        "complete": (thread.metrics_report or {}).get("coverage", {}).get("complete"),
+    }
+
+
+def _large_file(env, scale):
+    # The threshold is scaled down with the corpora so --scale keeps runs short
+    backend.LARGE_FILE_THRESHOLD = max(int(env._saved_threshold * min(scale, 1.0)), backend.STREAM_WINDOW)
+    size = backend.LARGE_FILE_THRESHOLD + 2 * backend.STREAM_WINDOW
+    path = os.path.join(env.root, "large.img")
+    if not os.path.exists(path):
+        # EICAR straddles the first window boundary, so only the overlap catches it
+        corpus.build_large_file(path, size, eicar_at=backend.STREAM_WINDOW - len(fake_engine.EICAR) // 2)
+    return path, {"files": 1, "bytes": size, "infected": 1}
+
+
+def scenario_stream_scan(env, scale):
+    """Large file streamed to clamd from an mmap in overlapping windows."""
+    env.start_clamd()
+    path, manifest = _large_file(env, scale)
+    thread, seconds, _ = run_thread("scan_file", path, engine="clamd")
+    return _scan_metrics(thread, seconds, manifest)
+
+
+def scenario_split_scan(env, scale):
+    """Large file split into chunk files for clamscan."""
+    path, manifest = _large_file(env, scale)
+    thread, seconds, _ = run_thread("scan_file", path, engine="clamscan")
+    return _scan_metrics(thread, seconds, manifest)
+
+
+def scenario_update(env, scale):
+    """Staged database update with the stand-in freshclam, including the swap."""
+    before, _ = fake_engine.read_version(env.db_dir)
+    thread, seconds, _ = run_thread("update", None)
+    after, _ = fake_engine.read_version(env.db_dir)
+    return {"seconds": round(seconds, 3), "swapped": after == before + 1}
+
+
+def scenario_log_throughput(env, scale):
+    """Lines per second through the buffered log sink to an on_lines consumer."""
+    count = max(1000, int(200000 * scale))
+    delivered = [0]
+    sink = backend.LogSink(os.path.join(env.root, "throughput.log"),
+                           lambda lines: delivered.__setitem__(0, delivered[0] + len(lines)), _direct_dispatch)
+    sink.start()
+    started = time.perf_counter()
+    for i in range(count):
+        sink.write(f"/home/user/Downloads/folder_{i % 97}/file_{i:07d}.bin: OK")
+    sink.close()
+    seconds = time.perf_counter() - started
+    return {"seconds": round(seconds, 3), "lines_per_second": round(count / seconds),
+            "all_delivered": delivered[0] == count}
+
+
+def scenario_history_load(env, scale):
+    """History index: recording runs, paging and filtering, importing old logs."""
+    runs = max(100, int(5000 * scale))
+    summary = "\n".join(backend.format_scan_summary(
+        {"dirs": 10, "files": 1000, "infected": 0, "bytes": 10 ** 8}, "1.0.1", 8712000, 0, 12.5))
+    summary += "\nScan finished: Clean."
+    path = os.path.join(env.root, "bench_history.db")
+
+    store = HistoryStore(path)
+    try:
+        started = time.perf_counter()
+        for i in range(runs):
+            store.record_run(f"scan_{i:07d}.log", "scan_dir", f"/home/user/folder_{i % 50}",
+                             1700000000 + i * 60, 1700000000 + i * 60 + 12, summary)
+        record_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for _ in range(20):
+            store.list_runs("scan", 50, 0)
+        first_page_ms = (time.perf_counter() - started) / 20 * 1000
+
+        started = time.perf_counter()
+        for _ in range(20):
+            store.list_runs("scan", 50, runs // 2, query="folder_7", status="Clean")
+        filtered_page_ms = (time.perf_counter() - started) / 20 * 1000
+    finally:
+        store.close()
+
+    log_dir = os.path.join(env.root, "import_logs")
+    os.makedirs(log_dir)
+    imported_logs = max(50, runs // 10)
+    for i in range(imported_logs):
+        with open(os.path.join(log_dir, f"scan_20260101-{i // 3600 % 24:02d}{i // 60 % 60:02d}{i % 60:02d}.log"),
+                  "w") as f:
+            f.write(f"--- Starting Scan: /home/user/folder_{i} ---\n/home/user/folder_{i}/a.bin: OK\n{summary}\n")
+    store = HistoryStore(os.path.join(env.root, "bench_import.db"))
+    try:
+        started = time.perf_counter()
+        imported = store.import_logs(log_dir)
+        import_seconds = time.perf_counter() - started
+    finally:
+        store.close()
+
+    return {
+        "runs_recorded_per_second": round(runs / record_seconds),
+        "first_page_ms": round(first_page_ms, 3),
+        "filtered_page_ms": round(filtered_page_ms, 3),
+        "logs_imported_per_second": round(imported / import_seconds) if import_seconds else None,
+    }
+
+
+UPDATE_LOG = """ClamAV update process started at Sat Oct 17 10:00:00 2026
+daily database available for update (local version: 27000, remote version: 27001)
+Downloading daily-27001.cdiff [100%]
+daily.cld updated (version: 27001, sigs: 2066000, f-level: 90, builder: raynman)
+main.cvd database is up-to-date (version: 62, sigs: 6647427, f-level: 90, builder: sigmgr)
+bytecode.cvd database is up-to-date (version: 334, sigs: 91, f-level: 90, builder: anvilleg)"""
+
+
+def scenario_parsers(env, scale):
+    """Throughput of the summary, update log and per-file line parsers."""
+    summary = "\n".join(backend.format_scan_summary(
+        {"dirs": 10, "files": 1000, "covered": 1200, "cached": 200, "infected": 1, "bytes": 10 ** 8},
+        "1.0.1", 8712000, 0, 12.5)) + "\nScan finished: INFECTION FOUND."
+    lines = [f"/home/user/dir: {i}/file_{i}.bin: OK" if i % 10 else
+             f"/home/user/dir/file_{i}.bin: Eicar-Test-Signature FOUND" for i in range(1000)]
+
+    def rate(fn, count):
+        started = time.perf_counter()
+        for _ in range(count):
+            fn()
+        return round(count / (time.perf_counter() - started))
+
+    repeats = max(10, int(100 * scale))
+    return {
+        "scan_summaries_per_second": rate(lambda: ScanParser.parse(summary), repeats * 50),
+        "update_logs_per_second": rate(lambda: UpdateParser.parse(UPDATE_LOG), repeats * 50),
+        "result_lines_per_second": rate(lambda: [parse_clamscan_line(line) for line in lines], repeats) * len(lines),
+    }
+
+
+SCENARIOS = {
+    "scan_clamd": scenario_scan_clamd,
+    "scan_clamscan": scenario_scan_clamscan,
+    "scan_cached": scenario_scan_cached,
+    "scan_deep_tree": scenario_scan_deep_tree,
+    "scan_large_files": scenario_scan_large_files,
+    "scan_risk_first": scenario_scan_risk_first,
+    "quick_scan": scenario_quick_scan,
+    "stream_scan": scenario_stream_scan,
+    "split_scan": scenario_split_scan,
+    "update": scenario_update,
+    "log_throughput": scenario_log_throughput,
+    "history_load": scenario_history_load,
+    "parsers": scenario_parsers,
+}
+
+
+def _git(*args):
+    try:
+        return subprocess.run(["git", *args], cwd=REPO_DIR, capture_output=True, text=True,
+                              timeout=30).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def compare(previous, current):
+    """Prints every numeric metric of current next to previous with the relative change."""
+    print(f"\nCompared with {previous.get('commit') or 'unknown'} (scale {previous.get('scale')}):")
+    for name, metrics in current["scenarios"].items():
+        old_metrics = previous.get("scenarios", {}).get(name, {})
+        for key, value in metrics.items():
+            old = old_metrics.get(key)
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not isinstance(old, (int, float)):
+                continue
+            change = f"{(value - old) / old * 100:+.1f}%" if old else "n/a"
+            print(f"  {name}.{key}: {old} -> {value} ({change})")
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("scenarios", nargs="*", metavar="SCENARIO", help=f"any of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier for corpus sizes (default 1.0)")
+    parser.add_argument("--output", help="where to save results (default benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", metavar="FILE", help="earlier results to compare against")
+    opts = parser.parse_args(argv[1:])
+
+    unknown = [name for name in opts.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    commit = _git("rev-parse", "--short=10", "HEAD") or "unknown"
+    dirty = bool(_git("status", "--porcelain", "--untracked-files=no"))
+    results = {
+        "commit": commit + ("-dirty" if dirty else ""),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "scale": opts.scale,
+        "scenarios": {},
+    }
+
+    env = BenchEnv()
+    try:
+        for name in opts.scenarios or SCENARIOS:
+            print(f"{name}...", end=" ", flush=True)
+            metrics = SCENARIOS[name](env, opts.scale)
+            results["scenarios"][name] = metrics
+            print(", ".join(f"{key}={value}" for key, value in metrics.items()), flush=True)
+    finally:
+        env.close()
+
+    output = opts.output or os.path.join(RESULTS_DIR, f"{results['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Saved {output}")
+
+    if opts.compare:
+        with open(opts.compare) as f:
+            compare(json.load(f), results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,107 @@
+import os
+import sqlite3
+import stat
+import threading
+import time
+
+
+def database_version_key(db_info):
+    """
+    Builds the signature-version stamp stored with every cached verdict
+    from read_database_info() output, e.g. 'daily:27000/main:62/bytecode:334'.
+    Returns None if no database could be read.
+    """
+    if not db_info:
+        return None
+    return "/".join(f"{name}:{db_info[name]['version']}" for name in sorted(db_info))
+
+
+class ScanCache:
+    """
+    Persistent record of files verified clean, keyed by file identity
+    (device, inode, size, mtime_ns, ctime_ns) and by the database versions
+    the verdict was produced with. Only clean verdicts are cached.
+    """
+
+    # Pending clean verdicts are written in batches of this size
+    FLUSH_EVERY = 500
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pending = []
+
+        # Security: create the file with 0600 and refuse to follow a symlink
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+        try:
+            if not stat.S_ISREG(os.fstat(fd).st_mode):
+                raise OSError(f"{path} is not a regular file")
+        finally:
+            os.close(fd)
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                dev INTEGER NOT NULL,
+                ino INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                ctime_ns INTEGER NOT NULL,
+                db_version TEXT NOT NULL,
+                scanned_at REAL NOT NULL,
+                PRIMARY KEY (dev, ino)
+            )
+        """)
+        self.conn.commit()
+
+    def is_clean(self, st, db_version):
+        """True if the file behind st was verified clean against db_version and is unchanged since."""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT size, mtime_ns, ctime_ns, db_version FROM files WHERE dev = ? AND ino = ?",
+                (st.st_dev, st.st_ino)).fetchone()
+        return row == (st.st_size, st.st_mtime_ns, st.st_ctime_ns, db_version)
+
+    def add(self, st, db_version):
+        """Queues a clean verdict for the file behind st."""
+        with self._lock:
+            self._pending.append((st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, st.st_ctime_ns,
+                                  db_version, time.time()))
+            if len(self._pending) >= self.FLUSH_EVERY:
+                self._flush_locked()
+
+    def discard(self, st):
+        with self._lock:
+            self.conn.execute("DELETE FROM files WHERE dev = ? AND ino = ?", (st.st_dev, st.st_ino))
+            self.conn.commit()
+
+    def invalidate(self, db_version=None):
+        """
+        Drops verdicts produced by any database other than db_version
+        (or every verdict if db_version is None). Returns the number removed.
+        """
+        with self._lock:
+            self._pending = [p for p in self._pending if db_version is not None and p[5] == db_version]
+            if db_version is None:
+                cur = self.conn.execute("DELETE FROM files")
+            else:
+                cur = self.conn.execute("DELETE FROM files WHERE db_version != ?", (db_version,))
+            self.conn.commit()
+            return cur.rowcount
+
+    def _flush_locked(self):
+        if self._pending:
+            self.conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", self._pending)
+            self.conn.commit()
+            self._pending = []
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        with self._lock:
+            self._flush_locked()
+            self.conn.close()
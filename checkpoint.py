@@ -0,0 +1,194 @@
+import json
+import os
+import threading
+
+from results import ScanResult
+
+# A running folder scan saves its position at most this often (seconds)
+CHECKPOINT_INTERVAL = 30
+CHECKPOINT_VERSION = 1
+CHECKPOINT_SUFFIX = ".checkpoint.json"
+
+STAT_KEYS = ("dirs", "files", "covered", "infected", "errors", "bytes", "cached")
+
+
+def checkpoint_path(log_path):
+    """The checkpoint written next to a scan log: scan_X.log -> scan_X.checkpoint.json."""
+    root, _ = os.path.splitext(log_path)
+    return root + CHECKPOINT_SUFFIX
+
+
+def load_checkpoint(path):
+    """Reads a checkpoint file. Returns its state dict or None."""
+    # Deferred import to avoid a cycle: backend writes checkpoints through this module
+    from backend import safe_read_file
+
+    content = safe_read_file(path)
+    if not content:
+        return None
+    try:
+        state = json.loads(content)
+    except ValueError:
+        return None
+    if not isinstance(state, dict) or state.get("version") != CHECKPOINT_VERSION:
+        return None
+    return state
+
+
+def write_checkpoint(path, state):
+    """
+    Replaces the checkpoint atomically (0600, no symlinks): a crash or
+    power loss mid-write leaves the previous checkpoint intact.
+    """
+    tmp_path = path + ".tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_NOFOLLOW, 0o600)
+    with os.fdopen(fd, "w") as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def discard_checkpoint(path):
+    """Removes a checkpoint if it exists. Raises OSError if it cannot be removed."""
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def find_checkpoints(log_dir):
+    """(path, state) of every readable checkpoint in log_dir, newest first."""
+    try:
+        names = sorted((n for n in os.listdir(log_dir) if n.endswith(CHECKPOINT_SUFFIX)), reverse=True)
+    except OSError:
+        return []
+    found = []
+    for name in names:
+        path = os.path.join(log_dir, name)
+        state = load_checkpoint(path)
+        if state is not None:
+            found.append((path, state))
+    return found
+
+
+def owner_alive(state):
+    """True if the process that wrote state is still running (another ClamBite instance)."""
+    pid = state.get("pid")
+    if not pid or pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def walk_key(target_index, components):
+    """
+    Position of a walked item: the index of its scan target and its path
+    components below that target. Sorted walks visit items in key order.
+    """
+    return (target_index, tuple(components))
+
+
+def subtree_done(position, key):
+    """True if key (a directory) and everything below it come before position."""
+    if position is None or key > position:
+        return False
+    index, components = key
+    # An ancestor of position is only partly done
+    return not (position[0] == index and position[1][:len(components)] == components)
+
+
+class CheckpointTracker:
+    """
+    Commits per-item results of a sorted tree walk in walk order. Workers
+    finish files out of order, so an item's stats and flagged records are
+    held until every earlier item is done; the position is then the key of
+    the last committed item, and a resumed scan can skip everything up to
+    it without losing or double counting anything.
+    """
+
+    def __init__(self, state=None):
+        state = state or {}
+        self.stats = {key: 0 for key in STAT_KEYS}
+        self.stats.update(state.get("stats", {}))
+        progress = state.get("progress", {})
+        self.files = progress.get("files", 0)
+        self.bytes = progress.get("bytes", 0)
+        self.flagged = [ScanResult(*fields) for fields in state.get("flagged", [])]
+        self.infections = [tuple(pair) for pair in state.get("infections", [])]
+        position = state.get("position")
+        self.position = walk_key(position[0], position[1]) if position else None
+
+        self._next_seq = 0
+        self._committed_seq = 0
+        self._items = {}    # seq -> (key, size or None for non-file items)
+        self._done = {}     # seq -> (stats delta, flagged result, infection)
+        self._pending = {}  # path -> [seq, ...] of files not completed yet
+        self._lock = threading.Lock()
+
+    def begin(self, key, path, size):
+        """Registers a file yielded by the walk (in walk order)."""
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+            self._items[seq] = (key, size)
+            self._pending.setdefault(path, []).append(seq)
+
+    def is_pending(self, path):
+        with self._lock:
+            return path in self._pending
+
+    def complete(self, path, delta, result=None, infection=None):
+        """Records the outcome of a file registered with begin()."""
+        with self._lock:
+            seqs = self._pending.get(path)
+            if not seqs:
+                return
+            seq = seqs.pop(0)
+            if not seqs:
+                del self._pending[path]
+            self._done[seq] = (delta, result, infection)
+            self._commit()
+
+    def done(self, key, delta, result=None):
+        """Registers an item that is finished when walked (a directory, a walk error)."""
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+            self._items[seq] = (key, None)
+            self._done[seq] = (delta, result, None)
+            self._commit()
+
+    def _commit(self):
+        while self._committed_seq in self._done:
+            seq = self._committed_seq
+            delta, result, infection = self._done.pop(seq)
+            key, size = self._items.pop(seq)
+            for name, value in delta.items():
+                self.stats[name] = self.stats.get(name, 0) + value
+            if size is not None:
+                self.files += 1
+                self.bytes += size
+            if result is not None:
+                self.flagged.append(result)
+            if infection is not None:
+                self.infections.append(infection)
+            self.position = key
+            self._committed_seq += 1
+
+    def snapshot(self):
+        """The committed part of the scan, ready for write_checkpoint."""
+        with self._lock:
+            return {
+                "version": CHECKPOINT_VERSION,
+                "position": [self.position[0], list(self.position[1])] if self.position else None,
+                "stats": dict(self.stats),
+                "progress": {"files": self.files, "bytes": self.bytes},
+                "flagged": [list(result) for result in self.flagged],
+                "infections": [list(pair) for pair in self.infections],
+            }
@@ -1,6 +1,15 @@
 #!/usr/bin/env python3
 
+import os
 import sys
+
+# Headless runs must not load Gtk/Adw: dispatch before importing gi
+if __name__ == "__main__":
+    from headless import is_headless_invocation
+    if is_headless_invocation(sys.argv):
+        from headless import main
+        sys.exit(main(sys.argv))
+
 import gi
 gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
@@ -12,33 +21,33 @@ class ClamAVApp(Adw.Application):
     def __init__(self):
         super().__init__(application_id="com.github.juliengrdn.clambite",
                          flags=Gio.ApplicationFlags.HANDLES_OPEN | Gio.ApplicationFlags.HANDLES_COMMAND_LINE)
-        self.target_file = None
+        self.target_files = []
 
     def do_activate(self):
         win = self.props.active_window
         
         if not win:
-            # First launch: Pass the file to __init__
-            win = MainWindow(self, self.target_file)
-        elif self.target_file:
-            # App already running: Manually pass the file to the existing window
+            # First launch: Pass the files to __init__
+            win = MainWindow(self, self.target_files)
+        elif self.target_files:
+            # App already running: Manually pass the files to the existing window
             if hasattr(win, 'handle_external_request'):
-                win.handle_external_request(self.target_file)
+                win.handle_external_request(self.target_files)
         
         win.present()
         
-        # Important: Clear the file so we don't re-scan it if you just click the dock icon later
-        self.target_file = None
+        # Important: Clear the files so we don't re-scan them if you just click the dock icon later
+        self.target_files = []
 
     def do_open(self, files, n_files, hint):
-        if n_files > 0:
-            self.target_file = files[0].get_path()
+        self.target_files = [f.get_path() for f in files if f.get_path()]
         self.activate()
 
     def do_command_line(self, command_line):
         args = command_line.get_arguments()
-        if len(args) > 1:
-            self.target_file = args[1]
+        # Relative paths are resolved against the invoking shell, not this instance
+        cwd = command_line.get_cwd() or ""
+        self.target_files = [os.path.join(cwd, arg) for arg in args[1:]]
         self.activate()
         return 0
 
@@ -48,6 +48,19 @@ install -m 644 clambite.py %{buildroot}%{_datadir}/%{name}/
 install -m 644 ui.py %{buildroot}%{_datadir}/%{name}/
 install -m 644 backend.py %{buildroot}%{_datadir}/%{name}/
 install -m 644 parsers.py %{buildroot}%{_datadir}/%{name}/
+install -m 644 cache.py %{buildroot}%{_datadir}/%{name}/
+install -m 644 history.py %{buildroot}%{_datadir}/%{name}/
+install -m 644 jobs.py %{buildroot}%{_datadir}/%{name}/
+install -m 644 headless.py %{buildroot}%{_datadir}/%{name}/
+install -m 644 results.py %{buildroot}%{_datadir}/%{name}/
+install -m 644 metrics.py %{buildroot}%{_datadir}/%{name}/
+install -m 644 checkpoint.py %{buildroot}%{_datadir}/%{name}/
+install -m 644 governor.py %{buildroot}%{_datadir}/%{name}/
+install -m 644 watcher.py %{buildroot}%{_datadir}/%{name}/
+install -m 644 filters.py %{buildroot}%{_datadir}/%{name}/
+install -m 644 risk.py %{buildroot}%{_datadir}/%{name}/
+install -m 644 quickscan.py %{buildroot}%{_datadir}/%{name}/
+install -m 644 scheduler.py %{buildroot}%{_datadir}/%{name}/
 
 # 3. Install the icon to the standard system path
 # (Ensure your source repository has a 'clambite.svg')
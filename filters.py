@@ -0,0 +1,217 @@
+import fnmatch
+import json
+import os
+import re
+
+# Scan profiles decide what a folder scan hands to the engine. Rules:
+#   exclude: fnmatch patterns; with a "/" they match the whole path, else the name
+#   exclude_regex: regular expressions searched in the whole path
+#   min_size, max_size: bytes (None = no limit)
+#   file_types: only files of these FILE_TYPES, told apart by their first bytes, or
+#       these NAMED_TYPES, told apart by their names (None = all)
+#   hidden: "scan", "skip_dirs" or "skip" (dot files and folders)
+#   one_filesystem: stay on the file system of each scan target
+#   network_filesystems: descend into NFS, SMB, SSHFS... mounts
+#   other_users: scan files and folders owned by other users
+# Pseudo file systems (/proc, /sys, ...) are never entered.
+BUILTIN_SCAN_PROFILES = {
+    "standard": {
+        "label": "Standard",
+        "exclude": ["*/.git/objects", "*/.cache", "*.qcow2", "*.vdi", "*.vmdk", "*.vhd", "*.vhdx"],
+        "network_filesystems": False,
+    },
+    "full": {
+        "label": "Full",
+        "network_filesystems": True,
+    },
+    "quick": {
+        "label": "Quick",
+        "exclude": ["*/.git", "*/.cache", "node_modules", "__pycache__", "*.qcow2", "*.vdi", "*.vmdk", "*.vhd",
+                    "*.vhdx", "*.iso"],
+        "max_size": 64 * 1024 * 1024,
+        "file_types": ["executable", "archive", "document", "script", "autostart"],
+        "hidden": "skip_dirs",
+        "one_filesystem": True,
+        "network_filesystems": False,
+        "other_users": False,
+    },
+}
+DEFAULT_SCAN_PROFILE = "standard"
+
+RULE_DEFAULTS = {
+    "exclude": [], "exclude_regex": [], "min_size": 0, "max_size": None, "file_types": None,
+    "hidden": "scan", "one_filesystem": False, "network_filesystems": False, "other_users": True,
+}
+
+# Rule names used in skip reports
+RULE_LABELS = {
+    "pattern": "Excluded paths",
+    "size": "Size limits",
+    "file_type": "File types",
+    "mount": "Other file systems",
+    "hidden": "Hidden items",
+    "owner": "Other users' items",
+}
+
+# Leading bytes of each file type (offset, magic)
+FILE_TYPES = {
+    "executable": [(0, b"\x7fELF"), (0, b"MZ"), (0, b"\xfe\xed\xfa\xce"), (0, b"\xfe\xed\xfa\xcf"),
+                   (0, b"\xce\xfa\xed\xfe"), (0, b"\xcf\xfa\xed\xfe"), (0, b"\xca\xfe\xba\xbe"), (0, b"dex\n")],
+    "archive": [(0, b"PK\x03\x04"), (0, b"PK\x05\x06"), (0, b"\x1f\x8b"), (0, b"BZh"), (0, b"\xfd7zXZ\x00"),
+                (0, b"7z\xbc\xaf\x27\x1c"), (0, b"Rar!\x1a\x07"), (0, b"MSCF"), (0, b"\x28\xb5\x2f\xfd"),
+                (0, b"\xed\xab\xee\xdb"), (257, b"ustar")],
+    "document": [(0, b"%PDF"), (0, b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"), (0, b"{\\rtf")],
+    "script": [(0, b"#!")],
+}
+MAGIC_BYTES = 262
+# Scripts Windows and browsers run have no magic bytes; they are told apart by name
+SCRIPT_EXTENSIONS = (".js", ".jse", ".vbs", ".vbe", ".ps1", ".bat", ".cmd", ".hta", ".wsf", ".html", ".htm",
+                     ".svg", ".lnk", ".py", ".sh", ".desktop")
+# Entries that make the desktop or systemd start a program: plain text, so also told apart by name
+AUTOSTART_EXTENSIONS = (".desktop", ".service", ".timer", ".socket", ".path")
+NAMED_TYPES = {"script": SCRIPT_EXTENSIONS, "autostart": AUTOSTART_EXTENSIONS}
+
+PSEUDO_FILESYSTEMS = {
+    "proc", "sysfs", "devtmpfs", "devpts", "cgroup", "cgroup2", "debugfs", "tracefs", "securityfs", "pstore",
+    "bpf", "configfs", "fusectl", "mqueue", "hugetlbfs", "binfmt_misc", "autofs", "efivarfs", "rpc_pipefs",
+    "nsfs", "selinuxfs",
+}
+NETWORK_FILESYSTEMS = {
+    "nfs", "nfs4", "cifs", "smb3", "smbfs", "9p", "afs", "ceph", "glusterfs", "lustre", "davfs", "ncpfs",
+    "fuse.sshfs", "fuse.glusterfs", "fuse.davfs2", "fuse.rclone", "fuse.s3fs",
+}
+
+
+def load_scan_profiles(path):
+    """
+    The built-in profiles, updated with the ones defined in path
+    ({"name": {"label": ..., rules...}}); a user profile with a built-in
+    name replaces it.
+    """
+    # Deferred import to avoid a cycle: backend filters its walks through this module
+    from backend import safe_read_file
+
+    profiles = {name: dict(rules) for name, rules in BUILTIN_SCAN_PROFILES.items()}
+    content = safe_read_file(path) if path else None
+    if content:
+        try:
+            saved = json.loads(content)
+        except ValueError:
+            saved = None
+        if isinstance(saved, dict):
+            for name, rules in saved.items():
+                if isinstance(rules, dict):
+                    profiles[name] = dict(rules, label=rules.get("label", name))
+    return profiles
+
+
+def mount_types():
+    """st_dev -> file system type of every mount, from /proc/self/mountinfo."""
+    types = {}
+    try:
+        with open("/proc/self/mountinfo") as f:
+            for line in f:
+                fields = line.split()
+                # ID parent major:minor root mount-point options [optional...] - type source options
+                major, _, minor = fields[2].partition(":")
+                types[os.makedev(int(major), int(minor))] = fields[fields.index("-") + 1]
+    except (OSError, ValueError, IndexError):
+        pass
+    return types
+
+
+class ScanFilter:
+    """
+    Decides per walked file and folder whether it goes to the engine.
+    check_dir() and check_file() return the name of the rule that skips
+    the item, or None. Scan targets themselves are never filtered.
+
+    Raises re.error, TypeError or ValueError for malformed rules.
+    """
+
+    def __init__(self, rules):
+        merged = dict(RULE_DEFAULTS)
+        merged.update(rules or {})
+        patterns = merged["exclude"] or []
+        self.path_patterns = [p.rstrip(os.sep) for p in patterns if os.sep in p]
+        self.name_patterns = [p for p in patterns if os.sep not in p]
+        self.regexes = [re.compile(r) for r in merged["exclude_regex"] or []]
+        self.min_size = int(merged["min_size"] or 0)
+        self.max_size = None if merged["max_size"] is None else int(merged["max_size"])
+        types = merged["file_types"]
+        self.magic = None if types is None else [m for name in types for m in FILE_TYPES.get(name, ())]
+        self.extensions = tuple(ext for name in types or () for ext in NAMED_TYPES.get(name, ()))
+        self.hidden = merged["hidden"]
+        self.one_filesystem = merged["one_filesystem"]
+        self.network_filesystems = merged["network_filesystems"]
+        self.uid = None if merged["other_users"] else os.getuid()
+        self._devices = {}  # st_dev -> whether it is skipped
+
+    def _excluded(self, path, name):
+        return (any(fnmatch.fnmatch(name, p) for p in self.name_patterns)
+                or any(fnmatch.fnmatch(path, p) for p in self.path_patterns)
+                or any(r.search(path) for r in self.regexes))
+
+    def _foreign_mount(self, st, root_dev):
+        if st.st_dev == root_dev:
+            return False
+        if self.one_filesystem:
+            return True
+        foreign = self._devices.get(st.st_dev)
+        if foreign is None:
+            # Devices missing from mountinfo (btrfs subvolumes) are local
+            fs_type = mount_types().get(st.st_dev, "")
+            foreign = fs_type in PSEUDO_FILESYSTEMS or (fs_type in NETWORK_FILESYSTEMS and not self.network_filesystems)
+            self._devices[st.st_dev] = foreign
+        return foreign
+
+    def check_dir(self, path, name, st, root_dev):
+        """st: lstat of the folder; root_dev: st_dev of the scan target it is below."""
+        if self._foreign_mount(st, root_dev):
+            return "mount"
+        if self._excluded(path, name):
+            return "pattern"
+        if self.hidden != "scan" and name.startswith("."):
+            return "hidden"
+        if self.uid is not None and st.st_uid != self.uid:
+            return "owner"
+        return None
+
+    def check_file(self, path, name, st):
+        if self._excluded(path, name):
+            return "pattern"
+        if self.hidden == "skip" and name.startswith("."):
+            return "hidden"
+        if self.uid is not None and st.st_uid != self.uid:
+            return "owner"
+        if st.st_size < self.min_size or (self.max_size is not None and st.st_size > self.max_size):
+            return "size"
+        if self.magic is not None and not self._wanted_type(path, name):
+            return "file_type"
+        return None
+
+    def _wanted_type(self, path, name):
+        if self.extensions and name.lower().endswith(self.extensions):
+            return True
+        try:
+            fd = os.open(path, os.O_RDONLY | os.O_NOFOLLOW | os.O_NONBLOCK)
+        except OSError:
+            return True  # Let the engine report it
+        try:
+            head = os.pread(fd, MAGIC_BYTES, 0)
+        except OSError:
+            return True
+        finally:
+            os.close(fd)
+        return any(head.startswith(magic, offset) for offset, magic in self.magic)
+
+
+def skip_report(stats):
+    """{rule: {"files", "bytes", "dirs"}} from the skip counters a scan keeps in its stats."""
+    report = {}
+    for key, value in stats.items():
+        kind, _, rule = key.partition(":")
+        if kind in ("skip_files", "skip_bytes", "skip_dirs") and value:
+            entry = report.setdefault(rule, {"files": 0, "bytes": 0, "dirs": 0})
+            entry[kind[len("skip_"):]] += value
+    return report
@@ -0,0 +1,273 @@
+import collections
+import contextlib
+import ctypes
+import os
+import platform
+import threading
+import time
+
+# A profile sets the CPU and I/O priority of engine processes, the share of
+# the scan workers allowed to run at once and an optional cap on bytes read
+# per second (None = no cap).
+ResourceProfile = collections.namedtuple(
+    "ResourceProfile", "name label nice io_class io_level worker_share read_rate")
+
+IOPRIO_CLASS_BE = 2
+IOPRIO_CLASS_IDLE = 3
+IOPRIO_CLASS_SHIFT = 13
+IOPRIO_WHO_PROCESS = 1
+IOPRIO_WHO_PGRP = 2
+
+PROFILES = {
+    # Only uses the disk when nothing else does, on a quarter of the workers
+    "background": ResourceProfile("background", "Background", 19, IOPRIO_CLASS_IDLE, 0, 0.25, 32 * 1024 * 1024),
+    "normal": ResourceProfile("normal", "Normal", 5, IOPRIO_CLASS_BE, 6, 1.0, None),
+    # The kernel defaults, as before profiles existed
+    "fast": ResourceProfile("fast", "Fast", 0, IOPRIO_CLASS_BE, 4, 1.0, None),
+}
+PROFILE_ORDER = ("background", "normal", "fast")
+DEFAULT_PROFILE = "normal"
+# Scans queued behind others, and scheduled scans, start with this one
+QUEUED_PROFILE = "background"
+
+# Seconds without input after which a background scan may use the machine fully
+IDLE_AFTER_SECONDS = 120
+# Seconds between checks of the power source and user activity
+POLL_INTERVAL = 10
+
+POWER_SUPPLY_DIR = "/sys/class/power_supply"
+
+# ioprio_set has no libc wrapper; syscall numbers of the common architectures
+_IOPRIO_SET = {"x86_64": 251, "i386": 289, "i686": 289, "aarch64": 30, "riscv64": 30,
+               "armv7l": 314, "ppc64le": 273, "ppc64": 273, "s390x": 282}.get(platform.machine())
+_libc = ctypes.CDLL(None, use_errno=True)
+
+
+def worker_limit(profile, workers):
+    """Workers of a scan with `workers` in total that may run at once under profile."""
+    return max(1, round(workers * profile.worker_share))
+
+
+def _read_value(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def on_battery():
+    """True if the machine runs on a discharging battery and no charger is online."""
+    try:
+        names = os.listdir(POWER_SUPPLY_DIR)
+    except OSError:
+        return False
+    discharging = False
+    for name in names:
+        path = os.path.join(POWER_SUPPLY_DIR, name)
+        kind = _read_value(os.path.join(path, "type"))
+        if kind in ("Mains", "USB") and _read_value(os.path.join(path, "online")) == "1":
+            return False
+        if kind == "Battery" and _read_value(os.path.join(path, "status")) == "Discharging":
+            discharging = True
+    return discharging
+
+
+def set_io_priority(pid, io_class, level=0, group=False):
+    """
+    Sets the I/O scheduling class of pid (every thread of its process
+    group with group=True, else every thread of the process). Best effort:
+    returns False where the kernel or architecture does not support it.
+    """
+    if _IOPRIO_SET is None:
+        return False
+    value = (io_class << IOPRIO_CLASS_SHIFT) | level
+    if group:
+        return _libc.syscall(_IOPRIO_SET, IOPRIO_WHO_PGRP, pid, value) == 0
+    # IOPRIO_WHO_PROCESS only reaches a single thread
+    try:
+        tids = [int(tid) for tid in os.listdir(f"/proc/{pid}/task")]
+    except (OSError, ValueError):
+        tids = [pid]
+    return all(_libc.syscall(_IOPRIO_SET, IOPRIO_WHO_PROCESS, tid, value) == 0 for tid in tids)
+
+
+def lower_cpu_priority(pgid, nice):
+    """
+    Raises the nice value of a process group to at least nice. It is never
+    lowered: that needs privileges, so a profile can only give CPU time back.
+    """
+    try:
+        if os.getpriority(os.PRIO_PGRP, pgid) < nice:
+            os.setpriority(os.PRIO_PGRP, pgid, nice)
+    except OSError:
+        pass
+
+
+def apply_to_process_group(pgid, profile):
+    """Applies the CPU and I/O priority of profile to an engine process group."""
+    lower_cpu_priority(pgid, profile.nice)
+    set_io_priority(pgid, profile.io_class, profile.io_level, group=True)
+
+
+class RateLimiter:
+    """Paces reads to a byte rate shared by every worker of a scan."""
+
+    def __init__(self, rate=None):
+        self.rate = rate
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate):
+        with self._lock:
+            self.rate = rate
+
+    def reserve(self, size):
+        """Books size bytes. Returns the seconds the caller has to wait before reading them."""
+        with self._lock:
+            now = time.monotonic()
+            if not self.rate:
+                self._next = now
+                return 0.0
+            start = max(self._next, now)
+            self._next = start + size / self.rate
+            return start - now
+
+
+class WorkerGate:
+    """A semaphore whose size can change while workers hold it."""
+
+    def __init__(self, limit):
+        self.limit = max(1, limit)
+        self._busy = 0
+        self._cond = threading.Condition()
+
+    def set_limit(self, limit):
+        with self._cond:
+            self.limit = max(1, limit)
+            self._cond.notify_all()
+
+    def wake(self):
+        """Lets waiting workers re-check their stop condition."""
+        with self._cond:
+            self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def slot(self, stop_event):
+        """Holds one of limit slots for the block. Gives up waiting once stop_event is set."""
+        with self._cond:
+            while self._busy >= self.limit and not stop_event.is_set():
+                self._cond.wait()
+            self._busy += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._busy -= 1
+                self._cond.notify_all()
+
+
+def effective_profile(name, battery, idle_seconds):
+    """
+    The profile a scan asking for name runs with right now, and why:
+    one step lower on battery, and a background scan runs as a normal one
+    while the user is away from an AC-powered machine.
+    """
+    index = PROFILE_ORDER.index(name)
+    if battery:
+        return PROFILES[PROFILE_ORDER[max(0, index - 1)]], "on battery" if index else ""
+    if name == "background" and idle_seconds is not None and idle_seconds >= IDLE_AFTER_SECONDS:
+        return PROFILES["normal"], "user away"
+    return PROFILES[name], ""
+
+
+class ResourceGovernor:
+    """
+    Re-evaluates the profiles of running scans as the power source and
+    user activity change. Scans register while they run and receive their
+    effective profile through apply_resources(profile, reason).
+
+    clamd is shared between scans, so it only gets the idle I/O class while
+    every scan using it runs in the background; its CPU share is bounded
+    from the client side by the worker count.
+    """
+
+    def __init__(self, poll_interval=POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self._scans = set()
+        self._idle_provider = None
+        self._clamd = None  # (pid, idle class applied) of the last adjusted daemon
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def set_idle_provider(self, provider):
+        """provider: callable returning the seconds since the last user input, or None if unknown."""
+        self._idle_provider = provider
+        self.refresh()
+
+    def register(self, scan):
+        with self._lock:
+            self._scans.add(scan)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, daemon=True)
+                self._thread.start()
+        self.refresh()
+
+    def unregister(self, scan):
+        with self._lock:
+            self._scans.discard(scan)
+        self.refresh()
+
+    def refresh(self):
+        """Re-evaluates right away, e.g. after a scan's profile was changed."""
+        self._wake.set()
+
+    def _idle_seconds(self):
+        if self._idle_provider is None:
+            return None
+        try:
+            return self._idle_provider()
+        except Exception:
+            return None
+
+    def _loop(self):
+        while True:
+            self._wake.clear()
+            with self._lock:
+                scans = list(self._scans)
+                if not scans:
+                    self._thread = None
+            if not scans:
+                self._set_clamd_idle(None, False)
+                return
+
+            battery = on_battery()
+            idle = self._idle_seconds()
+            clamd_pid = None
+            clamd_idle = True
+            for scan in scans:
+                profile, reason = effective_profile(scan.profile, battery, idle)
+                scan.apply_resources(profile, reason)
+                if scan.uses_clamd:
+                    clamd_pid = scan.clamd.pid()
+                    clamd_idle = clamd_idle and profile.io_class == IOPRIO_CLASS_IDLE
+            self._set_clamd_idle(clamd_pid, clamd_pid is not None and clamd_idle)
+            self._wake.wait(self.poll_interval)
+
+    def _set_clamd_idle(self, pid, idle):
+        if pid is None:
+            if self._clamd is None or not self._clamd[1]:
+                return
+            pid = self._clamd[0]  # Hand the daemon back its normal I/O class
+        if self._clamd == (pid, idle):
+            return
+        if idle:
+            set_io_priority(pid, IOPRIO_CLASS_IDLE)
+        else:
+            set_io_priority(pid, IOPRIO_CLASS_BE, PROFILES["fast"].io_level)
+        self._clamd = (pid, idle)
+
+
+# One governor per process: clamd and the machine are shared by all scans
+governor = ResourceGovernor()
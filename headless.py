@@ -0,0 +1,374 @@
+"""
+Headless entry point: runs scans and updates through ScannerThread
+without importing Gtk/Adw, for cron, SSH sessions and CI runners.
+
+    clambite --headless scan [--json] [--profile background|normal|fast] [--scan-profile NAME] PATH...
+    clambite --headless update [--json]
+    clambite --headless quick [--json] [--budget SECONDS]
+    clambite --headless watch [--json] FOLDER...
+    clambite --headless schedule install|remove|status
+    clambite --headless schedule run JOB
+
+Scan exit codes follow clamscan: 0 no virus found, 1 virus(es) found,
+2 some error(s) occurred. Found viruses take precedence over errors.
+watch runs until interrupted and then exits like a scan of everything it saw.
+schedule run is what the timers written by schedule install start; it
+exits like the scan or update it runs.
+"""
+
+import argparse
+import json
+import os
+import queue
+import signal
+import sys
+import threading
+
+from backend import ScannerThread, secure_which
+from filters import DEFAULT_SCAN_PROFILE
+from governor import DEFAULT_PROFILE, PROFILE_ORDER, governor
+from watcher import FolderWatcher
+from quickscan import QUICK_SCAN_LABEL, QUICK_SCAN_PROFILE, load_quick_scan_config, quick_scan_targets
+from scheduler import (UPDATE_JOB, install_timers, installed_jobs, load_schedule, remove_timers, scan_options,
+                       scheduled_jobs, session_idle_provider, wait_until_quiet)
+from parsers import ScanParser, UpdateParser
+
+EXIT_CLEAN = 0
+EXIT_INFECTED = 1
+EXIT_ERROR = 2
+EXIT_INTERRUPTED = 130
+
+COMMANDS = ("scan", "update", "watch", "quick", "schedule")
+
+
+def is_headless_invocation(argv):
+    """
+    True for 'clambite --headless ...' and for 'clambite scan|update ...'
+    when no file of that name exists (so 'clambite scan' can still open a
+    file called 'scan' in the GUI from its directory).
+    """
+    if len(argv) < 2:
+        return False
+    if argv[1] == "--headless":
+        return True
+    return argv[1] in COMMANDS and not os.path.exists(argv[1])
+
+
+def _direct_dispatch(fn, *args):
+    # Callbacks run on the worker thread instead of a main loop
+    fn(*args)
+
+
+class HeadlessRun:
+    """Drives one ScannerThread and collects what the GUI would display."""
+
+    def __init__(self, mode, target, echo, options):
+        self.mode = mode
+        self.target = target
+        self.echo = echo
+        self.success = None
+        self.final_data = None
+        self._done = threading.Event()
+        self.thread = ScannerThread(
+            mode=mode,
+            target_path=target,
+            on_log=self._on_lines,
+            on_status=lambda icon, title, subtitle: None,
+            on_finish=self._on_finish,
+            dispatch=_direct_dispatch,
+            **options
+        )
+
+    def _on_lines(self, lines):
+        if self.echo:
+            self.echo(lines)
+
+    def _on_finish(self, success, context, summary=None):
+        self.success = success
+        self.final_data = summary
+        self._done.set()
+
+    def run(self):
+        """
+        Runs to completion; Ctrl+C stops the scan cleanly. Ctrl+Z pauses the
+        engines too (they run in their own process groups) and fg resumes.
+        """
+        previous = {sig: signal.signal(sig, handler) for sig, handler in
+                    ((signal.SIGTSTP, self._on_suspend), (signal.SIGCONT, self._on_continue))}
+        self.thread.start()
+        try:
+            while self.thread.is_alive():
+                self.thread.join(0.2)
+        except KeyboardInterrupt:
+            self.thread.stop()
+            self.thread.join()
+            raise
+        finally:
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
+
+    def _on_suspend(self, signum, frame):
+        self.thread.pause()
+        os.kill(os.getpid(), signal.SIGSTOP)
+
+    def _on_continue(self, signum, frame):
+        self.thread.resume()
+
+    def exit_code(self):
+        if self.mode == "update":
+            return EXIT_CLEAN if self.success else EXIT_ERROR
+        if self.thread.returncode in (EXIT_CLEAN, EXIT_INFECTED, EXIT_ERROR):
+            return self.thread.returncode
+        return EXIT_INFECTED if self.thread.infections else EXIT_ERROR
+
+    def result(self):
+        data = {
+            "mode": self.mode,
+            "exit_code": self.exit_code(),
+            "log_file": self.thread.log_filename,
+        }
+        if self.mode == "update":
+            data["update"] = UpdateParser.parse(self.final_data or "")
+        else:
+            data["target"] = self.target
+            if self.mode == "scan_batch":
+                data["targets"] = list(self.thread.targets)
+            data["summary"] = ScanParser.parse("\n".join(self.thread.scan_summary))
+            data["infections"] = [{"path": path, "signature": signature}
+                                  for path, signature in self.thread.infections]
+            # Infected and failed files plus the slowest clean ones
+            data["files"] = [result._asdict() for result in self.thread.results.records()]
+            data["metrics"] = self.thread.metrics_report
+        return data
+
+
+def _build_parser():
+    parser = argparse.ArgumentParser(prog="clambite --headless",
+                                     description="Scan files or update definitions without the GUI.")
+    parser.add_argument("--json", action="store_true", help="print one JSON document with the results")
+    parser.add_argument("--quiet", action="store_true", help="do not print log lines")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    scan = sub.add_parser("scan", help="scan files and folders")
+    scan.add_argument("paths", nargs="+", metavar="PATH")
+    scan.add_argument("--engine", choices=("clamd", "clamscan"), default="clamd")
+    scan.add_argument("--workers", type=int, default=None, help="concurrent workers for folders")
+    scan.add_argument("--no-cache", action="store_true", help="rescan files already verified clean")
+    scan.add_argument("--profile", choices=PROFILE_ORDER, default=DEFAULT_PROFILE,
+                      help="CPU and I/O priority of the scan (default: %(default)s)")
+    scan.add_argument("--scan-profile", default=DEFAULT_SCAN_PROFILE, metavar="NAME",
+                      help="what folder scans skip: standard, full, quick or one from scan_profiles.json "
+                           "(default: %(default)s)")
+
+    sub.add_parser("update", help="update the virus definitions")
+
+    quick = sub.add_parser("quick", help="scan downloads, temporary folders, browser caches, autostart "
+                                         "entries and recent files within a time budget")
+    quick.add_argument("--budget", type=float, default=None, metavar="SECONDS",
+                       help="end with a partial report after this long (default: quick_scan.json, else 60)")
+    quick.add_argument("--engine", choices=("clamd", "clamscan"), default="clamd")
+    quick.add_argument("--profile", choices=PROFILE_ORDER, default=DEFAULT_PROFILE,
+                       help="CPU and I/O priority of the scan (default: %(default)s)")
+
+    watch = sub.add_parser("watch", help="scan new and changed files in folders until interrupted")
+    watch.add_argument("paths", nargs="+", metavar="FOLDER")
+    watch.add_argument("--engine", choices=("clamd", "clamscan"), default="clamd")
+    watch.add_argument("--exclude", action="append", default=[], metavar="PATTERN",
+                       help="file or folder name pattern to ignore (repeatable)")
+    watch.add_argument("--profile", choices=PROFILE_ORDER, default=DEFAULT_PROFILE,
+                       help="CPU and I/O priority of the scans (default: %(default)s)")
+    watch.add_argument("--scan-profile", default=DEFAULT_SCAN_PROFILE, metavar="NAME",
+                       help="what scans of changed folders skip (default: %(default)s)")
+
+    schedule = sub.add_parser("schedule", help="run updates and scans from schedule.json as systemd user timers")
+    schedule.add_argument("action", choices=("install", "remove", "status", "run"),
+                          help="install or remove the timers, list the jobs, or run one job now")
+    schedule.add_argument("job", nargs="?", help="job to run: 'update' or the name of a scheduled scan")
+    return parser
+
+
+def _make_echo(stream):
+    lock = threading.Lock()
+
+    def echo(lines):
+        with lock:
+            stream.write("\n".join(lines) + "\n")
+            stream.flush()
+    return echo
+
+
+def _quick_scan_job(options, budget=None):
+    config = load_quick_scan_config(os.path.expanduser("~/.config/clambite/quick_scan.json"))
+    options = dict(options, scan_profile=QUICK_SCAN_PROFILE, targets=quick_scan_targets(config),
+                   time_budget=budget or config["budget_seconds"])
+    return ("scan_batch", QUICK_SCAN_LABEL, options)
+
+
+def _run_jobs(opts, echo):
+    """Runs a scan or update command as one job. Returns (results, interrupted)."""
+    if opts.command == "update":
+        jobs = [("update", None, {})]
+    elif opts.command == "quick":
+        jobs = [_quick_scan_job({"engine": opts.engine, "profile": opts.profile}, opts.budget)]
+    else:
+        options = {"engine": opts.engine, "workers": opts.workers, "use_cache": not opts.no_cache,
+                   "profile": opts.profile, "scan_profile": opts.scan_profile}
+        jobs = [_scan_job([os.path.abspath(path) for path in opts.paths], options)]
+    return _execute(jobs, echo)
+
+
+def _scan_job(paths, options):
+    """
+    The job scanning paths: a file or folder scan, or one batch for several
+    paths so they get a single report and History entry, as in the GUI.
+    """
+    if len(paths) > 1:
+        return ("scan_batch", None, dict(options, targets=paths))
+    return ("scan_dir" if os.path.isdir(paths[0]) else "scan_file", paths[0], options)
+
+
+def _execute(jobs, echo):
+    """Runs (mode, target, options) jobs in order. Returns (results, interrupted)."""
+    results = []
+    interrupted = False
+    for mode, target, options in jobs:
+        if mode == "scan_file" and not os.path.lexists(target):
+            results.append({"mode": mode, "target": target, "exit_code": EXIT_ERROR,
+                            "error": "No such file or directory"})
+            if echo:
+                echo([f"{target}: No such file or directory ERROR"])
+            continue
+        run = HeadlessRun(mode, target, echo, options)
+        try:
+            run.run()
+        except KeyboardInterrupt:
+            interrupted = True
+        results.append(run.result())
+        if interrupted:
+            break
+    return results, interrupted
+
+
+def _watch(opts, echo):
+    """Scans each batch of changes as it arrives. Returns the results once interrupted."""
+    folders = [os.path.abspath(path) for path in opts.paths]
+    missing = [path for path in folders if not os.path.isdir(path)]
+    if missing:
+        return [{"mode": "watch", "target": path, "exit_code": EXIT_ERROR, "error": "Not a directory"}
+                for path in missing]
+
+    batches = queue.Queue()
+    watcher = FolderWatcher(folders, batches.put, on_log=(lambda message: echo([message])) if echo else None,
+                            exclude=opts.exclude, dispatch=_direct_dispatch)
+    watcher.start()
+    if echo:
+        echo([f"Watching {len(folders)} folder(s); Ctrl+C to stop."])
+
+    options = {"engine": opts.engine, "profile": opts.profile, "scan_profile": opts.scan_profile,
+               "record_clean": False}
+    results = []
+    try:
+        while True:
+            paths = batches.get()
+            run = HeadlessRun("scan_batch", None, echo, dict(options, targets=paths))
+            run.run()
+            results.append(run.result())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.stop()
+    return results
+
+
+def _scheduled_job(name, job):
+    """The (mode, target, options) of a job from schedule.json, or None if none of its paths exist."""
+    if name == UPDATE_JOB:
+        return ("update", None, {})
+    options = scan_options(job)
+    if job.get("quick"):
+        return _quick_scan_job(options, job.get("budget_seconds"))
+    paths = [os.path.abspath(os.path.expanduser(path)) for path in job["paths"]]
+    paths = [path for path in paths if os.path.lexists(path)]
+    if not paths:
+        return None
+    options.update(scan_profile=job.get("scan_profile", DEFAULT_SCAN_PROFILE), time_budget=job.get("budget_seconds"))
+    return _scan_job(paths, options)
+
+
+def _schedule(opts, echo):
+    """Installs, removes or lists the timers, or runs one scheduled job. Returns (results, interrupted)."""
+    log = echo or (lambda lines: None)
+    config = load_schedule(os.path.expanduser("~/.config/clambite/schedule.json"))
+    jobs = scheduled_jobs(config)
+
+    if opts.action == "status":
+        installed = installed_jobs()
+        results = [{"mode": "schedule", "job": name, "calendar": job.get("calendar", "daily"),
+                    "installed": name in installed, "exit_code": EXIT_CLEAN} for name, job in jobs.items()]
+        log([f"{r['job']}: {r['calendar']}" + ("" if r["installed"] else " (not installed)") for r in results])
+        return results, False
+    if opts.action in ("install", "remove"):
+        clambite = secure_which("clambite")
+        command = [clambite] if clambite else [sys.executable, os.path.join(os.path.dirname(
+            os.path.abspath(__file__)), "clambite.py")]
+        if opts.action == "install":
+            ok = install_timers(config, command + ["--headless"], lambda message: log([message]))
+        else:
+            ok = remove_timers(lambda message: log([message]))
+        return [{"mode": "schedule", "action": opts.action, "exit_code": EXIT_CLEAN if ok else EXIT_ERROR}], False
+
+    if opts.job not in jobs:
+        log([f"{opts.job}: no such scheduled job"])
+        return [{"mode": "schedule", "job": opts.job, "exit_code": EXIT_ERROR, "error": "No such job"}], False
+    job = _scheduled_job(opts.job, jobs[opts.job])
+    if job is None:
+        log([f"{opts.job}: none of its paths exist"])
+        return [{"mode": "schedule", "job": opts.job, "exit_code": EXIT_ERROR,
+                 "error": "No such file or directory"}], False
+
+    # systemd stops a run with SIGTERM: end it like Ctrl+C, engines included
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    idle_provider = session_idle_provider()
+    try:
+        wait_until_quiet(config, idle_provider, lambda message: log([message]))
+    except KeyboardInterrupt:
+        return [], True
+    # Background scans speed up while the user stays away, as in the GUI
+    governor.set_idle_provider(idle_provider)
+    return _execute([job], echo)
+
+
+def main(argv):
+    args = argv[1:]
+    if args and args[0] == "--headless":
+        args = args[1:]
+    opts = _build_parser().parse_args(args)
+
+    # With --json stdout carries only the document; logs go to stderr
+    echo = None if opts.quiet else _make_echo(sys.stderr if opts.json else sys.stdout)
+
+    if opts.command == "watch":
+        # Stopping is how a watch ends, so it is not reported as an interruption
+        results = _watch(opts, echo)
+        interrupted = False
+    elif opts.command == "schedule":
+        if opts.action == "run" and not opts.job:
+            _build_parser().error("schedule run needs a JOB")
+        results, interrupted = _schedule(opts, echo)
+    else:
+        results, interrupted = _run_jobs(opts, echo)
+
+    codes = [r["exit_code"] for r in results]
+    if interrupted:
+        code = EXIT_INTERRUPTED
+    elif EXIT_INFECTED in codes and opts.command != "update":
+        code = EXIT_INFECTED
+    elif any(c != EXIT_CLEAN for c in codes):
+        code = EXIT_ERROR
+    else:
+        code = EXIT_CLEAN
+
+    if opts.json:
+        json.dump({"command": opts.command, "exit_code": code, "results": results}, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    return code
@@ -0,0 +1,219 @@
+import json
+import os
+import re
+import sqlite3
+import stat
+import time
+from datetime import datetime
+
+from parsers import ScanParser, UpdateParser
+from results import ScanResult, make_result, parse_clamscan_line
+
+
+def _log_timestamp(filename, prefix):
+    """Parses the YYYYMMDD-HHMMSS part of scan_/update_ log names, or None."""
+    ts_str = filename.replace(prefix, "").replace(".log", "")
+    try:
+        return datetime.strptime(ts_str, "%Y%m%d-%H%M%S").timestamp()
+    except ValueError:
+        return None
+
+
+def parse_flagged(log_text):
+    """Returns ScanResult records for the clamscan-style FOUND and ERROR lines of a log."""
+    results = []
+    for line in log_text.splitlines():
+        parsed = parse_clamscan_line(line.strip())
+        if parsed is not None and parsed[1] != "OK":
+            results.append(make_result(*parsed))
+    return results
+
+
+
+class HistoryStore:
+    """
+    Index of finished scans and updates, so History can list and open
+    runs without reading and re-parsing their log files.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+        # Security: create the file with 0600 and refuse to follow a symlink
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+        try:
+            if not stat.S_ISREG(os.fstat(fd).st_mode):
+                raise OSError(f"{path} is not a regular file")
+        finally:
+            os.close(fd)
+
+        self.conn = sqlite3.connect(path, timeout=10)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY,
+                log_file TEXT UNIQUE NOT NULL,
+                kind TEXT NOT NULL,
+                mode TEXT,
+                target TEXT,
+                started_at REAL,
+                finished_at REAL,
+                status TEXT,
+                summary TEXT,
+                data TEXT
+            );
+            CREATE INDEX IF NOT EXISTS runs_by_kind ON runs (kind, started_at DESC);
+            CREATE TABLE IF NOT EXISTS infections (
+                run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+                path TEXT NOT NULL,
+                signature TEXT
+            );
+            CREATE INDEX IF NOT EXISTS infections_by_run ON infections (run_id);
+            CREATE TABLE IF NOT EXISTS results (
+                run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+                path TEXT NOT NULL,
+                verdict TEXT NOT NULL,
+                signature TEXT,
+                size INTEGER,
+                duration REAL,
+                error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS results_by_run ON results (run_id);
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def record_run(self, log_file, mode, target, started_at, finished_at, summary, infections=(), results=()):
+        """
+        Stores one finished run. summary is the text handed to the result
+        page: the scan summary block, or the update log. results: the
+        ScanResult records kept for the report (see ScanResults.records).
+        """
+        kind = "update" if mode == "update" else "scan"
+        data = UpdateParser.parse(summary) if kind == "update" else ScanParser.parse(summary)
+        with self.conn:
+            cur = self.conn.execute(
+                "INSERT OR REPLACE INTO runs (log_file, kind, mode, target, started_at, finished_at, status, summary, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (os.path.basename(log_file), kind, mode, target, started_at, finished_at,
+                 data["status"], summary, json.dumps(data)))
+            self.conn.executemany("INSERT INTO infections (run_id, path, signature) VALUES (?, ?, ?)",
+                                  [(cur.lastrowid, path, sig) for path, sig in infections])
+            self.conn.executemany(
+                "INSERT INTO results (run_id, path, verdict, signature, size, duration, error) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(cur.lastrowid,) + tuple(result) for result in results])
+        return cur.lastrowid
+
+    def count_runs(self, kind):
+        return self.conn.execute("SELECT COUNT(*) FROM runs WHERE kind = ?", (kind,)).fetchone()[0]
+
+    def list_runs(self, kind, limit=50, offset=0, query=None, since=None, until=None, status=None):
+        """
+        Newest first. Returns rows without the summary text.
+        query: substring of the target path; since/until: epoch bounds on the
+        start time; status: exact parser status (e.g. 'Infected').
+        """
+        sql = ("SELECT id, log_file, kind, mode, target, started_at, finished_at, status FROM runs "
+               "WHERE kind = ?")
+        params = [kind]
+        if query:
+            escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            sql += " AND target LIKE ? ESCAPE '\\'"
+            params.append(f"%{escaped}%")
+        if since is not None:
+            sql += " AND started_at >= ?"
+            params.append(since)
+        if until is not None:
+            sql += " AND started_at < ?"
+            params.append(until)
+        if status:
+            sql += " AND status = ?"
+            params.append(status)
+        sql += " ORDER BY started_at DESC LIMIT ? OFFSET ?"
+        params += [limit, offset]
+        return self.conn.execute(sql, params).fetchall()
+
+    def get_run(self, run_id):
+        return self.conn.execute("SELECT * FROM runs WHERE id = ?", (run_id,)).fetchone()
+
+    def get_infections(self, run_id):
+        return self.conn.execute("SELECT path, signature FROM infections WHERE run_id = ?", (run_id,)).fetchall()
+
+    def get_results(self, run_id):
+        """The per-file records stored with a run, as ScanResult tuples."""
+        rows = self.conn.execute(
+            "SELECT path, verdict, signature, size, duration, error FROM results WHERE run_id = ? ORDER BY rowid",
+            (run_id,)).fetchall()
+        return [ScanResult(*row) for row in rows]
+
+    def import_logs(self, log_dir):
+        """
+        One-time import of scan_*.log / update_*.log files written before the
+        index existed. Later calls return immediately. Returns runs imported.
+        """
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'logs_imported'").fetchone()
+        if row is not None:
+            return 0
+
+        # Deferred import to avoid a cycle: backend records runs through this module
+        from backend import safe_read_file
+
+        known = {r[0] for r in self.conn.execute("SELECT log_file FROM runs")}
+        imported = 0
+        try:
+            names = os.listdir(log_dir)
+        except OSError:
+            names = []
+
+        for name in names:
+            if name in known or not name.endswith(".log"):
+                continue
+            if name.startswith("scan_"):
+                prefix, mode = "scan_", "scan"
+            elif name.startswith("update_"):
+                prefix, mode = "update_", "update"
+            else:
+                continue
+
+            path = os.path.join(log_dir, name)
+            content = safe_read_file(path)
+            if content is None:
+                continue
+
+            target = None
+            match = re.search(r"Starting Scan: (.*?) ---", content)
+            if match:
+                target = match.group(1).strip()
+
+            try:
+                finished_at = os.lstat(path).st_mtime
+            except OSError:
+                finished_at = None
+            started_at = _log_timestamp(name, prefix) or finished_at
+
+            if mode == "scan":
+                # Keep only the summary block, as live scans do
+                idx = content.find("----------- SCAN SUMMARY")
+                summary = content[idx:] if idx >= 0 else content
+                results = parse_flagged(content[:idx] if idx >= 0 else content)
+                infections = [(r.path, r.signature) for r in results if r.verdict == "FOUND"]
+            else:
+                summary = content
+                infections = results = ()
+
+            self.record_run(name, mode, target, started_at, finished_at, summary, infections, results)
+            imported += 1
+
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('logs_imported', ?)",
+                              (str(time.time()),))
+        return imported
@@ -0,0 +1,328 @@
+import itertools
+import os
+import threading
+import time
+
+from backend import ScannerThread, batch_label
+from filters import DEFAULT_SCAN_PROFILE
+from governor import DEFAULT_PROFILE, PROFILE_ORDER, PROFILES, QUEUED_PROFILE
+
+PRIORITY_LOW = 0
+PRIORITY_NORMAL = 1
+PRIORITY_HIGH = 2
+
+# Scans allowed to run at the same time besides watch batches; updates always run one at a time
+MAX_CONCURRENT_SCANS = 2
+# Finished jobs kept for the queue view
+FINISHED_JOBS_KEPT = 50
+
+
+class Job:
+    QUEUED = "Queued"
+    RUNNING = "Running"
+    DONE = "Done"
+    FAILED = "Failed"
+    CANCELLED = "Cancelled"
+
+    def __init__(self, job_id, mode, target, priority=PRIORITY_NORMAL, after=None, targets=None, resume_from=None,
+                 profile=DEFAULT_PROFILE, source=None, scan_profile=DEFAULT_SCAN_PROFILE, time_budget=None):
+        """
+        mode: 'update', 'scan_file', 'scan_dir', 'scan_batch'
+        after: another Job that must finish successfully before this one starts
+        targets: paths of a 'scan_batch' (target, if None, is then derived from them)
+        resume_from: checkpoint of an interrupted scan this job continues
+        profile: resource profile name (see governor.PROFILES)
+        source: what started the job when it was not the user, e.g. 'watch'
+        scan_profile: what folder scans skip (see filters.BUILTIN_SCAN_PROFILES)
+        time_budget: seconds after which the scan ends with a partial report (None = no limit)
+        """
+        self.id = job_id
+        self.mode = mode
+        self.targets = list(targets or [])
+        self.target = target or (batch_label(self.targets) if self.targets else None)
+        self.priority = priority
+        self.after = after
+        self.resume_from = resume_from
+        self.profile = profile
+        self.source = source
+        self.scan_profile = scan_profile
+        self.time_budget = time_budget
+        self.status = Job.QUEUED
+        self.thread = None
+        self.success = None
+        self.summary = None
+        self.created = time.time()
+        self.cancel_requested = False
+        # False for updates started alongside a scan, whose result is not shown
+        self.show_result = True
+
+    @property
+    def is_update(self):
+        return self.mode == 'update'
+
+    @property
+    def is_active(self):
+        return self.status in (Job.QUEUED, Job.RUNNING)
+
+    @property
+    def paused(self):
+        return self.status == Job.RUNNING and self.thread is not None and self.thread.paused
+
+    @property
+    def can_pause(self):
+        # Updates are not paused: a stalled download can time out
+        return self.status == Job.RUNNING and not self.is_update and not self.cancel_requested
+
+    @property
+    def profiles(self):
+        """Profiles the job can be switched to: any while queued, fewer once its engines were niced."""
+        if self.thread is None:
+            return list(PROFILE_ORDER)
+        return self.thread.reachable_profiles()
+
+    @property
+    def state_label(self):
+        return "Paused" if self.paused else self.status
+
+    @property
+    def title(self):
+        if self.is_update:
+            return "Database Update"
+        if self.mode == 'scan_batch' and len(self.targets) > 1:
+            return f"{len(self.targets)} items"
+        return os.path.basename(self.target.rstrip(os.sep)) or self.target
+
+
+class JobQueue:
+    """
+    Runs scan and update jobs through ScannerThread with a bounded number of
+    concurrent scans. Updates are serialized with each other but never
+    block scans, which keep using the database that is currently loaded.
+    Batches from watched folders (source 'watch') run one at a time in a
+    lane of their own, so they never wait behind long user scans.
+
+    All methods are expected to be called from one thread (the GTK main
+    loop); ScannerThread already delivers on_finish there.
+    """
+
+    def __init__(self, callbacks, on_job_changed, on_job_finished,
+                 max_concurrent_scans=MAX_CONCURRENT_SCANS, thread_options=None):
+        """
+        callbacks: callable(job) -> dict with on_log/on_status/on_progress for that job
+        on_job_changed: callable(job), called whenever a job changes state or position
+        on_job_finished: callable(job), called once a job has a result
+        """
+        self.callbacks = callbacks
+        self.on_job_changed = on_job_changed
+        self.on_job_finished = on_job_finished
+        self.max_concurrent_scans = max(1, max_concurrent_scans)
+        self.thread_options = thread_options or {}
+        self.jobs = []     # Every known job, oldest first
+        self._queue = []   # Queued jobs in start order
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()
+
+    def submit(self, mode, target, priority=PRIORITY_NORMAL, after=None, targets=None, resume_from=None,
+               profile=None, source=None, scan_profile=None, time_budget=None):
+        """
+        profile: resource profile of the job. By default a scan that has to
+        wait behind other scans runs in the background, anything else as normal.
+        """
+        with self._lock:
+            if profile not in PROFILES:
+                waiting = sum(1 for job in self.running() + self._queue
+                              if not job.is_update and job.source != "watch")
+                queued = mode != 'update' and waiting >= self.max_concurrent_scans
+                profile = QUEUED_PROFILE if queued else DEFAULT_PROFILE
+            job = Job(next(self._ids), mode, target, priority, after, targets, resume_from, profile, source,
+                      scan_profile or DEFAULT_SCAN_PROFILE, time_budget)
+            self.jobs.append(job)
+
+            # Insert behind every queued job of the same or higher priority
+            index = len(self._queue)
+            for i, queued in enumerate(self._queue):
+                if queued.priority < priority:
+                    index = i
+                    break
+            self._queue.insert(index, job)
+            self._trim_finished()
+
+        self.on_job_changed(job)
+        self._schedule()
+        return job
+
+    def merge_batch(self, paths, source=None):
+        """
+        Adds paths to the newest batch scan from the same source while it
+        can still take them: before it starts, or while its walk has not
+        reached the end of its targets. Returns that job, or None if a new
+        batch is needed.
+        """
+        with self._lock:
+            # A resumed batch keeps the targets of its checkpoint, a quick scan its own locations
+            batches = [job for job in self.jobs
+                       if job.mode == 'scan_batch' and job.is_active and job.resume_from is None
+                       and job.source == source and job.time_budget is None]
+            if not batches:
+                return None
+            job = batches[-1]
+            if job.status == Job.QUEUED:
+                job.targets.extend(paths)
+            elif not job.cancel_requested and job.thread.add_targets(paths):
+                job.targets.extend(paths)
+            else:
+                return None
+        self.on_job_changed(job)
+        return job
+
+    def running(self):
+        return [job for job in self.jobs if job.status == Job.RUNNING]
+
+    def queued(self):
+        return list(self._queue)
+
+    def is_resuming(self, checkpoint):
+        """True if an active job already continues from checkpoint."""
+        return any(job.resume_from == checkpoint and job.is_active for job in self.jobs)
+
+    def has_dependents(self, job):
+        return any(other.after is job and other.is_active for other in self.jobs)
+
+    def cancel(self, job):
+        with self._lock:
+            if job.status == Job.QUEUED:
+                self._queue.remove(job)
+                job.status = Job.CANCELLED
+            elif job.status == Job.RUNNING:
+                job.cancel_requested = True
+                job.thread.stop()
+                return  # Reported when the thread finishes
+            else:
+                return
+        self.on_job_changed(job)
+        self._schedule()
+
+    def pause(self, job):
+        """Holds a running scan without losing its progress (see ScannerThread.pause)."""
+        if job.can_pause:
+            job.thread.pause()
+            self.on_job_changed(job)
+
+    def resume(self, job):
+        if job.paused:
+            job.thread.resume()
+            self.on_job_changed(job)
+
+    def set_profile(self, job, profile):
+        """Changes the resource profile of a queued or running job (one of job.profiles)."""
+        if not job.is_active or job.profile == profile:
+            return
+        if profile not in job.profiles:
+            # Out of reach since the list was shown: let the view show what still is
+            self.on_job_changed(job)
+            return
+        job.profile = profile
+        if job.thread is not None:
+            job.thread.set_profile(profile)
+        self.on_job_changed(job)
+
+    def cancel_all(self):
+        for job in list(self._queue) + self.running():
+            self.cancel(job)
+
+    def move(self, job, delta):
+        """Moves a queued job delta places towards the front (<0) or back (>0)."""
+        with self._lock:
+            if job not in self._queue:
+                return
+            index = self._queue.index(job)
+            new_index = max(0, min(len(self._queue) - 1, index + delta))
+            if new_index == index:
+                return
+            self._queue.insert(new_index, self._queue.pop(index))
+        self.on_job_changed(job)
+        self._schedule()
+
+    def _schedule(self):
+        started = []
+        cancelled = []
+        with self._lock:
+            running = self.running()
+            running_scans = sum(1 for job in running if not job.is_update and job.source != "watch")
+            update_running = any(job.is_update for job in running)
+            # Watched folders have their own lane: one batch at a time, never behind user scans
+            watch_running = any(job.source == "watch" for job in running)
+
+            for job in list(self._queue):
+                if job.after is not None:
+                    if job.after.is_active:
+                        continue
+                    if job.after.status != Job.DONE:
+                        # The job it was waiting for failed or was cancelled
+                        self._queue.remove(job)
+                        job.status = Job.CANCELLED
+                        cancelled.append(job)
+                        continue
+
+                if job.is_update:
+                    if update_running:
+                        continue
+                    update_running = True
+                elif job.source == "watch":
+                    if watch_running:
+                        continue
+                    watch_running = True
+                else:
+                    if running_scans >= self.max_concurrent_scans:
+                        continue
+                    running_scans += 1
+
+                self._queue.remove(job)
+                self._start(job)
+                started.append(job)
+
+        for job in cancelled + started:
+            self.on_job_changed(job)
+
+    def _start(self, job):
+        callbacks = self.callbacks(job)
+        job.thread = ScannerThread(
+            mode=job.mode,
+            target_path=job.target,
+            targets=job.targets or None,
+            on_log=callbacks["on_log"],
+            on_status=callbacks["on_status"],
+            on_progress=callbacks.get("on_progress"),
+            on_finish=lambda success, context, summary=None: self._on_thread_finished(job, success, summary),
+            resume_from=job.resume_from,
+            profile=job.profile,
+            scan_profile=job.scan_profile,
+            time_budget=job.time_budget,
+            # Only watch batches that find something are kept in History
+            record_clean=job.source != "watch",
+            **self.thread_options
+        )
+        job.status = Job.RUNNING
+        job.thread.start()
+
+    def _on_thread_finished(self, job, success, summary):
+        with self._lock:
+            job.success = success
+            job.summary = summary
+            if job.cancel_requested:
+                job.status = Job.CANCELLED
+            elif job.is_update and not success:
+                job.status = Job.FAILED
+            else:
+                # A scan that found infections still completed
+                job.status = Job.DONE
+
+        self.on_job_changed(job)
+        if job.status != Job.CANCELLED:
+            self.on_job_finished(job)
+        self._schedule()
+
+    def _trim_finished(self):
+        finished = [job for job in self.jobs if not job.is_active]
+        for job in finished[:max(0, len(finished) - FINISHED_JOBS_KEPT)]:
+            self.jobs.remove(job)
@@ -0,0 +1,172 @@
+import contextlib
+import json
+import os
+import resource
+import threading
+import time
+
+# Throughput is sampled at most this often (seconds)
+SAMPLE_INTERVAL = 1.0
+# Samples kept per run; every other one is dropped when this is reached
+MAX_SAMPLES = 600
+METRICS_VERSION = 1
+
+
+def metrics_path(log_path):
+    """The metrics file written next to a scan log: scan_X.log -> scan_X.metrics.json."""
+    root, _ = os.path.splitext(log_path)
+    return f"{root}.metrics.json"
+
+
+def load_metrics(log_path):
+    """Reads the metrics file of a scan log. Returns a dict or None."""
+    # Deferred import to avoid a cycle: backend writes metrics through this module
+    from backend import safe_read_file
+
+    content = safe_read_file(metrics_path(log_path))
+    if not content:
+        return None
+    try:
+        return json.loads(content)
+    except ValueError:
+        return None
+
+
+def process_peak_rss(pid):
+    """Peak resident set size (VmHWM) of a running process in bytes, or None."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def own_peak_rss():
+    """Peak RSS of this process in bytes (the GUI, or the headless runner)."""
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def children_peak_rss():
+    """Peak RSS of the largest child process waited for so far, in bytes."""
+    return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024
+
+
+class ScanMetrics:
+    """
+    Timings of one scan. Phases accumulate seconds from any thread:
+    walk, cache and dedupe phases are time spent producing work, file_scan
+    sums the engine time of every file across workers (so it can exceed
+    the wall time), and database_load is the longest wait for an engine
+    to become ready. Throughput is sampled as files and bytes complete.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.phases = {}
+        self.samples = []  # (elapsed, files, bytes)
+        self.engine = None
+        self.workers = None
+        self.profile = None
+        self.scan_profile = None
+        self.skipped = None  # {rule: {"files", "bytes", "dirs"}} kept from the engine by the scan profile
+        self.first_detection = None  # Seconds from the start to the first infected file
+        self.coverage = None  # Files covered by a scan with a time budget (see ScannerThread._report_coverage)
+        self.engine_peak_rss = None
+        self._sample_every = SAMPLE_INTERVAL
+        self._last_sample = None
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def add_max(self, name, seconds):
+        """Keeps the longest of several concurrent waits (e.g. clamscan processes loading the database)."""
+        with self._lock:
+            self.phases[name] = max(self.phases.get(name, 0.0), seconds)
+
+    def detection(self):
+        """Notes a detection; the first one sets the time to first detection."""
+        with self._lock:
+            if self.first_detection is None:
+                self.first_detection = round(time.monotonic() - self.started, 3)
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def timed_iter(self, name, iterable):
+        """Passes iterable through, adding the time spent producing each item to phase name."""
+        iterator = iter(iterable)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add(name, time.perf_counter() - started)
+                return
+            self.add(name, time.perf_counter() - started)
+            yield item
+
+    def sample(self, files, size, force=False):
+        """Records completed files/bytes, at most every SAMPLE_INTERVAL seconds."""
+        now = time.monotonic()
+        with self._lock:
+            if not force and self._last_sample is not None and now - self._last_sample < self._sample_every:
+                return
+            self._last_sample = now
+            self.samples.append((round(now - self.started, 3), files, size))
+            if len(self.samples) >= MAX_SAMPLES:
+                # Halve the resolution instead of growing without bound
+                self.samples = self.samples[::2]
+                self._sample_every *= 2
+
+    def report(self, files, size, slowest=()):
+        """Builds the JSON-ready metrics document for a finished scan."""
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        with self._lock:
+            samples = list(self.samples)
+            phases = {name: round(seconds, 3) for name, seconds in self.phases.items()}
+
+        peak_files_rate = peak_bytes_rate = 0.0
+        for (t0, f0, b0), (t1, f1, b1) in zip(samples, samples[1:]):
+            if t1 > t0:
+                peak_files_rate = max(peak_files_rate, (f1 - f0) / (t1 - t0))
+                peak_bytes_rate = max(peak_bytes_rate, (b1 - b0) / (t1 - t0))
+
+        return {
+            "version": METRICS_VERSION,
+            "engine": self.engine,
+            "workers": self.workers,
+            "profile": self.profile,
+            "scan_profile": self.scan_profile,
+            "skipped": self.skipped or {},
+            "wall_seconds": round(elapsed, 3),
+            "first_detection_seconds": self.first_detection,
+            "coverage": self.coverage,
+            "files": files,
+            "bytes": size,
+            "files_per_second": round(files / elapsed, 2),
+            "bytes_per_second": round(size / elapsed, 2),
+            "peak_files_per_second": round(peak_files_rate, 2),
+            "peak_bytes_per_second": round(peak_bytes_rate, 2),
+            "phases": phases,
+            "throughput": [{"t": t, "files": f, "bytes": b} for t, f, b in samples],
+            "peak_rss": {"engine": self.engine_peak_rss, "app": own_peak_rss()},
+            "slowest": [result._asdict() for result in slowest],
+        }
+
+
+def write_metrics(log_path, report):
+    """Writes report next to the scan log with the log's permissions (0600, no symlinks)."""
+    fd = os.open(metrics_path(log_path), os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_NOFOLLOW, 0o600)
+    with os.fdopen(fd, "w") as f:
+        json.dump(report, f, indent=2)
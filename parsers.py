@@ -1,6 +1,9 @@
 import re
 
 class ScanParser:
+    # Every value parse() can give "status"
+    STATUSES = ("Clean", "Infected", "Unknown")
+
     @staticmethod
     def parse(summary_text):
         """
@@ -13,6 +16,8 @@ class ScanParser:
             "scanned_directories": "0",
             "scanned_files": "0",
             "infected_files": 0,
+            "covered_files": "0",
+            "cached_files": "0",
             "data_scanned": "N/A",
             "data_read": "N/A",
             "time": "N/A",
@@ -30,6 +35,8 @@ class ScanParser:
             "scanned_directories": r"Scanned directories: (\d+)",
             "scanned_files": r"Scanned files: (\d+)",
             "infected_files": r"Infected files: (\d+)",
+            "covered_files": r"Covered files: (\d+)",
+            "cached_files": r"Cached files: (\d+)",
             "data_scanned": r"Data scanned: ([\d\.]+ [A-Z]+)",
             "data_read": r"Data read: (.*)",
             "time": r"Time: (.*)",
@@ -54,6 +61,9 @@ class ScanParser:
         return data
 
 class UpdateParser:
+    # Every value parse() can give "status"
+    STATUSES = ("Success", "Up-to-date", "Finished", "Failed", "Unknown")
+
     @staticmethod
     def parse(log_text):
         """
@@ -0,0 +1,125 @@
+import json
+import os
+import re
+import time
+import urllib.parse
+import xml.etree.ElementTree as ElementTree
+
+# Seconds a quick scan may take before it ends with a partial report
+QUICK_SCAN_BUDGET = 60
+# Scan profile of quick scans (see filters.py)
+QUICK_SCAN_PROFILE = "quick"
+QUICK_SCAN_LABEL = "Quick Scan"
+# Recently used files modified within this many days are included
+RECENT_DAYS = 7
+RECENT_FILES_MAX = 500
+
+QUICK_SCAN_CONFIG_VERSION = 1
+
+# Below the home folder: where browsers cache downloads and programs set
+# themselves up to start
+HOME_LOCATIONS = (
+    ".local/bin",
+    ".config/autostart",
+    ".config/systemd/user",
+    ".local/share/applications",
+    ".cache/mozilla/firefox",
+    ".cache/google-chrome",
+    ".cache/chromium",
+    ".cache/BraveSoftware",
+    ".cache/microsoft-edge",
+    ".cache/opera",
+    ".var/app/org.mozilla.firefox/cache",
+    ".var/app/com.google.Chrome/cache",
+)
+# World-writable folders where droppers stage their payloads
+SYSTEM_LOCATIONS = ("/tmp", "/var/tmp", "/dev/shm", "/etc/xdg/autostart")
+
+RECENT_FILES = ".local/share/recently-used.xbel"
+
+
+def load_quick_scan_config(path):
+    """
+    Quick scan settings: {"budget_seconds": 60, "locations": [extra paths],
+    "recent_days": 7}. Missing or invalid values keep their defaults.
+    """
+    # Deferred import to avoid a cycle: backend is heavy and only needed here
+    from backend import safe_read_file
+
+    config = {"budget_seconds": QUICK_SCAN_BUDGET, "locations": [], "recent_days": RECENT_DAYS}
+    content = safe_read_file(path)
+    if content:
+        try:
+            saved = json.loads(content)
+        except ValueError:
+            saved = None
+        if isinstance(saved, dict) and saved.get("version", QUICK_SCAN_CONFIG_VERSION) == QUICK_SCAN_CONFIG_VERSION:
+            for key in ("budget_seconds", "recent_days"):
+                value = saved.get(key)
+                # bool is an int, but true is not a number of seconds or days
+                if isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0:
+                    config[key] = value
+            locations = saved.get("locations")
+            if isinstance(locations, list):
+                config["locations"] = [p for p in locations if isinstance(p, str)]
+    return config
+
+
+def xdg_user_dir(name, default, home):
+    """A folder from ~/.config/user-dirs.dirs (name: 'DOWNLOAD', 'DESKTOP'...), localized names included."""
+    fallback = os.path.join(home, default)
+    try:
+        with open(os.path.join(home, ".config", "user-dirs.dirs")) as f:
+            for line in f:
+                match = re.match(rf'\s*XDG_{name}_DIR\s*=\s*"(.*)"', line)
+                if match:
+                    return match.group(1).replace("$HOME", home)
+    except OSError:
+        pass
+    return fallback
+
+
+def recent_files(home, days=RECENT_DAYS, limit=RECENT_FILES_MAX):
+    """Local files from the desktop's recently used list that were modified within days, newest first."""
+    try:
+        tree = ElementTree.parse(os.path.join(home, RECENT_FILES))
+    except (OSError, ElementTree.ParseError):
+        return []
+    cutoff = time.time() - days * 24 * 3600
+    found = []
+    for bookmark in tree.getroot().iter("bookmark"):
+        href = bookmark.get("href", "")
+        if not href.startswith("file://"):
+            continue
+        path = urllib.parse.unquote(urllib.parse.urlparse(href).path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        if os.path.isfile(path) and st.st_mtime >= cutoff:
+            found.append((st.st_mtime, path))
+    found.sort(reverse=True)
+    return [path for _, path in found[:limit]]
+
+
+def quick_scan_targets(config, home=None):
+    """
+    The existing high-risk locations a quick scan covers, without paths
+    that lie inside another one.
+    """
+    home = home or os.path.expanduser("~")
+    candidates = [xdg_user_dir("DOWNLOAD", "Downloads", home), xdg_user_dir("DESKTOP", "Desktop", home)]
+    candidates += [os.path.join(home, path) for path in HOME_LOCATIONS]
+    candidates += list(SYSTEM_LOCATIONS)
+    candidates += [os.path.expanduser(path) for path in config.get("locations", [])]
+    candidates += recent_files(home, config.get("recent_days", RECENT_DAYS))
+
+    targets = []
+    for path in candidates:
+        path = os.path.abspath(path)
+        # The home folder itself is a full scan, not a quick one
+        if path == home or not os.path.exists(path) or path in targets:
+            continue
+        targets.append(path)
+    folders = [path.rstrip(os.sep) + os.sep for path in targets if os.path.isdir(path)]
+    return [path for path in targets if not any(path.startswith(folder) for folder in folders)]
@@ -0,0 +1,102 @@
+import collections
+import heapq
+import itertools
+import threading
+
+# One scanned file. verdict is 'OK', 'FOUND' or 'ERROR'; signature is set
+# for FOUND, error for ERROR. duration is the engine time in seconds, or
+# None when it is unknown (inherited verdicts, clamscan's first file).
+ScanResult = collections.namedtuple("ScanResult", "path verdict signature size duration error")
+
+# Clean files kept per run for the "Slowest Files" report
+SLOWEST_KEPT = 25
+
+
+def make_result(path, verdict, detail="", size=0, duration=None):
+    """Builds a ScanResult from an engine (verdict, detail) pair."""
+    return ScanResult(path, verdict,
+                      detail if verdict == "FOUND" else "",
+                      size,
+                      duration,
+                      detail if verdict == "ERROR" else "")
+
+
+def parse_clamscan_line(line, paths=None):
+    """
+    Parses one per-file line of clamscan output ('<path>: OK',
+    '<path>: <signature> FOUND', '<path>: <message> ERROR').
+    Returns (path, verdict, detail) or None for any other line.
+
+    Paths may contain ': ', so the split point is ambiguous. When paths
+    (a container of the scanned paths) is given, the first split that
+    yields a known path wins. Otherwise signatures are taken to contain
+    no ': ' and error messages to start after the first one.
+    """
+    if line.endswith(": OK"):
+        return line[:-len(": OK")], "OK", ""
+    if line.endswith(" FOUND"):
+        verdict, body = "FOUND", line[:-len(" FOUND")]
+    elif line.endswith(" ERROR"):
+        verdict, body = "ERROR", line[:-len(" ERROR")]
+    else:
+        return None
+
+    if paths is not None:
+        index = body.find(": ")
+        while index >= 0:
+            if body[:index] in paths:
+                return body[:index], verdict, body[index + 2:]
+            index = body.find(": ", index + 1)
+
+    if verdict == "FOUND":
+        path, sep, detail = body.rpartition(": ")
+    else:
+        path, sep, detail = body.partition(": ")
+    if not sep:
+        return None
+    return path, verdict, detail
+
+
+class ScanResults:
+    """
+    Per-file records of one scan. Every infected or failed file is kept;
+    of the files that passed, only the SLOWEST_KEPT slowest are, so memory
+    stays flat on large trees. Safe to feed from several workers.
+    """
+
+    def __init__(self, slowest_kept=SLOWEST_KEPT):
+        self.slowest_kept = slowest_kept
+        self.flagged = []
+        self.count = 0
+        self._slowest = []  # min-heap of (duration, seq, result)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def add(self, result):
+        with self._lock:
+            self.count += 1
+            if result.verdict != "OK":
+                self.flagged.append(result)
+            elif result.duration is not None:
+                item = (result.duration, next(self._seq), result)
+                if len(self._slowest) < self.slowest_kept:
+                    heapq.heappush(self._slowest, item)
+                elif item[0] > self._slowest[0][0]:
+                    heapq.heapreplace(self._slowest, item)
+
+    def infected(self):
+        with self._lock:
+            return [r for r in self.flagged if r.verdict == "FOUND"]
+
+    def errors(self):
+        with self._lock:
+            return [r for r in self.flagged if r.verdict == "ERROR"]
+
+    def slowest(self):
+        """Clean files with the longest engine time, slowest first."""
+        with self._lock:
+            return [item[2] for item in sorted(self._slowest, reverse=True)]
+
+    def records(self):
+        """Everything kept, in the order reports list it."""
+        return self.infected() + self.errors() + self.slowest()
@@ -0,0 +1,103 @@
+import bisect
+import itertools
+import os
+import stat
+import threading
+import time
+
+# Points per kind of file, by extension; the highest match counts
+RISK_EXTENSIONS = {
+    # Executables and installers
+    ".exe": 50, ".scr": 50, ".com": 50, ".pif": 50, ".dll": 40, ".sys": 40, ".msi": 45, ".cpl": 45,
+    ".elf": 45, ".so": 30, ".run": 40, ".appimage": 45, ".apk": 45, ".jar": 40, ".deb": 35,
+    ".rpm": 35, ".dmg": 35, ".pkg": 35,
+    # Scripts run by shells, Windows Script Host and browsers
+    ".js": 40, ".jse": 45, ".vbs": 45, ".vbe": 45, ".wsf": 45, ".hta": 45, ".ps1": 45, ".bat": 45,
+    ".cmd": 45, ".lnk": 40, ".sh": 30, ".py": 20, ".desktop": 35,
+    # Office formats that carry macros
+    ".docm": 45, ".xlsm": 45, ".pptm": 45, ".dotm": 45, ".xlam": 45, ".ppam": 45, ".xlsb": 35,
+    ".doc": 35, ".xls": 35, ".ppt": 35, ".rtf": 30, ".one": 35,
+    # Archives and disk images that hide other files
+    ".zip": 30, ".rar": 30, ".7z": 30, ".cab": 30, ".iso": 30, ".img": 25, ".vhd": 25, ".tar": 20, ".gz": 20,
+    ".tgz": 20, ".bz2": 20, ".xz": 20, ".zst": 20,
+    ".pdf": 20,
+}
+# Points for files marked executable that have no listed extension
+EXECUTABLE_MODE_SCORE = 30
+# Extra points for files modified within RECENT_SECONDS
+RECENT_SCORE = 15
+RECENT_SECONDS = 7 * 24 * 3600
+# Extra points for recent files a browser saved with their origin
+DOWNLOADED_SCORE = 25
+ORIGIN_XATTRS = ("user.xdg.origin.url", "user.xdg.referrer.url")
+# Files below this score are left to the walk: being recent alone is not enough
+RISK_MIN_SCORE = 20
+
+# Files waiting in a RiskQueue at most; the lowest scores make room
+RISK_QUEUE_MAX = 10000
+
+
+def _downloaded(path):
+    getxattr = getattr(os, "getxattr", None)
+    if getxattr is None:
+        return False
+    for name in ORIGIN_XATTRS:
+        try:
+            getxattr(path, name, follow_symlinks=False)
+            return True
+        except OSError:
+            continue
+    return False
+
+
+def risk_score(path, name, st, now=None):
+    """
+    How likely a regular file is to matter if infected, from its name, mode
+    and age; 0 for files that do not stand out. Only recent files are
+    checked for download origin attributes, which costs a system call.
+    """
+    _, ext = os.path.splitext(name)
+    score = RISK_EXTENSIONS.get(ext.lower(), 0)
+    if not score and st.st_mode & (stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH):
+        score = EXECUTABLE_MODE_SCORE
+    now = time.time() if now is None else now
+    if now - st.st_mtime < RECENT_SECONDS:
+        score += RECENT_SCORE
+        if _downloaded(path):
+            score += DOWNLOADED_SCORE
+    return score if score >= RISK_MIN_SCORE else 0
+
+
+class RiskQueue:
+    """
+    The riskiest files found so far, newest first among equal scores.
+    Bounded by RISK_QUEUE_MAX; pushes and pops come from different threads.
+    """
+
+    def __init__(self, limit=RISK_QUEUE_MAX):
+        self.limit = limit
+        self._items = []  # (score, mtime, seq, entry), ascending
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def push(self, score, entry):
+        """entry: (path, size, stat, walk key)."""
+        item = (score, entry[2].st_mtime, next(self._seq), entry)
+        with self._lock:
+            if len(self._items) >= self.limit:
+                if item <= self._items[0]:
+                    return
+                del self._items[0]
+            bisect.insort(self._items, item)
+
+    def pop(self):
+        """The riskiest entry, or None."""
+        with self._lock:
+            return self._items.pop()[3] if self._items else None
+
+    def clear(self):
+        with self._lock:
+            self._items = []
+
+    def __len__(self):
+        return len(self._items)
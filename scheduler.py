@@ -0,0 +1,334 @@
+"""
+Scheduled updates and scans that run without the GUI, as systemd user
+timers. Each job in schedule.json gets a clambite-<job>.timer that starts
+'clambite --headless schedule run <job>'; the run waits for the user to
+be away before it starts and writes its results to the same logs and
+history as the GUI.
+"""
+
+import json
+import os
+import re
+import subprocess
+import time
+
+from governor import PROFILES, QUEUED_PROFILE, on_battery
+
+SCHEDULE_CONFIG_VERSION = 1
+
+# Update the definitions every six hours (the mirrors publish a few times a day)
+# and run a Quick Scan daily. Calendars use systemd's OnCalendar syntax.
+DEFAULT_SCHEDULE = {
+    "update": {"calendar": "*-*-* 00/6:00:00", "enabled": True},
+    "scans": [{"name": "quick", "quick": True, "calendar": "daily"}],
+    # Random delay added to each start, so runs do not line up with others
+    "jitter_minutes": 30,
+    # Seconds without keyboard or mouse input before a run starts
+    "idle_seconds": 300,
+    # Minutes a run waits for the user to be away; after that it starts anyway
+    "max_wait_minutes": 120,
+}
+UPDATE_JOB = "update"
+
+UNIT_PREFIX = "clambite-"
+# First line of every unit file written here, so only those are ever removed
+UNIT_MARKER = "# Generated by ClamBite from schedule.json; changes are overwritten"
+# Seconds between checks while a run waits for the user to be away
+IDLE_POLL_SECONDS = 30
+
+
+def load_schedule(path):
+    """
+    Scheduled jobs: {"update": {"calendar", "enabled"}, "scans": [{"name",
+    "calendar", "paths" or "quick": true, "scan_profile", "profile",
+    "budget_seconds"}], "jitter_minutes", "idle_seconds", "max_wait_minutes"}.
+    Missing or invalid values keep their defaults.
+    """
+    # Deferred import to avoid a cycle: backend is heavy and only needed here
+    from backend import safe_read_file
+
+    config = json.loads(json.dumps(DEFAULT_SCHEDULE))
+    content = safe_read_file(path)
+    if not content:
+        return config
+    try:
+        saved = json.loads(content)
+    except ValueError:
+        return config
+    if not isinstance(saved, dict) or saved.get("version", SCHEDULE_CONFIG_VERSION) != SCHEDULE_CONFIG_VERSION:
+        return config
+
+    if isinstance(saved.get("update"), dict):
+        config["update"].update(saved["update"])
+    if isinstance(saved.get("scans"), list):
+        config["scans"] = []
+        for scan in saved["scans"]:
+            if not isinstance(scan, dict) or not valid_job_name(scan.get("name")) or scan["name"] == UPDATE_JOB:
+                continue
+            paths = scan.get("paths")
+            scan["paths"] = [p for p in ([paths] if isinstance(paths, str) else paths or []) if isinstance(p, str)]
+            if scan.get("quick") or scan["paths"]:
+                config["scans"].append(scan)
+    for key in ("jitter_minutes", "idle_seconds", "max_wait_minutes"):
+        if isinstance(saved.get(key), (int, float)) and saved[key] >= 0:
+            config[key] = saved[key]
+    return config
+
+
+def valid_job_name(name):
+    """Job names end up in unit file names and command lines."""
+    return isinstance(name, str) and re.fullmatch(r"[A-Za-z0-9_-]{1,64}", name) is not None
+
+
+def scheduled_jobs(config):
+    """{job name: job settings} of every enabled job."""
+    jobs = {}
+    if config["update"].get("enabled", True):
+        jobs[UPDATE_JOB] = config["update"]
+    for scan in config["scans"]:
+        if scan.get("enabled", True):
+            jobs[scan["name"]] = scan
+    return jobs
+
+
+def scan_options(job):
+    """The ScannerThread options of a scheduled scan: Background profile, scan cache on."""
+    profile = job.get("profile") if job.get("profile") in PROFILES else QUEUED_PROFILE
+    engine = job.get("engine") if job.get("engine") in ("clamd", "clamscan") else "clamd"
+    return {"engine": engine, "profile": profile, "use_cache": True}
+
+
+def unit_dir():
+    config_home = os.environ.get("XDG_CONFIG_HOME") or os.path.expanduser("~/.config")
+    return os.path.join(config_home, "systemd", "user")
+
+
+def unit_files(config, command):
+    """
+    {file name: content} of the service and timer of every job. command:
+    the argument list that starts ClamBite headless.
+    """
+    jitter = int(config["jitter_minutes"] * 60)
+    files = {}
+    for name, job in scheduled_jobs(config).items():
+        unit = UNIT_PREFIX + name
+        what = "definitions update" if name == UPDATE_JOB else f"scan '{name}'"
+        exec_start = " ".join(_quote(arg) for arg in command + ["schedule", "run", name])
+        files[unit + ".service"] = "\n".join([
+            UNIT_MARKER,
+            "[Unit]",
+            f"Description=ClamBite scheduled {what}",
+            "",
+            "[Service]",
+            "Type=oneshot",
+            f"ExecStart={exec_start}",
+            # clamd outlives the run: the GUI and the next run reuse the loaded database
+            "KillMode=process",
+            "",
+        ])
+        files[unit + ".timer"] = "\n".join([
+            UNIT_MARKER,
+            "[Unit]",
+            f"Description=Run the ClamBite {what} on schedule",
+            "",
+            "[Timer]",
+            f"OnCalendar={job.get('calendar', 'daily')}",
+            f"RandomizedDelaySec={jitter}",
+            # Runs missed while the machine was off start after the next boot
+            "Persistent=true",
+            "",
+            "[Install]",
+            "WantedBy=timers.target",
+            "",
+        ])
+    return files
+
+
+def _quote(arg):
+    # systemd splits ExecStart like a shell, without expanding anything but % and $
+    arg = arg.replace("%", "%%").replace("$", "$$")
+    if re.fullmatch(r"[A-Za-z0-9_@%+=:,./$-]+", arg):
+        return arg
+    return '"' + arg.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _systemctl(args, log):
+    from backend import secure_which
+
+    systemctl = secure_which("systemctl")
+    if systemctl is None:
+        log("systemctl not found; run 'clambite --headless schedule run JOB' from cron instead.")
+        return False
+    try:
+        proc = subprocess.run([systemctl, "--user"] + args, capture_output=True, text=True, timeout=60)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        log(f"systemctl error: {e}")
+        return False
+    if proc.returncode != 0:
+        log(f"systemctl {' '.join(args)}: {proc.stderr.strip() or proc.returncode}")
+        return False
+    return True
+
+
+def _installed_units(directory):
+    """Unit files in directory that were written by ClamBite."""
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return []
+    installed = []
+    for name in names:
+        if not name.startswith(UNIT_PREFIX) or not name.endswith((".service", ".timer")):
+            continue
+        try:
+            fd = os.open(os.path.join(directory, name), os.O_RDONLY | os.O_NOFOLLOW)
+            with os.fdopen(fd) as f:
+                if f.readline().rstrip("\n") == UNIT_MARKER:
+                    installed.append(name)
+        except OSError:
+            continue
+    return sorted(installed)
+
+
+def _write_unit(path, content):
+    """
+    Replaces a unit file atomically (0600, no symlinks): a planted link
+    cannot redirect the write and a crash cannot leave half a unit.
+    """
+    tmp_path = path + ".tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_NOFOLLOW, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def install_timers(config, command, log, directory=None):
+    """
+    Writes the units of the scheduled jobs, removes those of jobs no longer
+    configured and enables the timers. Returns False on errors.
+    """
+    directory = directory or unit_dir()
+    files = unit_files(config, command)
+    stale = [name for name in _installed_units(directory) if name not in files]
+    stale_timers = [name for name in stale if name.endswith(".timer")]
+    if stale_timers:
+        _systemctl(["disable", "--now"] + stale_timers, log)
+
+    try:
+        os.makedirs(directory, exist_ok=True)
+        for name in stale:
+            os.unlink(os.path.join(directory, name))
+        for name, content in files.items():
+            _write_unit(os.path.join(directory, name), content)
+    except OSError as e:
+        log(f"Could not write the timer units: {e}")
+        return False
+
+    for name, job in scheduled_jobs(config).items():
+        log(f"Scheduled {name}: {job.get('calendar', 'daily')}")
+    timers = sorted(name for name in files if name.endswith(".timer"))
+    if not _systemctl(["daemon-reload"], log):
+        return False
+    return not timers or _systemctl(["enable", "--now"] + timers, log)
+
+
+def remove_timers(log, directory=None):
+    """Disables and deletes every timer ClamBite installed. Returns False on errors."""
+    directory = directory or unit_dir()
+    installed = _installed_units(directory)
+    timers = [name for name in installed if name.endswith(".timer")]
+    ok = not timers or _systemctl(["disable", "--now"] + timers, log)
+    for name in installed:
+        try:
+            os.unlink(os.path.join(directory, name))
+        except OSError as e:
+            log(f"Could not remove {name}: {e}")
+            ok = False
+    if installed:
+        ok = _systemctl(["daemon-reload"], log) and ok
+    log(f"Removed {len(timers)} scheduled job(s).")
+    return ok
+
+
+def installed_jobs(directory=None):
+    """Names of the jobs that have a timer installed."""
+    return [name[len(UNIT_PREFIX):-len(".timer")] for name in _installed_units(directory or unit_dir())
+            if name.endswith(".timer")]
+
+
+def session_idle_provider():
+    """
+    Returns a callable giving the seconds since the last user input without
+    loading GTK: from GNOME's idle monitor, else from logind's idle hint
+    (set after the session's idle delay). The callable returns None while
+    nobody is logged in graphically.
+    """
+    from backend import secure_which
+
+    gdbus = secure_which("gdbus")
+    loginctl = secure_which("loginctl")
+
+    def mutter_idle():
+        if gdbus is None or not os.environ.get("DBUS_SESSION_BUS_ADDRESS"):
+            return None
+        try:
+            out = subprocess.run(
+                [gdbus, "call", "--session", "--dest", "org.gnome.Mutter.IdleMonitor",
+                 "--object-path", "/org/gnome/Mutter/IdleMonitor/Core",
+                 "--method", "org.gnome.Mutter.IdleMonitor.GetIdletime"],
+                capture_output=True, text=True, timeout=5).stdout
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+        # Reply: (uint64 12345,)
+        match = re.search(r"(\d+)", out)
+        return int(match.group(1)) / 1000 if match else None
+
+    def logind_idle():
+        if loginctl is None:
+            return None
+        try:
+            out = subprocess.run([loginctl, "show-user", str(os.getuid()), "-p", "IdleHint", "-p", "IdleSinceHint"],
+                                 capture_output=True, text=True, timeout=5).stdout
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+        props = dict(line.split("=", 1) for line in out.splitlines() if "=" in line)
+        if "IdleHint" not in props:
+            return None  # Not logged in
+        if props["IdleHint"] != "yes":
+            return 0.0
+        try:
+            # Microseconds since the epoch
+            return max(0.0, time.time() - int(props.get("IdleSinceHint", "0")) / 1e6)
+        except ValueError:
+            return None
+
+    def idle_seconds():
+        idle = mutter_idle()
+        return idle if idle is not None else logind_idle()
+    return idle_seconds
+
+
+def wait_until_quiet(config, idle_provider, log, clock=time.monotonic):
+    """
+    Waits until the user has been away for idle_seconds and the machine is
+    plugged in, or max_wait_minutes have passed. Unknown idle times (no
+    graphical session) count as away. Returns the seconds waited.
+    """
+    started = clock()
+    deadline = started + config["max_wait_minutes"] * 60
+    announced = False
+    while True:
+        idle = idle_provider() if idle_provider else None
+        battery = on_battery()
+        if (idle is None or idle >= config["idle_seconds"]) and not battery:
+            break
+        if clock() >= deadline:
+            log("Still in use; starting anyway.")
+            break
+        if not announced:
+            log("Waiting for the machine to be idle" + (" and plugged in" if battery else "") + "...")
+            announced = True
+        time.sleep(IDLE_POLL_SECONDS)
+    return clock() - started
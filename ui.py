@@ -1,12 +1,22 @@
 import os, time
 import re
+import sqlite3
+import threading
 import gi
 from datetime import datetime, timedelta
 gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
 from gi.repository import Gtk, Adw, GLib, Gio, GObject, Pango, Gdk
-from backend import ScannerThread, safe_read_file
+from backend import safe_read_file
 from parsers import ScanParser, UpdateParser
+from history import HistoryStore
+from metrics import load_metrics
+from checkpoint import checkpoint_path, discard_checkpoint, find_checkpoints, load_checkpoint, owner_alive
+from jobs import JobQueue, Job
+from governor import PROFILES, PROFILE_ORDER, governor
+from filters import DEFAULT_SCAN_PROFILE, RULE_LABELS, load_scan_profiles
+from quickscan import QUICK_SCAN_LABEL, QUICK_SCAN_PROFILE, load_quick_scan_config, quick_scan_targets
+from watcher import FolderWatcher, load_watch_config, save_watch_config
 
 
 def _safe_read_file(path):
@@ -16,37 +26,150 @@ def _safe_read_file(path):
     content = safe_read_file(path)
     return content if content is not None else ""
 
+# Lines kept by the live log viewer; older lines are only in the log file
+LOG_VIEW_MAX_LINES = 10000
+
+
+class LogStore:
+    """
+    Ring buffer of log lines exposed as a Gio.ListModel. Appending a batch
+    costs the same no matter how long the scan has been running: once the
+    cap is reached the oldest lines are dropped from the front.
+    """
+    def __init__(self, max_lines=LOG_VIEW_MAX_LINES):
+        self.max_lines = max_lines
+        self.model = Gio.ListStore(item_type=Gtk.StringObject)
+
+    def append_lines(self, lines):
+        lines = lines[-self.max_lines:]
+        n_items = self.model.get_n_items()
+        overflow = max(0, n_items + len(lines) - self.max_lines)
+        if overflow:
+            self.model.splice(0, overflow, [])
+        self.model.splice(n_items - overflow, 0, [Gtk.StringObject.new(line) for line in lines])
+
+    def clear(self):
+        self.model.remove_all()
+
+
 class LogWindow(Adw.Window):
-    def __init__(self, parent_window, buffer):
+    def __init__(self, parent_window, log_store, log_path=None):
         super().__init__(title="Scan Logs", transient_for=parent_window, modal=True)
         self.set_default_size(600, 400)
+        self.log_path = log_path
+        self._follow = True
         
         # Toolbar
         tb_view = Adw.ToolbarView()
         header = Adw.HeaderBar()
         tb_view.add_top_bar(header)
+
+        # Filter: only threats and errors
+        self.filter = Gtk.CustomFilter.new(self._match_problem)
+        self.btn_filter = Gtk.ToggleButton(icon_name="dialog-warning-symbolic")
+        self.btn_filter.set_tooltip_text("Show only FOUND and ERROR lines")
+        self.btn_filter.connect("toggled", self.on_filter_toggled)
+        header.pack_start(self.btn_filter)
+
+        # The viewer only keeps the most recent lines; the file has them all
+        btn_open = Gtk.Button(icon_name="document-open-symbolic")
+        btn_open.set_tooltip_text(f"Open full log file (viewer keeps the last {log_store.max_lines} lines)")
+        btn_open.set_sensitive(bool(log_path))
+        btn_open.connect("clicked", self.on_open_file_clicked)
+        header.pack_end(btn_open)
         
-        # Content
+        # Content: rows are recycled, so only visible lines have widgets
+        self.filter_model = Gtk.FilterListModel(model=log_store.model)
+        self.filter_model.set_incremental(True)
+
+        factory = Gtk.SignalListItemFactory()
+        factory.connect("setup", self._on_setup_row)
+        factory.connect("bind", self._on_bind_row)
+
+        list_view = Gtk.ListView(model=Gtk.NoSelection(model=self.filter_model), factory=factory)
+        list_view.add_css_class("monospace")
+
         scrolled = Gtk.ScrolledWindow()
-        text_view = Gtk.TextView(buffer=buffer)
-        text_view.set_editable(False)
-        text_view.set_monospace(True)
-        text_view.set_left_margin(10)
-        text_view.set_right_margin(10)
-        text_view.set_top_margin(10)
-        text_view.set_bottom_margin(10)
-        
-        scrolled.set_child(text_view)
+        scrolled.set_child(list_view)
+        vadj = scrolled.get_vadjustment()
+        vadj.connect("value-changed", self._on_scrolled)
+        vadj.connect("notify::upper", self._on_grown)
+
         tb_view.set_content(scrolled)
         self.set_content(tb_view)
+
+    def _on_setup_row(self, factory, list_item):
+        label = Gtk.Label(xalign=0)
+        label.set_selectable(True)
+        label.set_margin_start(10)
+        label.set_margin_end(10)
+        list_item.set_child(label)
+
+    def _on_bind_row(self, factory, list_item):
+        list_item.get_child().set_label(list_item.get_item().get_string())
+
+    @staticmethod
+    def _match_problem(item):
+        text = item.get_string()
+        return "FOUND" in text or "ERROR" in text
+
+    def on_filter_toggled(self, btn):
+        self.filter_model.set_filter(self.filter if btn.get_active() else None)
+
+    def _on_scrolled(self, adj):
+        # Keep following new lines only while the view is at the bottom
+        self._follow = adj.get_value() >= adj.get_upper() - adj.get_page_size() - 1
+
+    def _on_grown(self, adj, pspec):
+        if self._follow:
+            adj.set_value(adj.get_upper() - adj.get_page_size())
+
+    def on_open_file_clicked(self, btn):
+        if self.log_path and os.path.exists(self.log_path):
+            Gtk.FileLauncher(file=Gio.File.new_for_path(self.log_path)).launch(self, None, None, None)
         
         
+# Rows listed per group of files on the result page
+RESULT_ROWS_SHOWN = 200
+
+# Phases of the metrics file, in the order a scan goes through them
+PERFORMANCE_PHASES = [
+    ("setup", "Environment Setup"),
+    ("database_load", "Database Load"),
+    ("walk", "Tree Walk"),
+    ("cache_lookup", "Cache Lookups"),
+    ("dedupe", "Duplicate Detection"),
+    ("split", "Splitting Large File"),
+    ("stream", "Streaming Large File"),
+    ("file_scan", "File Scanning (all workers)"),
+    ("parse", "Output Parsing"),
+    ("ui_delivery", "Log Delivery"),
+    ("throttled", "Throttled (all workers)"),
+    ("paused", "Paused"),
+]
+
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
 class ScanResultPage(Adw.NavigationPage):
-    def __init__(self, summary_text):
+    def __init__(self, summary_text, results=(), metrics=None, on_resume=None):
+        """
+        results: ScanResult records (infected, failed and slowest files)
+        metrics: the scan's metrics document, see metrics.ScanMetrics.report
+        on_resume: callable continuing the scan, shown for interrupted scans with a checkpoint
+        """
         super().__init__(title="Scan Results", tag="result_page")
         
         # Parse data
         data = ScanParser.parse(summary_text)
+        infected = [r for r in results if r.verdict == "FOUND"]
+        errors = [r for r in results if r.verdict == "ERROR"]
+        slowest = [r for r in results if r.verdict == "OK"]
 
         # Toolbar
         tb_view = Adw.ToolbarView()
@@ -76,12 +199,15 @@ class ScanResultPage(Adw.NavigationPage):
         desc_label.add_css_class("body")
         desc_label.set_margin_top(4)
 
+        coverage = (metrics or {}).get("coverage") or {}
+        partial = coverage.get("complete") is False
+
         # Status Logic
         if data["status"] == "Clean":
             icon.set_from_icon_name("security-high-symbolic")
             icon.add_css_class("success") # Color the icon green
             title_label.set_label("Scan Clean")
-            desc_label.set_label("No threats found.")
+            desc_label.set_label("No threats found in the files scanned so far." if partial else "No threats found.")
         elif data["status"] == "Infected":
             icon.set_from_icon_name("dialog-warning-symbolic")
             icon.add_css_class("error")   # Color the icon red
@@ -95,6 +221,20 @@ class ScanResultPage(Adw.NavigationPage):
         header_box.append(icon)
         header_box.append(title_label)
         header_box.append(desc_label)
+
+        if on_resume:
+            btn_resume = Gtk.Button(label="Resume Scan", halign=Gtk.Align.CENTER)
+            btn_resume.add_css_class("suggested-action")
+            btn_resume.add_css_class("pill")
+            btn_resume.set_margin_top(8)
+            btn_resume.set_tooltip_text("Continue where this scan was interrupted")
+
+            def on_resume_clicked(btn):
+                btn.set_sensitive(False)
+                on_resume()
+
+            btn_resume.connect("clicked", on_resume_clicked)
+            header_box.append(btn_resume)
         
         # Add Header to Root (Fixed at top)
         root_box.append(header_box)
@@ -117,6 +257,14 @@ class ScanResultPage(Adw.NavigationPage):
 
         # --- CONTENT ITEMS ---
 
+        # Files needing attention
+        if infected:
+            self._add_file_group(content_box, "Infected Files", infected,
+                                 lambda r: r.signature, "dialog-warning-symbolic")
+        if errors:
+            self._add_file_group(content_box, "Files Not Scanned", errors,
+                                 lambda r: r.error, "dialog-error-symbolic")
+
         # Metrics Group
         grp_metrics = Adw.PreferencesGroup(title="Scan Metrics")
         content_box.append(grp_metrics)
@@ -154,6 +302,41 @@ class ScanResultPage(Adw.NavigationPage):
         row_files = Adw.ActionRow(title="Files Scanned", subtitle=str(data.get("scanned_files", "0")))
         grp_data.add(row_files)
 
+        # Files covered by the report (includes duplicates and cache hits)
+        if data.get("covered_files", "0") not in ("0", data.get("scanned_files", "0")):
+            row_covered = Adw.ActionRow(title="Files Covered", subtitle=str(data["covered_files"]))
+            row_covered.set_tooltip_text("Identical copies share the verdict of the one copy that was scanned")
+            grp_data.add(row_covered)
+
+        # Cache hits (only reported by incremental folder scans)
+        if data.get("cached_files", "0") != "0":
+            row_cached = Adw.ActionRow(title="Files From Cache", subtitle=str(data["cached_files"]))
+            row_cached.set_tooltip_text("Unchanged files already verified clean with the current definitions")
+            grp_data.add(row_cached)
+
+        # Time budget ran out before everything was scanned
+        if partial:
+            total = coverage.get("total_files")
+            covered = f"{coverage['files']} of {total} files" if total else f"{coverage['files']} files"
+            row_coverage = Adw.ActionRow(title="Partial Coverage",
+                                         subtitle=f"{covered} · time budget of {coverage['budget_seconds']:g} s")
+            row_coverage.set_tooltip_text("The scan stopped at its time budget; resume it to scan the rest")
+            row_coverage.add_prefix(Gtk.Image.new_from_icon_name("dialog-information-symbolic"))
+            grp_data.add(row_coverage)
+
+        # Left out by the scan profile before reaching the engine (folder scans)
+        if metrics and metrics.get("skipped"):
+            self._add_skipped_row(grp_data, metrics["skipped"])
+
+        # Where the engine spent its time
+        if slowest:
+            self._add_file_group(content_box, "Slowest Files", slowest,
+                                 lambda r: f"{r.duration:.2f} s · {format_bytes(r.size)}",
+                                 "alarm-symbolic")
+
+        if metrics:
+            self._add_performance_group(content_box, metrics)
+
         # Raw Output
         inner_scrolled = Gtk.ScrolledWindow()
         inner_scrolled.set_min_content_height(150)
@@ -172,6 +355,80 @@ class ScanResultPage(Adw.NavigationPage):
         raw_expander.set_child(inner_scrolled)
         content_box.append(raw_expander)        
 
+    def _add_performance_group(self, content_box, metrics):
+        grp = Adw.PreferencesGroup(title="Performance")
+        engine = metrics.get("engine") or "N/A"
+        if metrics.get("workers"):
+            engine = f"{engine} · {metrics['workers']} workers"
+        if metrics.get("profile") in PROFILES:
+            engine = f"{engine} · {PROFILES[metrics['profile']].label}"
+        if metrics.get("scan_profile"):
+            engine = f"{engine} · {metrics['scan_profile']} scan"
+        grp.set_description(f"Engine: {engine}")
+        content_box.append(grp)
+
+        rate = f"{metrics['files_per_second']:.0f} files/s · {format_bytes(metrics['bytes_per_second'])}/s"
+        row_rate = Adw.ActionRow(title="Average Throughput", subtitle=rate)
+        row_rate.add_prefix(Gtk.Image.new_from_icon_name("speedometer-symbolic"))
+        grp.add(row_rate)
+
+        if metrics.get("first_detection_seconds") is not None:
+            row_first = Adw.ActionRow(title="First Detection",
+                                      subtitle=f"{metrics['first_detection_seconds']:.1f} s after the start")
+            row_first.set_tooltip_text("High-risk files are scanned first, so threats tend to show up early")
+            row_first.add_prefix(Gtk.Image.new_from_icon_name("dialog-warning-symbolic"))
+            grp.add(row_first)
+
+        if metrics.get("peak_files_per_second"):
+            peak = (f"{metrics['peak_files_per_second']:.0f} files/s · "
+                    f"{format_bytes(metrics['peak_bytes_per_second'])}/s")
+            grp.add(Adw.ActionRow(title="Peak Throughput", subtitle=peak))
+
+        rss = metrics.get("peak_rss", {})
+        memory = [f"{label} {format_bytes(rss[key])}" for key, label in (("engine", "Engine"), ("app", "ClamBite"))
+                  if rss.get(key)]
+        if memory:
+            row_mem = Adw.ActionRow(title="Peak Memory", subtitle=" · ".join(memory))
+            row_mem.add_prefix(Gtk.Image.new_from_icon_name("drive-multidisk-symbolic"))
+            grp.add(row_mem)
+
+        phases = metrics.get("phases", {})
+        expander = Adw.ExpanderRow(title="Time by Phase", subtitle=f"Wall time {metrics['wall_seconds']:.1f} s")
+        expander.set_icon_name("alarm-symbolic")
+        for key, label in PERFORMANCE_PHASES:
+            if phases.get(key):
+                expander.add_row(Adw.ActionRow(title=label, subtitle=f"{phases[key]:.3f} s"))
+        grp.add(expander)
+
+    def _add_skipped_row(self, grp, skipped):
+        """One expandable row with the files, bytes and folders each rule skipped."""
+        files = sum(entry.get("files", 0) for entry in skipped.values())
+        dirs = sum(entry.get("dirs", 0) for entry in skipped.values())
+        subtitle = f"{files} files" + (f" · {dirs} folders" if dirs else "")
+        expander = Adw.ExpanderRow(title="Skipped", subtitle=subtitle)
+        expander.set_tooltip_text("Left out by the scan profile without being read by the engine")
+        for rule, entry in skipped.items():
+            parts = [f"{entry.get('files', 0)} files", format_bytes(entry.get("bytes", 0))]
+            if entry.get("dirs"):
+                parts.append(f"{entry['dirs']} folders")
+            expander.add_row(Adw.ActionRow(title=RULE_LABELS.get(rule, rule), subtitle=" · ".join(parts)))
+        grp.add(expander)
+
+    def _add_file_group(self, content_box, title, results, describe, icon_name):
+        """Lists one row per file: its name, describe(result) below, the full path as tooltip."""
+        grp = Adw.PreferencesGroup(title=title)
+        if len(results) > RESULT_ROWS_SHOWN:
+            grp.set_description(f"Showing {RESULT_ROWS_SHOWN} of {len(results)} files. The log lists them all.")
+        content_box.append(grp)
+
+        for result in results[:RESULT_ROWS_SHOWN]:
+            name = os.path.basename(result.path.rstrip(os.sep)) or result.path
+            row = Adw.ActionRow(title=GLib.markup_escape_text(name),
+                                subtitle=GLib.markup_escape_text(describe(result) or ""))
+            row.set_tooltip_text(result.path)
+            row.add_prefix(Gtk.Image.new_from_icon_name(icon_name))
+            grp.add(row)
+
 
 class UpdateResultPage(Adw.NavigationPage):
     def __init__(self, log_text):
@@ -482,11 +739,216 @@ class DatabasePage(Adw.NavigationPage):
         except Exception as e:
             print(f"Error reading log: {e}")
 
+# Runs loaded per page in the History lists
+HISTORY_PAGE_SIZE = 50
+
+# (label, seconds back from now) for the History date filter
+HISTORY_DATE_RANGES = [("Any Time", None), ("Today", 0), ("Last 7 Days", 7 * 86400), ("Last 30 Days", 30 * 86400)]
+# Status filter choices: what the parsers can store for each kind of run
+HISTORY_STATUSES = {
+    "scan": ["Any Result", *ScanParser.STATUSES],
+    "update": ["Any Result", *UpdateParser.STATUSES],
+}
+
+
+class HistoryItem(GObject.Object):
+    """One run in a History list model."""
+    __gtype_name__ = "ClamBiteHistoryItem"
+
+    def __init__(self, run):
+        super().__init__()
+        self.run_id = run["id"]
+        if run["kind"] == "scan":
+            self.title = run["target"] or run["log_file"]
+        else:
+            self.title = "Database Update"
+        self.status = run["status"] or ""
+        self.subtitle = self.status
+        if run["started_at"]:
+            when = datetime.fromtimestamp(run["started_at"]).strftime("%Y-%m-%d at %H:%M")
+            self.subtitle = f"{when} · {self.status}" if self.status else when
+
+
+class HistoryList(Gtk.Box):
+    """
+    Filterable list of runs of one kind. Rows are recycled by a
+    Gtk.ListView and pages are fetched from the history store in a
+    background thread as the user scrolls.
+    """
+
+    def __init__(self, history_file, kind, empty_msg, icon_name, on_activate):
+        super().__init__(orientation=Gtk.Orientation.VERTICAL)
+        self.history_file = history_file
+        self.kind = kind
+        self.on_activate = on_activate
+        self.model = Gio.ListStore(item_type=HistoryItem)
+        self.filters = {}
+        self._generation = 0
+        self._loading = False
+        self._exhausted = False
+
+        # --- Filter bar ---
+        bar = Gtk.Box(spacing=6)
+        bar.set_margin_top(12)
+        bar.set_margin_bottom(6)
+        bar.set_margin_start(12)
+        bar.set_margin_end(12)
+
+        self.search = Gtk.SearchEntry(placeholder_text="Filter by path" if kind == "scan" else "Search")
+        self.search.set_hexpand(True)
+        self.search.set_sensitive(kind == "scan")
+        self.search.connect("search-changed", self.on_filters_changed)
+        bar.append(self.search)
+
+        self.date_dropdown = Gtk.DropDown.new_from_strings([label for label, _ in HISTORY_DATE_RANGES])
+        self.date_dropdown.connect("notify::selected", self.on_filters_changed)
+        bar.append(self.date_dropdown)
+
+        self.status_dropdown = Gtk.DropDown.new_from_strings(HISTORY_STATUSES[kind])
+        self.status_dropdown.connect("notify::selected", self.on_filters_changed)
+        bar.append(self.status_dropdown)
+
+        clamp_bar = Adw.Clamp(maximum_size=600)
+        clamp_bar.set_child(bar)
+        self.append(clamp_bar)
+
+        # --- List ---
+        factory = Gtk.SignalListItemFactory()
+        factory.connect("setup", self._on_setup_row)
+        factory.connect("bind", self._on_bind_row)
+
+        list_view = Gtk.ListView(model=Gtk.NoSelection(model=self.model), factory=factory)
+        list_view.set_single_click_activate(True)
+        list_view.add_css_class("navigation-sidebar")
+        list_view.connect("activate", self.on_row_activated)
+
+        clamp = Adw.Clamp(maximum_size=600)
+        clamp.set_child(list_view)
+
+        self.scrolled = Gtk.ScrolledWindow()
+        self.scrolled.set_child(clamp)
+        self.scrolled.connect("edge-reached", self.on_edge_reached)
+
+        empty = Adw.StatusPage()
+        empty.set_icon_name(icon_name)
+        empty.set_title("No History")
+        empty.set_description(f"No {empty_msg.lower()} found.")
+
+        self.content = Gtk.Stack()
+        self.content.set_vexpand(True)
+        self.content.add_named(self.scrolled, "list")
+        self.content.add_named(empty, "empty")
+        self.append(self.content)
+
+        self.reload()
+
+    def _on_setup_row(self, factory, list_item):
+        box = Gtk.Box(spacing=12)
+        box.set_margin_top(8)
+        box.set_margin_bottom(8)
+        box.set_margin_start(6)
+        box.set_margin_end(6)
+
+        labels = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=2)
+        labels.set_hexpand(True)
+        title = Gtk.Label(xalign=0, ellipsize=Pango.EllipsizeMode.MIDDLE)
+        subtitle = Gtk.Label(xalign=0)
+        subtitle.add_css_class("dim-label")
+        subtitle.add_css_class("caption")
+        labels.append(title)
+        labels.append(subtitle)
+
+        box.append(labels)
+        box.append(Gtk.Image.new_from_icon_name("go-next-symbolic"))
+        list_item.set_child(box)
+
+    def _on_bind_row(self, factory, list_item):
+        item = list_item.get_item()
+        labels = list_item.get_child().get_first_child()
+        title = labels.get_first_child()
+        title.set_label(item.title)
+        title.set_tooltip_text(item.title)
+        labels.get_last_child().set_label(item.subtitle)
+
+    def on_row_activated(self, list_view, position):
+        item = self.model.get_item(position)
+        if item:
+            self.on_activate(item.run_id)
+
+    def on_filters_changed(self, *args):
+        filters = {}
+        query = self.search.get_text().strip()
+        if query:
+            filters["query"] = query
+
+        _, seconds = HISTORY_DATE_RANGES[self.date_dropdown.get_selected()]
+        if seconds == 0:
+            filters["since"] = datetime.combine(datetime.now().date(), datetime.min.time()).timestamp()
+        elif seconds:
+            filters["since"] = time.time() - seconds
+
+        status_index = self.status_dropdown.get_selected()
+        if status_index > 0:
+            filters["status"] = HISTORY_STATUSES[self.kind][status_index]
+
+        self.filters = filters
+        self.reload()
+
+    def reload(self):
+        """Drops the loaded rows and fetches the first page for the current filters."""
+        self._generation += 1
+        self._loading = False
+        self._exhausted = False
+        self.model.remove_all()
+        self.load_next_page()
+
+    def on_edge_reached(self, scrolled, pos):
+        if pos == Gtk.PositionType.BOTTOM:
+            self.load_next_page()
+
+    def load_next_page(self):
+        if self._loading or self._exhausted:
+            return
+        self._loading = True
+        args = (self._generation, dict(self.filters), self.model.get_n_items())
+        threading.Thread(target=self._fetch_page, args=args, daemon=True).start()
+
+    def _fetch_page(self, generation, filters, offset):
+        # Runs in a worker thread with its own connection
+        rows = []
+        try:
+            store = HistoryStore(self.history_file)
+            try:
+                rows = [dict(r) for r in store.list_runs(self.kind, HISTORY_PAGE_SIZE, offset, **filters)]
+            finally:
+                store.close()
+        except (OSError, sqlite3.Error) as e:
+            print(f"History unavailable: {e}")
+        GLib.idle_add(self._on_page_loaded, generation, rows)
+
+    def _on_page_loaded(self, generation, rows):
+        if generation != self._generation:
+            return  # Filters changed while this page was loading
+        self._loading = False
+        self._exhausted = len(rows) < HISTORY_PAGE_SIZE
+        self.model.splice(self.model.get_n_items(), 0, [HistoryItem(r) for r in rows])
+
+        has_items = self.model.get_n_items() > 0
+        self.content.set_visible_child_name("list" if has_items or self.filters else "empty")
+
+        # Keep loading while the list does not fill the view yet
+        adj = self.scrolled.get_vadjustment()
+        if not self._exhausted and adj.get_upper() <= adj.get_page_size():
+            GLib.idle_add(self.load_next_page)
+
+
 class HistoryPage(Adw.NavigationPage):
-    def __init__(self, nav_view, log_dir):
+    def __init__(self, nav_view, history_file, on_resume=None):
+        """on_resume: callable(checkpoint path) continuing an interrupted scan"""
         super().__init__(title="Scan History", tag="history_page")
         self.nav_view = nav_view
-        self.log_dir = log_dir
+        self.history_file = history_file
+        self.on_resume = on_resume
         
         # Toolbar
         tb_view = Adw.ToolbarView()
@@ -502,8 +964,7 @@ class HistoryPage(Adw.NavigationPage):
         tb_view.add_top_bar(header)
         
         # --- 1. SETUP SCANS TAB ---
-        # Icon for empty state inside the page
-        scans_content = self._create_list_page(log_dir, "scan_", "Scans", "edit-find-symbolic")
+        scans_content = HistoryList(history_file, "scan", "Scans", "edit-find-symbolic", self.on_run_activated)
         
         # Add to stack and capture the page object
         page_scans = self.stack.add_titled(scans_content, "scans", "Scans")
@@ -512,8 +973,7 @@ class HistoryPage(Adw.NavigationPage):
         page_scans.set_icon_name("edit-find-symbolic")
         
         # --- 2. SETUP UPDATES TAB ---
-        # Icon for empty state inside the page
-        updates_content = self._create_list_page(log_dir, "update_", "Updates", "view-refresh-symbolic")
+        updates_content = HistoryList(history_file, "update", "Updates", "view-refresh-symbolic", self.on_run_activated)
         
         # Add to stack and capture the page object
         page_updates = self.stack.add_titled(updates_content, "updates", "Updates")
@@ -525,94 +985,244 @@ class HistoryPage(Adw.NavigationPage):
         tb_view.set_content(self.stack)
         self.set_child(tb_view)
 
-    def _create_list_page(self, log_dir, prefix, empty_msg, icon_name):
+    def on_run_activated(self, run_id):
+        try:
+            store = HistoryStore(self.history_file)
+            try:
+                run = store.get_run(run_id)
+                results = store.get_results(run_id)
+            finally:
+                store.close()
+            log_dir = os.path.join(os.path.dirname(self.history_file), "logs")
+        except (OSError, sqlite3.Error) as e:
+            print(f"Error reading history: {e}")
+            return
+        if not run:
+            return
+
+        if run["kind"] == "scan":
+            log_path = os.path.join(log_dir, run["log_file"])
+            checkpoint = checkpoint_path(log_path)
+            on_resume = None
+            if self.on_resume and os.path.exists(checkpoint):
+                on_resume = lambda: self.on_resume(checkpoint)
+            page = ScanResultPage(run["summary"], results, load_metrics(log_path), on_resume)
+        else:
+            page = UpdateResultPage(run["summary"])
+            
+        self.nav_view.push(page)
+
+class JobsPage(Adw.NavigationPage):
+    MODE_LABELS = {"update": "Update", "scan_file": "File Scan", "scan_dir": "Folder Scan", "scan_batch": "Batch Scan"}
+
+    def __init__(self, job_queue, on_view_log):
+        super().__init__(title="Job Queue", tag="jobs_page")
+        self.job_queue = job_queue
+        self.on_view_log = on_view_log
+        
+        # Toolbar
+        tb_view = Adw.ToolbarView()
+        header = Adw.HeaderBar()
+        tb_view.add_top_bar(header)
+
+        self.stack = Gtk.Stack()
+        
+        # List
+        scrolled = Gtk.ScrolledWindow()
         clamp = Adw.Clamp(maximum_size=600)
+        box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=12)
+        box.set_margin_top(12)
+        box.set_margin_bottom(12)
+        box.set_margin_start(12)
+        box.set_margin_end(12)
+        self.grp = Adw.PreferencesGroup()
+        box.append(self.grp)
+        clamp.set_child(box)
+        scrolled.set_child(clamp)
+        self.stack.add_named(scrolled, "list")
+
+        # Empty State
+        status = Adw.StatusPage()
+        status.set_icon_name("view-list-symbolic")
+        status.set_title("No Jobs")
+        status.set_description("Scans and updates you start are listed here.")
+        self.stack.add_named(status, "empty")
+
+        tb_view.set_content(self.stack)
+        self.set_child(tb_view)
+        self.rows = []
+        self.refresh()
+
+    def refresh(self):
+        for row in self.rows:
+            self.grp.remove(row)
+        self.rows = []
+
+        # Running first, then the queue in start order, then finished (newest first)
+        running = self.job_queue.running()
+        queued = self.job_queue.queued()
+        finished = [job for job in reversed(self.job_queue.jobs) if not job.is_active]
+
+        for job in running + queued + finished:
+            self.grp.add(self._create_row(job, job in queued))
+        self.stack.set_visible_child_name("list" if self.rows else "empty")
+
+    def _create_row(self, job, is_queued):
+        mode = self.MODE_LABELS.get(job.mode, job.mode)
+        subtitle = f"{mode} · {job.state_label}"
+        if not job.is_update:
+            subtitle += f" · {PROFILES[job.profile].label}"
+        row = Adw.ActionRow(title=GLib.markup_escape_text(job.title), subtitle=GLib.markup_escape_text(subtitle))
+        if job.target:
+            row.set_tooltip_text(job.target)
+
+        icons = {Job.QUEUED: "content-loading-symbolic", Job.RUNNING: "media-playback-start-symbolic",
+                 Job.DONE: "object-select-symbolic", Job.FAILED: "dialog-error-symbolic",
+                 Job.CANCELLED: "process-stop-symbolic"}
+        icon = "media-playback-pause-symbolic" if job.paused else icons.get(job.status, "dialog-question-symbolic")
+        row.add_prefix(Gtk.Image.new_from_icon_name(icon))
+
+        if is_queued:
+            for icon, delta, tip in (("go-up-symbolic", -1, "Move up"), ("go-down-symbolic", 1, "Move down")):
+                btn = Gtk.Button(icon_name=icon, valign=Gtk.Align.CENTER, tooltip_text=tip)
+                btn.add_css_class("flat")
+                btn.connect("clicked", lambda b, j=job, d=delta: self.job_queue.move(j, d))
+                row.add_suffix(btn)
+
+        if job.status != Job.QUEUED:
+            btn_log = Gtk.Button(icon_name="text-x-generic-symbolic", valign=Gtk.Align.CENTER, tooltip_text="View log")
+            btn_log.add_css_class("flat")
+            btn_log.connect("clicked", lambda b, j=job: self.on_view_log(j))
+            row.add_suffix(btn_log)
+
+        if job.is_active and not job.is_update:
+            # A running engine's CPU priority can only be lowered, so faster profiles drop out
+            names = [name for name in PROFILE_ORDER if name in job.profiles or name == job.profile]
+            dropdown = Gtk.DropDown.new_from_strings([PROFILES[name].label for name in names])
+            dropdown.set_valign(Gtk.Align.CENTER)
+            dropdown.set_tooltip_text("Resource profile")
+            dropdown.set_selected(names.index(job.profile))
+            dropdown.connect("notify::selected",
+                             lambda d, p, j=job, n=names: self.job_queue.set_profile(j, n[d.get_selected()]))
+            row.add_suffix(dropdown)
+
+        if job.can_pause:
+            if job.paused:
+                btn_pause = Gtk.Button(icon_name="media-playback-start-symbolic", valign=Gtk.Align.CENTER,
+                                       tooltip_text="Resume")
+                btn_pause.connect("clicked", lambda b, j=job: self.job_queue.resume(j))
+            else:
+                btn_pause = Gtk.Button(icon_name="media-playback-pause-symbolic", valign=Gtk.Align.CENTER,
+                                       tooltip_text="Pause")
+                btn_pause.connect("clicked", lambda b, j=job: self.job_queue.pause(j))
+            btn_pause.add_css_class("flat")
+            row.add_suffix(btn_pause)
+
+        if job.is_active:
+            btn_cancel = Gtk.Button(icon_name="process-stop-symbolic", valign=Gtk.Align.CENTER, tooltip_text="Cancel")
+            btn_cancel.add_css_class("flat")
+            btn_cancel.connect("clicked", lambda b, j=job: self.job_queue.cancel(j))
+            row.add_suffix(btn_cancel)
+
+        self.rows.append(row)
+        return row
+
+
+class WatchPage(Adw.NavigationPage):
+    """Folders scanned automatically when files in them change."""
+
+    def __init__(self, folders, status, on_add, on_remove):
+        super().__init__(title="Watched Folders", tag="watch_page")
+        self.on_remove = on_remove
+
+        tb_view = Adw.ToolbarView()
+        header = Adw.HeaderBar()
+        btn_add = Gtk.Button(icon_name="list-add-symbolic", tooltip_text="Watch a folder")
+        btn_add.connect("clicked", lambda b: on_add())
+        header.pack_start(btn_add)
+        tb_view.add_top_bar(header)
+
+        self.stack = Gtk.Stack()
         scrolled = Gtk.ScrolledWindow()
-        
+        clamp = Adw.Clamp(maximum_size=600)
         box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=12)
         box.set_margin_top(12)
         box.set_margin_bottom(12)
         box.set_margin_start(12)
         box.set_margin_end(12)
-        
-        scrolled.set_child(box)
-        clamp.set_child(scrolled)
-        
-        grp = Adw.PreferencesGroup()
-        box.append(grp)
-        
-        if os.path.exists(log_dir):
-            files = sorted([f for f in os.listdir(log_dir) if f.startswith(prefix) and f.endswith(".log")], reverse=True)
-            if not files:
-                 status = Adw.StatusPage()
-                 status.set_icon_name(icon_name)
-                 status.set_title("No History")
-                 status.set_description(f"No {empty_msg.lower()} found.")
-                 return status
-            
-            for f in files:
-                # Get title (target name or timestamp if target not found)
-                display_name = self.get_card_title(log_dir, f, prefix)
-                
-                # Subtitle (Date)
-                # Format: scan_YYYYMMDD-HHMMSS.log
-                ts_str = f.replace(prefix, "").replace(".log", "")
-                subtitle = ts_str
-                parts = ts_str.split("-")
-                if len(parts) == 2:
-                    date_part = f"{parts[0][0:4]}-{parts[0][4:6]}-{parts[0][6:8]}"
-                    time_part = f"{parts[1][0:2]}:{parts[1][2:4]}"
-                    subtitle = f"{date_part} at {time_part}"
-                
-                row = Adw.ActionRow(title=display_name, subtitle=subtitle)
-                row.set_activatable(True)
-                row.connect("activated", self.on_row_activated, f)
-                row.add_suffix(Gtk.Image.new_from_icon_name("go-next-symbolic"))
-                grp.add(row)
-        else:
-             grp.set_description("Log directory not found.")
-             
-        return clamp
+        self.grp = Adw.PreferencesGroup(
+            description="New and changed files are scanned within a second. Partial downloads, "
+                        "version control and build folders are skipped; folders with very many "
+                        "changes are scanned once they settle.")
+        box.append(self.grp)
+        clamp.set_child(box)
+        scrolled.set_child(clamp)
+        self.stack.add_named(scrolled, "list")
 
-    def get_card_title(self, log_dir, filename, prefix):
-        if not filename.startswith("scan_"):
-            return "Database Update"
-            
-        full_path = os.path.join(log_dir, filename)
-        
-        # Use safe_read_file to avoid TOCTOU on symlinks
-        # We only need the first few lines, but safe_read_file reads all.
-        # It's fine for logs.
-        content = safe_read_file(full_path, max_bytes=4096)
-        
-        if content:
-            lines = content.splitlines()
-            for i in range(min(5, len(lines))):
-                line = lines[i]
-                if "Starting Scan:" in line:
-                    # Format: --- Starting Scan: /path/to/target ---
-                    return line.split("Starting Scan:")[1].replace("---", "").strip()
-
-        return filename.replace(prefix, "").replace(".log", "")
-
-    def on_row_activated(self, row, filename):
-        path = os.path.join(self.log_dir, filename)
-        content = _safe_read_file(path)
-        if not content:
-            return
+        empty = Adw.StatusPage()
+        empty.set_icon_name("folder-saved-search-symbolic")
+        empty.set_title("No Watched Folders")
+        empty.set_description("Add a folder such as Downloads to scan new files as they arrive.")
+        self.stack.add_named(empty, "empty")
+
+        tb_view.set_content(self.stack)
+        self.set_child(tb_view)
+        self.rows = []
+        self.refresh(folders, status)
+
+    def refresh(self, folders, status=None):
+        for row in self.rows:
+            self.grp.remove(row)
+        self.rows = []
+        self.grp.set_title(status or "")
+        for folder in folders:
+            row = Adw.ActionRow(title=GLib.markup_escape_text(os.path.basename(folder.rstrip(os.sep)) or folder),
+                                subtitle=GLib.markup_escape_text(folder))
+            row.add_prefix(Gtk.Image.new_from_icon_name("folder-symbolic"))
+            btn_remove = Gtk.Button(icon_name="user-trash-symbolic", valign=Gtk.Align.CENTER,
+                                    tooltip_text="Stop watching")
+            btn_remove.add_css_class("flat")
+            btn_remove.connect("clicked", lambda b, f=folder: self.on_remove(f))
+            row.add_suffix(btn_remove)
+            self.grp.add(row)
+            self.rows.append(row)
+        self.stack.set_visible_child_name("list" if self.rows else "empty")
+
+
+def mutter_idle_provider():
+    """
+    Returns a callable giving the seconds since the last user input, read
+    from GNOME's idle monitor, or None outside GNOME.
+    """
+    try:
+        proxy = Gio.DBusProxy.new_for_bus_sync(
+            Gio.BusType.SESSION,
+            Gio.DBusProxyFlags.DO_NOT_LOAD_PROPERTIES | Gio.DBusProxyFlags.DO_NOT_CONNECT_SIGNALS,
+            None, "org.gnome.Mutter.IdleMonitor", "/org/gnome/Mutter/IdleMonitor/Core",
+            "org.gnome.Mutter.IdleMonitor", None)
+    except GLib.Error:
+        return None
+    if proxy.get_name_owner() is None:
+        return None
+
+    def idle_seconds():
+        try:
+            reply = proxy.call_sync("GetIdletime", None, Gio.DBusCallFlags.NONE, 1000, None)
+        except GLib.Error:
+            return None
+        return reply.unpack()[0] / 1000
+    return idle_seconds
+
+
+# Files opened from outside within this many ms are scanned as one batch
+EXTERNAL_OPEN_DELAY_MS = 300
 
-        if filename.startswith("scan_"):
-            page = ScanResultPage(content)
-        else:
-            page = UpdateResultPage(content)
-            
-        self.nav_view.push(page)
 
 class MainWindow(Adw.Window):
-    def __init__(self, app, target_path=None):
+    def __init__(self, app, target_paths=None):
         super().__init__(application=app, title="ClamBite")
         self.set_default_size(450, 700)
-        self.target_path = target_path
+        self.target_paths = target_paths or []
 
         # Navigation View
         self.nav_view = Adw.NavigationView()
@@ -625,6 +1235,16 @@ class MainWindow(Adw.Window):
         tb_view = Adw.ToolbarView()
         header = Adw.HeaderBar()
         tb_view.add_top_bar(header)
+
+        # What folder scans skip (see filters.py)
+        self.scan_profiles_file = os.path.join(os.path.expanduser("~/.config/clambite"), "scan_profiles.json")
+        self.scan_profiles = list(load_scan_profiles(self.scan_profiles_file).items())
+        self.scan_profile_dropdown = Gtk.DropDown.new_from_strings(
+            [rules.get("label", name) for name, rules in self.scan_profiles])
+        self.scan_profile_dropdown.set_tooltip_text("Scan profile: what folder scans skip")
+        self.scan_profile_dropdown.set_selected(
+            [name for name, _ in self.scan_profiles].index(DEFAULT_SCAN_PROFILE))
+        header.pack_end(self.scan_profile_dropdown)
         
         # Content Area
         clamp = Adw.Clamp(maximum_size=400)
@@ -685,6 +1305,16 @@ class MainWindow(Adw.Window):
         grid.set_column_homogeneous(True)
         grid.set_row_homogeneous(True)
         
+        # Quick Scan: high-risk locations within a time budget
+        btn_content_quick = Adw.ButtonContent(icon_name="security-medium-symbolic", label="Quick Scan")
+        self.btn_quick_scan = Gtk.Button()
+        self.btn_quick_scan.add_css_class("suggested-action")
+        self.btn_quick_scan.set_child(btn_content_quick)
+        self.btn_quick_scan.set_tooltip_text("Downloads, Desktop, temporary folders, browser caches, "
+                                             "autostart entries and recent files")
+        self.btn_quick_scan.connect("clicked", self.on_quick_scan_clicked)
+        grid.attach(self.btn_quick_scan, 0, -1, 2, 1)
+
         # Scan File
         btn_content_file = Adw.ButtonContent(icon_name="document-open-symbolic", label="Scan File")
         self.btn_scan_file = Gtk.Button()
@@ -717,6 +1347,12 @@ class MainWindow(Adw.Window):
         
         main_vbox.append(grid)
 
+        # Pause/Resume for the running scan, keeps its progress
+        self.btn_pause = Gtk.Button(label="Pause")
+        self.btn_pause.set_visible(False)
+        self.btn_pause.connect("clicked", self.on_pause_clicked)
+        main_vbox.append(self.btn_pause)
+
         # Stop Button (Hidden initially, replaces grid or appended?)
         self.btn_stop = Gtk.Button(label="Stop Operation")
         self.btn_stop.add_css_class("destructive-action")
@@ -730,25 +1366,67 @@ class MainWindow(Adw.Window):
         self.btn_view_log.connect("clicked", self.on_view_log_clicked)
         main_vbox.append(self.btn_view_log)
 
+        self.btn_queue = Gtk.Button(label="View Queue")
+        self.btn_queue.add_css_class("flat")
+        self.btn_queue.set_tooltip_text("Queued, running and finished jobs")
+        self.btn_queue.connect("clicked", self.on_queue_clicked)
+        main_vbox.append(self.btn_queue)
+
+        self.btn_watch = Gtk.Button(label="Watch Folders")
+        self.btn_watch.add_css_class("flat")
+        self.btn_watch.set_tooltip_text("Scan new files in chosen folders as they arrive")
+        self.btn_watch.connect("clicked", self.on_watch_clicked)
+        main_vbox.append(self.btn_watch)
+
         # Logic helpers
-        self.log_buffer = Gtk.TextBuffer()
-        self.scanner_thread = None
+        self.jobs = JobQueue(
+            callbacks=self.job_callbacks,
+            on_job_changed=self.on_job_changed,
+            on_job_finished=self.on_job_finished
+        )
+        self.job_logs = {}      # job id -> LogStore
+        self.focus_job = None   # Job shown by the progress bar and Stop button
+        self.pulse_timer = None
+        threading.Thread(target=self.import_history, daemon=True).start()
+        # Background scans use the machine fully while the user is away
+        governor.set_idle_provider(mutter_idle_provider())
+
+        # Folders scanned on change (see watcher.py)
+        self.watch_file = os.path.join(os.path.expanduser("~/.config/clambite"), "watch.json")
+        self.quick_scan_file = os.path.join(os.path.expanduser("~/.config/clambite"), "quick_scan.json")
+        self.watch_config = load_watch_config(self.watch_file)
+        self.watcher = None
+        self.watch_status = None
+        self.restart_watcher()
+
+        # Paths opened from the file manager or command line
+        self._incoming_paths = []
+        self._incoming_timer = None
+        self._prompt_batch = None  # Batch waiting on the update prompt
 
         # Auto-start if command line arg provided
-        if self.target_path:
-            self.start_operation('scan_file', self.target_path)
+        if self.target_paths:
+            self.handle_external_request(self.target_paths)
+        else:
+            GLib.idle_add(self.offer_interrupted_scan)
 
     # --- Actions ---
 
     def on_scan_file_clicked(self, btn):
         self.choose_target(folder=False)
 
+    def on_quick_scan_clicked(self, btn):
+        if self.is_database_fresh():
+            self.start_operation('quick_scan', None)
+        else:
+            self.prompt_update_before_scan('quick_scan', None)
+
     def on_scan_folder_clicked(self, btn):
         self.choose_target(folder=True)
 
     def on_database_clicked(self, btn):
         # Open Database View
-        is_busy = self.scanner_thread and self.scanner_thread.is_alive()
+        is_busy = any(job.is_update and job.is_active for job in self.jobs.jobs)
         page = DatabasePage(self.nav_view, lambda: self.start_operation('update', None), is_busy=is_busy)
         self.nav_view.push(page)
         
@@ -756,17 +1434,170 @@ class MainWindow(Adw.Window):
         self.start_operation('update', None)
 
     def on_stop_clicked(self, btn):
-        if self.scanner_thread and self.scanner_thread.is_alive():
-            self.scanner_thread.stop()
+        if self.focus_job and self.focus_job.is_active:
+            self.jobs.cancel(self.focus_job)
+
+    def on_pause_clicked(self, btn):
+        job = self.focus_job
+        if job is None:
+            return
+        if job.paused:
+            self.jobs.resume(job)
+        else:
+            self.jobs.pause(job)
+
+    def sync_pause_button(self):
+        job = self.focus_job
+        self.btn_pause.set_visible(job is not None and job.can_pause)
+        if job is None:
+            return
+        self.btn_pause.set_label("Resume" if job.paused else "Pause")
+        if job.paused:
+            self.progress_bar.set_text("Paused")
+            self.progress_bar.set_show_text(True)
+
+    def on_queue_clicked(self, btn):
+        self.nav_view.push(JobsPage(self.jobs, self.show_job_log))
+
+    def on_watch_clicked(self, btn):
+        self.nav_view.push(WatchPage(self.watch_config["folders"], self.watch_status,
+                                     self.add_watched_folder, self.remove_watched_folder))
+
+    def add_watched_folder(self):
+        dialog = Gtk.FileChooserNative(title="Watch Folder", transient_for=self,
+                                       action=Gtk.FileChooserAction.SELECT_FOLDER)
+
+        def on_response(d, response):
+            if response == Gtk.ResponseType.ACCEPT:
+                path = d.get_file().get_path()
+                if path and path not in self.watch_config["folders"]:
+                    self.watch_config["folders"].append(path)
+                    self.save_watch_config()
+            d.destroy()
+
+        dialog.connect("response", on_response)
+        dialog.show()
+
+    def remove_watched_folder(self, folder):
+        if folder in self.watch_config["folders"]:
+            self.watch_config["folders"].remove(folder)
+            self.save_watch_config()
+
+    def save_watch_config(self):
+        try:
+            save_watch_config(self.watch_file, self.watch_config)
+        except OSError as e:
+            print(f"Could not save watched folders: {e}")
+        self.restart_watcher()
+        page = self.nav_view.get_visible_page()
+        if isinstance(page, WatchPage):
+            page.refresh(self.watch_config["folders"], self.watch_status)
+
+    def restart_watcher(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+        folders = [f for f in self.watch_config["folders"] if os.path.isdir(f)]
+        count = len(folders)
+        self.btn_watch.set_label(f"Watch Folders ({count} watched)" if count else "Watch Folders")
+        if folders:
+            self.watch_status = None
+            self.watcher = FolderWatcher(folders, self.on_watch_batch, self.on_watch_log,
+                                         exclude=self.watch_config["exclude"])
+            self.watcher.start()
+
+    def on_watch_batch(self, paths):
+        """Scans changed files quietly; the result is only shown if something is found."""
+        if not self.jobs.merge_batch(paths, source="watch"):
+            self.jobs.submit('scan_batch', None, targets=paths, source="watch")
+
+    def on_watch_log(self, message):
+        self.watch_status = message
+        page = self.nav_view.get_visible_page()
+        if isinstance(page, WatchPage):
+            page.refresh(self.watch_config["folders"], message)
 
     def on_history_clicked(self, btn):
         base_dir = os.path.expanduser("~/.config/clambite")
-        log_dir = os.path.join(base_dir, "logs")
-        page = HistoryPage(self.nav_view, log_dir)
+        page = HistoryPage(self.nav_view, os.path.join(base_dir, "history.db"), self.resume_scan)
         self.nav_view.push(page)
 
+    def resume_scan(self, checkpoint):
+        """Queues a scan continuing from an interrupted scan's checkpoint."""
+        state = load_checkpoint(checkpoint)
+        if state is None or self.jobs.is_resuming(checkpoint):
+            return
+        if isinstance(self.nav_view.get_visible_page(), ScanResultPage):
+            self.nav_view.pop()
+        options = {"profile": state.get("profile"), "scan_profile": state.get("scan_profile")}
+        if state["mode"] == 'scan_batch':
+            self.jobs.submit(state["mode"], state.get("target"), targets=state["targets"], resume_from=checkpoint,
+                             **options)
+        else:
+            self.jobs.submit(state["mode"], state["target"], resume_from=checkpoint, **options)
+
+    def offer_interrupted_scan(self):
+        """
+        After a crash, power loss or suspend that outlived the app, offers to
+        continue the newest scan that did not end on its own. Scans stopped
+        by the user stay resumable from History.
+        """
+        log_dir = os.path.join(os.path.expanduser("~/.config/clambite"), "logs")
+        for checkpoint, state in find_checkpoints(log_dir):
+            if not state.get("stopped") and not owner_alive(state):
+                break
+        else:
+            return False
+
+        files = state.get("progress", {}).get("files", 0)
+        when = datetime.fromtimestamp(state.get("saved_at", 0)).strftime("%Y-%m-%d at %H:%M")
+        dialog = Adw.MessageDialog(
+            heading="Resume Interrupted Scan?",
+            body=f"The scan of {state.get('target')} was interrupted on {when} after {files:,} files. "
+                 "It can continue where it left off.",
+            transient_for=self
+        )
+        dialog.add_response("discard", "Discard")
+        dialog.add_response("later", "Not Now")
+        dialog.add_response("resume", "Resume")
+        dialog.set_response_appearance("discard", Adw.ResponseAppearance.DESTRUCTIVE)
+        dialog.set_response_appearance("resume", Adw.ResponseAppearance.SUGGESTED)
+        dialog.set_default_response("resume")
+
+        def on_response(d, response):
+            d.close()
+            if response == "resume":
+                self.resume_scan(checkpoint)
+            elif response == "discard":
+                try:
+                    discard_checkpoint(checkpoint)
+                except OSError as e:
+                    print(f"Could not remove checkpoint {checkpoint}: {e}")
+
+        dialog.connect("response", on_response)
+        dialog.present()
+        return False
+
+    def import_history(self):
+        """One-time indexing of logs written before the history store existed."""
+        base_dir = os.path.expanduser("~/.config/clambite")
+        try:
+            store = HistoryStore(os.path.join(base_dir, "history.db"))
+            try:
+                store.import_logs(os.path.join(base_dir, "logs"))
+            finally:
+                store.close()
+        except (OSError, sqlite3.Error) as e:
+            print(f"History import failed: {e}")
+
     def on_view_log_clicked(self, btn):
-        log_win = LogWindow(self, self.log_buffer)
+        job = self.focus_job or (self.jobs.jobs[-1] if self.jobs.jobs else None)
+        self.show_job_log(job)
+
+    def show_job_log(self, job):
+        log_store = self.job_logs.get(job.id) if job else None
+        log_path = job.thread.log_filename if job and job.thread else None
+        log_win = LogWindow(self, log_store or LogStore(LOG_VIEW_MAX_LINES), log_path)
         log_win.present()
 
     def choose_target(self, folder=False):
@@ -792,20 +1623,39 @@ class MainWindow(Adw.Window):
         dialog.connect("response", on_response)
         dialog.show()
 
-    def handle_external_request(self, path):
-        if not os.path.exists(path):
-            return
+    def handle_external_request(self, paths):
+        """
+        Collects paths opened from outside into one batch scan. Requests
+        arriving within EXTERNAL_OPEN_DELAY_MS of each other are combined,
+        and later ones join the pending batch while it can still take them.
+        """
+        self._incoming_paths.extend(os.path.abspath(p) for p in paths if os.path.exists(p))
+        if self._incoming_timer is not None:
+            GLib.source_remove(self._incoming_timer)
+        self._incoming_timer = GLib.timeout_add(EXTERNAL_OPEN_DELAY_MS, self._flush_external_requests)
+
+    def _flush_external_requests(self):
+        self._incoming_timer = None
+        paths, self._incoming_paths = self._incoming_paths, []
+        if not paths:
+            return False
 
         self.present()
-        self.nav_view.pop_to_tag("home_page")
 
-        is_folder = os.path.isdir(path)
-        mode = 'scan_dir' if is_folder else 'scan_file'
-        
+        # The update prompt is still open: its scan will include these too
+        if self._prompt_batch is not None:
+            self._prompt_batch.extend(paths)
+            return False
+        if self.jobs.merge_batch(paths):
+            return False
+
+        self.nav_view.pop_to_tag("home_page")
         if self.is_database_fresh():
-            self.start_operation(mode, path)
+            self.start_operation('scan_batch', paths)
         else:
-            self.prompt_update_before_scan(mode, path)
+            self._prompt_batch = paths
+            self.prompt_update_before_scan('scan_batch', paths)
+        return False
 
     def is_database_fresh(self):
         base_dir = os.path.expanduser("~/.config/clambite")
@@ -893,12 +1743,12 @@ class MainWindow(Adw.Window):
     def prompt_update_before_scan(self, mode, path):
         dialog = Adw.MessageDialog(
             heading="Update Database?",
-            body="Would you like to update the virus database before scanning?",
+            body="Would you like to update the virus database? The scan starts right away and picks up the new definitions once they are ready.",
             transient_for=self
         )
         
         dialog.add_response("skip", "No (Scan Now)")
-        dialog.add_response("update", "Yes (Update & Scan)")
+        dialog.add_response("update", "Yes (Scan & Update)")
         
         self.timeout_seconds = 5
         base_body = dialog.get_body()
@@ -917,6 +1767,7 @@ class MainWindow(Adw.Window):
 
         def on_dialog_response(d, response):
             GLib.source_remove(timer_id)
+            self._prompt_batch = None
             should_update = (response == "update")
             d.close()
             
@@ -929,56 +1780,132 @@ class MainWindow(Adw.Window):
         dialog.present()
 
     def start_operation(self, mode, path, next_op=None):
-        self.set_controls_sensitive(False)
-        self.btn_stop.set_visible(True)
-        self.progress_bar.set_visible(True)
-        self.progress_bar.pulse()
-        
-        self.log_buffer.set_text("")
-        self.current_next_op = next_op 
-        
-        # --- NAVIGATE TO DB PAGE IF UPDATING ---
-        if mode == "update":
-            # Get the currently visible page
-            current_page = self.nav_view.get_visible_page()
+        """
+        Queues an operation. next_op=(mode, path) runs alongside it: an update
+        stages the new database and swaps it in without holding up the scan.
+        """
+        job = self._submit(mode, path)
+        if next_op:
+            job.show_result = False
+            next_mode, next_path = next_op
+            self._submit(next_mode, next_path)
+
+    def _submit(self, mode, path):
+        if mode == 'quick_scan':
+            config = load_quick_scan_config(self.quick_scan_file)
+            return self.jobs.submit('scan_batch', QUICK_SCAN_LABEL, targets=quick_scan_targets(config),
+                                    scan_profile=QUICK_SCAN_PROFILE, time_budget=config["budget_seconds"])
+        scan_profile = self.scan_profiles[self.scan_profile_dropdown.get_selected()][0]
+        if mode == 'scan_batch':
+            # path is the list of targets
+            return self.jobs.submit(mode, None, targets=path, scan_profile=scan_profile)
+        return self.jobs.submit(mode, path, scan_profile=scan_profile)
+
+    def job_callbacks(self, job):
+        log_store = LogStore(LOG_VIEW_MAX_LINES)
+        self.job_logs[job.id] = log_store
+        return {
+            "on_log": log_store.append_lines,
+            "on_status": self.update_status_display,
+            "on_progress": lambda snap: self.on_progress(snap) if job is self.focus_job else None,
+        }
+
+    def on_job_changed(self, job):
+        # Jobs the user did not start (watched folders) run without taking over the window
+        if job.status == Job.RUNNING and job is not self.focus_job and job.source is None:
+            self.set_focus_job(job)
+
+            # --- NAVIGATE TO DB PAGE IF UPDATING ---
+            if job.is_update and job.show_result:
+                # Get the currently visible page
+                current_page = self.nav_view.get_visible_page()
             
-            # If we are NOT already on the DatabasePage, go there.
-            if not isinstance(current_page, DatabasePage):
-                self.on_database_clicked(None)
-        # ---------------------------------------
-
-        self.scanner_thread = ScannerThread(
-            mode=mode,
-            target_path=path,
-            on_log=self.log_message,
-            on_status=self.update_status_display,
-            on_finish=self.on_operation_finished
-        )
-        self.scanner_thread.start()
-        
-        self.pulse_timer = GLib.timeout_add(100, self.pulse_progress)
+                # If we are NOT already on the DatabasePage, go there.
+                if not isinstance(current_page, DatabasePage):
+                    self.on_database_clicked(None)
+            # ---------------------------------------
+
+        running = self.jobs.running()
+        if self.focus_job and not self.focus_job.is_active:
+            shown = [j for j in running if j.source is None]
+            self.set_focus_job(shown[-1] if shown else None)
+
+        self.sync_pause_button()
+
+        active = len(running) + len(self.jobs.queued())
+        self.btn_queue.set_label(f"View Queue ({active} active)" if active else "View Queue")
+
+        current_page = self.nav_view.get_visible_page()
+        if isinstance(current_page, JobsPage):
+            current_page.refresh()
+
+    def set_focus_job(self, job):
+        self.focus_job = job
+        self.btn_stop.set_visible(job is not None)
+        self.sync_pause_button()
+        self.progress_bar.set_visible(job is not None)
+        if job is None:
+            return
 
+        self.progress_bar.set_show_text(False)
+        self.progress_bar.pulse()
+        self._determinate = False
+        if self.pulse_timer is None:
+            self.pulse_timer = GLib.timeout_add(100, self.pulse_progress)
 
     def pulse_progress(self):
-        if self.scanner_thread and self.scanner_thread.is_alive():
-            self.progress_bar.pulse()
+        if self.focus_job and self.focus_job.is_active:
+            # Keep pulsing until the backend reports real totals
+            if not self._determinate and not self.focus_job.paused:
+                self.progress_bar.pulse()
             return True
+        self.pulse_timer = None
         return False
 
+    def on_progress(self, snap):
+        done_files, total_files = snap["files"], snap["total_files"]
+        elapsed = max(snap["elapsed"], 0.001)
+        files_rate = done_files / elapsed
+        mb_rate = snap["bytes"] / elapsed / (1024 * 1024)
+
+        if not snap["totals_final"]:
+            # Totals are still being counted; keep the bar pulsing
+            self.progress_bar.set_text(f"{done_files:,} files scanned · counting… · {files_rate:.0f} files/s")
+            self.progress_bar.set_show_text(True)
+            return
+
+        self._determinate = True
+        if snap["total_bytes"]:
+            fraction = snap["bytes"] / snap["total_bytes"]
+        else:
+            fraction = done_files / total_files if total_files else 1.0
+        self.progress_bar.set_fraction(min(fraction, 1.0))
+
+        eta = ""
+        if 0 < fraction < 1:
+            remaining = elapsed * (1 - fraction) / fraction
+            eta = f" · ETA {self.format_duration(remaining)}"
+        self.progress_bar.set_text(
+            f"{done_files:,}/{total_files:,} files · {files_rate:.0f} files/s · {mb_rate:.1f} MB/s{eta}")
+        self.progress_bar.set_show_text(True)
+
+    @staticmethod
+    def format_duration(seconds):
+        if seconds < 60:
+            return f"{seconds:.0f}s"
+        if seconds < 3600:
+            return f"{seconds // 60:.0f}m {seconds % 60:.0f}s"
+        return f"{seconds // 3600:.0f}h {seconds % 3600 // 60:.0f}m"
+
     def update_status_display(self, icon, title, subtitle):
         # Removed
         pass
         
-    def log_message(self, message):
-        end_iter = self.log_buffer.get_end_iter()
-        self.log_buffer.insert(end_iter, message + "\n")
-
-    def on_operation_finished(self, success, context, summary=None):
-        self.set_controls_sensitive(True)
-        self.btn_stop.set_visible(False)
-        self.progress_bar.set_visible(False)
+    def on_job_finished(self, job):
+        success, summary = job.success, job.summary
+        self._prune_job_logs()
         
-        if context == 'update':
+        if job.is_update:
             # 1. Update the small status text on Home Page
             self.lbl_status.set_text(self.get_database_age_string())
             
@@ -987,26 +1914,40 @@ class MainWindow(Adw.Window):
             if isinstance(current_page, DatabasePage):
                 current_page.refresh()
 
-            # 3. Show the Result Page
-            if not self.current_next_op:
+            # 3. Show the Result Page, unless the update ran for a scan
+            if job.show_result and not self.jobs.has_dependents(job):
                 page = UpdateResultPage(summary)
                 self.nav_view.push(page)
-
-            # 4. Handle scheduled next operation (e.g. Scan after Update)
-            if hasattr(self, 'current_next_op') and self.current_next_op:
-                if success:
-                    next_mode, next_path = self.current_next_op
-                    self.current_next_op = None
-                    GLib.timeout_add(500, self.start_operation, next_mode, next_path, None)
-                else:
-                    self.current_next_op = None
         else:
             # Scan finished logic
-            self.current_next_op = None
-            page = ScanResultPage(summary)
+            if job.source is not None:
+                if not job.thread.infections:
+                    return
+                self.notify_threat(job)
+            # A scan cut short by its time budget can continue from its checkpoint
+            checkpoint = job.thread.checkpoint_file if job.thread.budget_exhausted else None
+            on_resume = None
+            if checkpoint and os.path.exists(checkpoint):
+                on_resume = lambda: self.resume_scan(checkpoint)
+            page = ScanResultPage(summary, job.thread.results.records(), job.thread.metrics_report, on_resume)
             self.nav_view.push(page)
-            
-            
-    def set_controls_sensitive(self, sensitive):
-        self.btn_scan_file.set_sensitive(sensitive)
-        self.btn_scan_folder.set_sensitive(sensitive)
+
+    def notify_threat(self, job):
+        """Desktop notification for detections in scans the user did not start."""
+        infections = job.thread.infections
+        notification = Gio.Notification.new("Threat Found")
+        if len(infections) == 1:
+            notification.set_body(f"{infections[0][0]}: {infections[0][1]}")
+        else:
+            notification.set_body(f"{len(infections)} infected files in {job.target}")
+        notification.set_priority(Gio.NotificationPriority.URGENT)
+        self.get_application().send_notification(f"clambite-threat-{job.id}", notification)
+        self.present()
+
+    def _prune_job_logs(self, keep_finished=5):
+        """Drops in-memory logs of older finished jobs; their log files remain."""
+        finished = [job.id for job in self.jobs.jobs if not job.is_active]
+        keep = {job.id for job in self.jobs.jobs if job.is_active} | set(finished[-keep_finished:])
+        for job_id in list(self.job_logs):
+            if job_id not in keep:
+                del self.job_logs[job_id]
@@ -0,0 +1,307 @@
+import ctypes
+import errno
+import fnmatch
+import json
+import os
+import select
+import struct
+import threading
+import time
+
+# Events are coalesced per path until it has been quiet for this long (seconds)
+DEBOUNCE_SECONDS = 0.5
+# Files handed over per batch; more become the next batch right away
+BATCH_MAX_FILES = 64
+# A directory with more changes than this within STORM_WINDOW seconds (a git
+# clone, a build, an extracted archive) is scanned once after it settles
+STORM_FILES = 100
+STORM_WINDOW = 10.0
+# Seconds without changes after which a directory in a storm is scanned
+STORM_SETTLE_SECONDS = 30.0
+
+# Directory and file names never watched or scanned on change
+DEFAULT_EXCLUDES = (
+    ".git", ".hg", ".svn", "node_modules", "__pycache__", ".cache", ".venv",
+    "*.part", "*.crdownload", "*.download", "*.tmp", "*.swp", ".goutputstream-*",
+)
+
+WATCH_CONFIG_VERSION = 1
+
+# inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_EXCL_UNLINK = 0x04000000
+IN_ISDIR = 0x40000000
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF | IN_MOVE_SELF
+              | IN_ONLYDIR | IN_DONT_FOLLOW | IN_EXCL_UNLINK)
+
+_EVENT = struct.Struct("iIII")
+_libc = ctypes.CDLL(None, use_errno=True)
+
+
+def load_watch_config(path):
+    """Watched folders and extra exclusions saved by the GUI: {"folders": [...], "exclude": [...]}."""
+    # Deferred import to avoid a cycle: backend is heavy and only needed here
+    from backend import safe_read_file
+
+    config = {"version": WATCH_CONFIG_VERSION, "folders": [], "exclude": []}
+    content = safe_read_file(path)
+    if content:
+        try:
+            saved = json.loads(content)
+        except ValueError:
+            saved = None
+        if isinstance(saved, dict) and saved.get("version") == WATCH_CONFIG_VERSION:
+            config["folders"] = [f for f in saved.get("folders", []) if isinstance(f, str)]
+            config["exclude"] = [p for p in saved.get("exclude", []) if isinstance(p, str)]
+    return config
+
+
+def save_watch_config(path, config):
+    """Replaces the watch configuration atomically (0600, no symlinks)."""
+    tmp_path = path + ".tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_NOFOLLOW, 0o600)
+    with os.fdopen(fd, "w") as f:
+        json.dump(dict(config, version=WATCH_CONFIG_VERSION), f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def is_excluded(name, patterns):
+    return any(fnmatch.fnmatch(name, pattern) for pattern in patterns)
+
+
+class Inotify:
+    """Minimal non-recursive inotify reader over ctypes."""
+
+    def __init__(self):
+        self.fd = _libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, os.strerror(e))
+
+    def add(self, path):
+        """Watches one directory. Returns its watch descriptor."""
+        wd = _libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, os.strerror(e), path)
+        return wd
+
+    def read(self):
+        """Yields (wd, mask, name) for the events that are ready."""
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            yield wd, mask, name
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FolderWatcher(threading.Thread):
+    """
+    Watches folders recursively and hands changed files to on_batch in
+    small batches. Events for a path are coalesced until it is quiet for
+    DEBOUNCE_SECONDS, so a download is scanned once, when it is complete.
+
+    Change bursts are limited per directory directly below a watched folder:
+    past STORM_FILES changes in STORM_WINDOW seconds its single events are
+    dropped and the directory is handed over whole once it has settled,
+    where the scan cache skips whatever did not change.
+    """
+
+    def __init__(self, folders, on_batch, on_log=None, exclude=(), dispatch=None):
+        """
+        on_batch: callable(paths) receiving files and folders to scan
+        on_log: optional callable(message) for watch errors and storms
+        exclude: fnmatch patterns of names to ignore, added to DEFAULT_EXCLUDES
+        dispatch: callable(fn, *args) used to deliver callbacks (defaults to the GTK main loop)
+        """
+        super().__init__(daemon=True)
+        self.folders = [os.path.abspath(f) for f in folders]
+        self.on_batch = on_batch
+        self.on_log = on_log
+        self.exclude = tuple(DEFAULT_EXCLUDES) + tuple(exclude)
+        if dispatch is None:
+            from backend import main_loop_dispatch
+            dispatch = main_loop_dispatch()
+        self.dispatch = dispatch
+        self._stop_event = threading.Event()
+        self._wake_r, self._wake_w = os.pipe()
+        self._wake_lock = threading.Lock()
+        self._closed = False
+        self._inotify = None
+        self._dirs = {}       # wd -> directory path
+        self._pending = {}    # path -> time it is due (last event + DEBOUNCE_SECONDS)
+        self._bursts = {}     # storm key -> [event times within STORM_WINDOW]
+        self._storms = {}     # storm key -> time of its last event
+        self._limit_reported = False
+
+    def run(self):
+        try:
+            self._inotify = Inotify()
+        except OSError as e:
+            self._log(f"Watch Error: {e}")
+            self._close_wake()
+            return
+        try:
+            for folder in self.folders:
+                self._add_tree(folder)
+            self._loop()
+        finally:
+            self._inotify.close()
+            self._close_wake()
+
+    def _close_wake(self):
+        with self._wake_lock:
+            self._closed = True
+            os.close(self._wake_r)
+            os.close(self._wake_w)
+
+    def stop(self):
+        self._stop_event.set()
+        with self._wake_lock:
+            if not self._closed:
+                os.write(self._wake_w, b"x")
+
+    def _log(self, message):
+        if self.on_log and not self._stop_event.is_set():
+            self.dispatch(self.on_log, message)
+
+    def _add_tree(self, root):
+        """Watches root and every directory below it that is not excluded (symlinks are not followed)."""
+        stack = [root]
+        while stack and not self._stop_event.is_set():
+            path = stack.pop()
+            try:
+                wd = self._inotify.add(path)
+            except OSError as e:
+                if e.errno == errno.ENOSPC:
+                    # fs.inotify.max_user_watches is exhausted
+                    if not self._limit_reported:
+                        self._log(f"Watch limit reached; changes below {path} are not seen.")
+                        self._limit_reported = True
+                    return
+                continue  # Vanished or unreadable
+            self._dirs[wd] = path
+            try:
+                with os.scandir(path) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False) and not is_excluded(entry.name, self.exclude):
+                            stack.append(entry.path)
+            except OSError:
+                continue
+
+    def _storm_key(self, path):
+        """The directory directly below a watched folder that contains path (or the folder itself)."""
+        for folder in self.folders:
+            if path.startswith(folder.rstrip(os.sep) + os.sep):
+                rest = path[len(folder.rstrip(os.sep)) + 1:]
+                head, sep, _ = rest.partition(os.sep)
+                return os.path.join(folder, head) if sep else folder
+        return os.path.dirname(path)
+
+    def _note_change(self, path, now):
+        key = self._storm_key(path)
+        if key in self._storms:
+            self._storms[key] = now
+            return
+        times = [t for t in self._bursts.get(key, ()) if now - t < STORM_WINDOW]
+        times.append(now)
+        self._bursts[key] = times
+        if len(times) <= STORM_FILES:
+            self._pending[path] = now + DEBOUNCE_SECONDS
+            return
+
+        # Drop the single events of this directory and scan it once it settles
+        self._log(f"Many changes in {key}; it will be scanned once they stop.")
+        del self._bursts[key]
+        self._storms[key] = now
+        prefix = key.rstrip(os.sep) + os.sep
+        for pending in [p for p in self._pending if p == key or p.startswith(prefix)]:
+            del self._pending[pending]
+
+    def _handle(self, wd, mask, name, now):
+        if mask & IN_Q_OVERFLOW:
+            # Events were lost: look at everything again, the cache keeps it cheap
+            self._log("Too many changes at once; rescanning the watched folders.")
+            for folder in self.folders:
+                self._pending[folder] = now + DEBOUNCE_SECONDS
+            return
+        if mask & IN_IGNORED:
+            self._dirs.pop(wd, None)
+            return
+        directory = self._dirs.get(wd)
+        if directory is None or not name or is_excluded(name, self.exclude):
+            return
+        path = os.path.join(directory, name)
+        if mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                self._add_tree(path)
+                # Files can land in it before its watch exists, so it is scanned as a whole
+                self._note_change(path, now)
+            return
+        if mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+            self._note_change(path, now)
+
+    def _due(self, now):
+        """Removes and returns the paths ready to scan, oldest first."""
+        ready = sorted((due, path) for path, due in self._pending.items() if due <= now)
+        for _, path in ready:
+            del self._pending[path]
+        for key, last in list(self._storms.items()):
+            if now - last >= STORM_SETTLE_SECONDS:
+                del self._storms[key]
+                ready.append((last, key))
+        # Files inside a folder that is scanned anyway are left out
+        paths = set(path for _, path in ready)
+        return [path for _, path in ready if not self._inside(path, paths)]
+
+    @staticmethod
+    def _inside(path, folders):
+        parent = os.path.dirname(path)
+        while parent and parent != path:
+            if parent in folders:
+                return True
+            path, parent = parent, os.path.dirname(parent)
+        return False
+
+    def _next_timeout(self, now):
+        deadlines = list(self._pending.values())
+        deadlines += [last + STORM_SETTLE_SECONDS for last in self._storms.values()]
+        return max(0.0, min(deadlines) - now) if deadlines else None
+
+    def _loop(self):
+        poller = select.poll()
+        poller.register(self._inotify.fd, select.POLLIN)
+        poller.register(self._wake_r, select.POLLIN)
+        while not self._stop_event.is_set():
+            timeout = self._next_timeout(time.monotonic())
+            poller.poll(None if timeout is None else timeout * 1000)
+            if self._stop_event.is_set():
+                return
+
+            now = time.monotonic()
+            for wd, mask, name in self._inotify.read():
+                try:
+                    self._handle(wd, mask, name, now)
+                except OSError:
+                    continue  # The path changed again under us
+
+            ready = [path for path in self._due(now) if os.path.lexists(path)]
+            for start in range(0, len(ready), BATCH_MAX_FILES):
+                self.dispatch(self.on_batch, ready[start:start + BATCH_MAX_FILES])